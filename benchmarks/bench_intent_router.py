@@ -0,0 +1,72 @@
+"""Micro-benchmark do roteamento de intents por mensagem.
+
+Compara o IntentRouter (uma expressão regular compilada) com as verificações
+encadeadas de palavras-chave que ele substituiu.
+
+    python benchmarks/bench_intent_router.py [--repeticoes N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from intent_router import IntentRouter  # noqa: E402
+
+MENSAGENS = [
+    'Qual o status do pedido #12345?',
+    'Qual o prazo para devolução de um produto com defeito?',
+    'Vocês têm algum notebook bom para estudos e trabalho?',
+    'Quero um presente de cozinha até 400 reais',
+    'Como funciona o pagamento no boleto?',
+    'Olá, bom dia! Preciso de ajuda.',
+]
+
+CATEGORIAS = {
+    'eletrônicos': ['eletrônicos', 'eletronicos', 'notebook', 'computador', 'celular', 'smartphone'],
+    'casa': ['casa', 'panelas', 'utensílios', 'utensilios', 'cozinha', 'fogão', 'panela', 'presente de cozinha'],
+    'esportes': ['esportes', 'tênis', 'tenis', 'corrida'],
+    'livros': ['livros', 'livro', 'leitura'],
+}
+
+
+def roteamento_encadeado(mensagem):
+    """Reprodução das verificações anteriores, para comparação."""
+    import re
+    if any(k in mensagem.lower() for k in ['prazo', 'troca', 'devolução', 'devolucao', 'trocas', 'devoluções', 'devolucoes']):
+        return 'prazo_troca'
+    if 'pedido' in mensagem.lower():
+        match = re.search(r'(?:pedido[\s#:]*|#)(\d+)', mensagem.lower())
+        return 'pedido', match.group(1) if match else None
+    if any(k in mensagem.lower() for k in ['produto', 'produtos', 'notebook', 'smartphone', 'celular', 'computador', 'livro', 'tênis', 'panelas', 'cozinha', 'presente']):
+        texto = mensagem.lower()
+        categoria = next((c for c, ks in CATEGORIAS.items() if any(k in texto for k in ks)), None)
+        filtrar = 'produtos' in mensagem.lower() or 'presente' in mensagem.lower() or 'cozinha' in mensagem.lower()
+        return 'produtos', categoria, filtrar
+    if any(k in mensagem.lower() for k in ['política', 'politica', 'troca', 'devolução', 'devolucao', 'entrega', 'pagamento', 'garantia', 'prazo', 'suporte']):
+        return 'politicas'
+    return 'geral'
+
+
+def medir(funcao, mensagens, repeticoes):
+    total = timeit.timeit(lambda: [funcao(m) for m in mensagens], number=repeticoes)
+    return total / (repeticoes * len(mensagens)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticoes', type=int, default=20000)
+    args = parser.parse_args()
+
+    router = IntentRouter.from_file()
+    longas = [' '.join([m] * 20) for m in MENSAGENS]
+    for titulo, mensagens, repeticoes in (('curtas', MENSAGENS, args.repeticoes),
+                                          ('longas (20x)', longas, max(1, args.repeticoes // 20))):
+        print(f"mensagens {titulo}:")
+        print(f"  IntentRouter.classificar: {medir(router.classificar, mensagens, repeticoes):.2f} µs/mensagem")
+        print(f"  verificações encadeadas:  {medir(roteamento_encadeado, mensagens, repeticoes):.2f} µs/mensagem")
+
+
+if __name__ == '__main__':
+    main()
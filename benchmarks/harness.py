@@ -0,0 +1,90 @@
+"""Utilitários de medição dos benchmarks: carga concorrente, percentis e memória."""
+import asyncio
+import resource
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterable, List
+
+
+def percentil(ordenadas: List[float], p: float) -> float:
+    """Percentil por interpolação linear sobre amostras já ordenadas."""
+    if not ordenadas:
+        return 0.0
+    posicao = (len(ordenadas) - 1) * p / 100
+    base = int(posicao)
+    proximo = min(base + 1, len(ordenadas) - 1)
+    return ordenadas[base] + (ordenadas[proximo] - ordenadas[base]) * (posicao - base)
+
+
+def resumo_latencias(segundos: List[float]) -> Dict[str, float]:
+    """p50/p95/p99, média e máximo, em milissegundos."""
+    ordenadas = sorted(s * 1000 for s in segundos)
+    return {
+        'p50': round(percentil(ordenadas, 50), 3),
+        'p95': round(percentil(ordenadas, 95), 3),
+        'p99': round(percentil(ordenadas, 99), 3),
+        'media': round(statistics.fmean(ordenadas), 3) if ordenadas else 0.0,
+        'max': round(ordenadas[-1], 3) if ordenadas else 0.0,
+    }
+
+
+async def carga(funcao: Callable[..., Awaitable], argumentos: Iterable, concorrencia: int = 1) -> Dict:
+    """Executa funcao(arg) para cada argumento com `concorrencia` chamadas simultâneas.
+
+    Retorna a vazão (requisições por segundo), os percentis de latência e o número de erros.
+    """
+    fila = iter(list(argumentos))
+    latencias: List[float] = []
+    erros = 0
+
+    async def trabalhador():
+        nonlocal erros
+        for argumento in fila:
+            inicio = time.perf_counter()
+            try:
+                await funcao(argumento)
+            except Exception:
+                erros += 1
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(max(1, concorrencia))))
+    duracao = time.perf_counter() - inicio
+    return {
+        'requisicoes': len(latencias),
+        'concorrencia': concorrencia,
+        'erros': erros,
+        'duracao_s': round(duracao, 4),
+        'vazao_rps': round(len(latencias) / duracao, 2) if duracao else 0.0,
+        'latencia_ms': resumo_latencias(latencias),
+    }
+
+
+@contextmanager
+def pico_memoria(resultado: Dict, chave: str = 'pico_memoria_mb', ativo: bool = True):
+    """Registra em resultado[chave] o pico de memória alocada (tracemalloc) no bloco.
+
+    O tracemalloc deixa as alocações bem mais lentas; por isso os benchmarks o usam só na
+    preparação (construção de índices) e medem as latências com ele desligado.
+    """
+    if not ativo:
+        yield
+        return
+    ja_ativo = tracemalloc.is_tracing()
+    if not ja_ativo:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        yield
+    finally:
+        _, pico = tracemalloc.get_traced_memory()
+        if not ja_ativo:
+            tracemalloc.stop()
+        resultado[chave] = round(pico / 2**20, 2)
+
+
+def rss_maximo_mb() -> float:
+    """Maior RSS do processo até agora (ru_maxrss é em KiB no Linux)."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
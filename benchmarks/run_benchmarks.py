@@ -0,0 +1,318 @@
+"""Benchmarks dos caminhos críticos do assistente, offline e com resultados em JSON.
+
+Cenários:
+  busca_produtos     RAGSystem.search_products sobre catálogos sintéticos (1k/10k/100k)
+  base_conhecimento  query_knowledge_base sobre um corpus gerado (FAISS real)
+  pedidos            AssistenteVirtual._buscar_pedido sobre pedidos.json grandes (memory e sqlite)
+  chat               POST /chat ponta a ponta pelo ASGI, com latência simulada do LLM
+
+Usa os provedores locais (ASSISTENTE_EMBEDDINGS=hashing, ASSISTENTE_LLM=echo) e um INDEX_DIR
+temporário. Cada cenário registra vazão, latência p50/p95/p99 e pico de memória na preparação
+(medido com tracemalloc, que também infla o tempo de preparação; use --sem-memoria para
+medir só o tempo).
+
+    python benchmarks/run_benchmarks.py [--rapido] [--cenarios chat pedidos] [--saida arquivo.json]
+    python benchmarks/run_benchmarks.py --comparar benchmarks/results/anterior.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / 'results'
+CENARIOS = ('busca_produtos', 'base_conhecimento', 'pedidos', 'chat')
+
+
+def configurar_ambiente(diretorio: Path, latencia_llm_ms: float, com_cache: bool):
+    """Provedores locais e estado em diretório temporário; precisa rodar antes de importar src/."""
+    os.environ.setdefault('ASSISTENTE_EMBEDDINGS', 'hashing')
+    os.environ['ASSISTENTE_LLM'] = 'echo'
+    os.environ['ASSISTENTE_LLM_LATENCY_MS'] = str(latencia_llm_ms)
+    os.environ['INDEX_DIR'] = str(diretorio / 'index')
+    os.environ['EMBEDDING_CACHE_DB'] = ''
+    os.environ['CHAT_HISTORY_BACKEND'] = 'memory'
+    if not com_cache:
+        # Mede o caminho completo até o LLM, sem acertos no cache de respostas
+        os.environ['RESPONSE_CACHE_MAX_ENTRIES'] = '0'
+        os.environ['RESPONSE_CACHE_SIMILARITY'] = '0'
+    sys.path.insert(0, str(PROJECT_ROOT / 'src'))
+    sys.path.insert(0, str(BENCH_DIR))
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconhecido'
+
+
+def chave(resultado: Dict) -> str:
+    parametros = ','.join(f'{k}={v}' for k, v in sorted(resultado['parametros'].items()))
+    return f"{resultado['cenario']}[{parametros}]@c{resultado['concorrencia']}"
+
+
+def rag_com_catalogo(produtos: List[Dict], diretorio: Path):
+    """RAGSystem com o catálogo sintético, compilado e mapeado como o de data/produtos.json."""
+    from catalog_store import CatalogStore, compile_catalog
+    from product_index import ProductIndex
+    from rag_system import RAGSystem
+
+    rag = RAGSystem()
+    rag.produtos = CatalogStore.open(compile_catalog(produtos, diretorio))
+    rag.product_index = ProductIndex(rag.produtos, rag.embeddings, index_dir=diretorio)
+    return rag
+
+
+async def bench_busca_produtos(args, diretorio: Path) -> List[Dict]:
+    from harness import carga, pico_memoria
+    from sinteticos import gerar_consultas_produtos, gerar_produtos
+
+    resultados = []
+    consultas = gerar_consultas_produtos(args.consultas)
+    for n in args.produtos:
+        preparo: Dict = {}
+        rag = rag_com_catalogo(gerar_produtos(n), diretorio / f'produtos_{n}')
+        inicio = time.perf_counter()
+        with pico_memoria(preparo, ativo=args.memoria):
+            await rag.product_index.ensure_ready()
+        preparo['preparo_s'] = round(time.perf_counter() - inicio, 3)
+
+        for concorrencia in args.concorrencia:
+            medicao = await carga(rag.search_products, consultas, concorrencia)
+            resultados.append({'cenario': 'busca_produtos', 'parametros': {'produtos': n}, **preparo, **medicao})
+    return resultados
+
+
+async def bench_base_conhecimento(args, diretorio: Path) -> List[Dict]:
+    from harness import carga, pico_memoria
+    from knowledge_index import KnowledgeIndex
+    from sinteticos import gerar_base_conhecimento
+
+    dados = diretorio / 'conhecimento'
+    consultas = gerar_base_conhecimento(dados, args.documentos)
+    rag = rag_com_catalogo([], diretorio / 'produtos_vazio')
+    index = KnowledgeIndex(rag.embeddings, data_dir=dados, index_dir=diretorio / 'index_conhecimento',
+                           sources=['knowledge/*.md'])
+
+    preparo: Dict = {}
+    inicio = time.perf_counter()
+    with pico_memoria(preparo, ativo=args.memoria):
+        await asyncio.to_thread(index.load)
+    preparo['preparo_s'] = round(time.perf_counter() - inicio, 3)
+    # Segunda carga: nada mudou, só lê o índice persistido
+    inicio = time.perf_counter()
+    rag.knowledge_base = await asyncio.to_thread(index.load)
+    preparo['recarga_s'] = round(time.perf_counter() - inicio, 3)
+    rag.knowledge_lexical, rag.knowledge_version, rag.knowledge_loaded = index.lexical, index.version, True
+
+    resultados = []
+    for concorrencia in args.concorrencia:
+        medicao = await carga(rag.query_knowledge_base, consultas * max(1, args.consultas // len(consultas)),
+                              concorrencia)
+        resultados.append({'cenario': 'base_conhecimento', 'parametros': {'documentos': args.documentos},
+                           **preparo, **medicao})
+    return resultados
+
+
+async def bench_pedidos(args, diretorio: Path) -> List[Dict]:
+    from assistente import AssistenteVirtual
+    from harness import carga, pico_memoria
+    from order_store import JsonOrderStore, SqliteOrderStore
+    from sinteticos import escrever_json, gerar_pedidos, gerar_produtos
+
+    catalogo = gerar_produtos(200)
+    assistente = AssistenteVirtual(rag_system=rag_com_catalogo(catalogo, diretorio / 'produtos_pedidos'))
+    rng = random.Random(3)
+    resultados = []
+    for n in args.pedidos:
+        arquivo = escrever_json(diretorio / f'pedidos_{n}.json', gerar_pedidos(n, catalogo))
+        # 10% das consultas são de pedidos inexistentes
+        mensagens = [f'Qual o status do pedido #{100000 + rng.randrange(int(n * 1.1))}?'
+                     for _ in range(args.consultas)]
+        for backend in ('memory', 'sqlite'):
+            if backend == 'memory':
+                assistente.pedidos = JsonOrderStore(arquivo)
+            else:
+                assistente.pedidos = SqliteOrderStore(arquivo, diretorio / f'pedidos_{n}.sqlite')
+
+            preparo: Dict = {}
+            inicio = time.perf_counter()
+            with pico_memoria(preparo, ativo=args.memoria):
+                assistente.pedidos.get('0')
+            preparo['preparo_s'] = round(time.perf_counter() - inicio, 3)
+
+            async def buscar(mensagem):
+                return assistente._buscar_pedido(mensagem)
+
+            for concorrencia in args.concorrencia:
+                medicao = await carga(buscar, mensagens, concorrencia)
+                resultados.append({'cenario': 'pedidos', 'parametros': {'pedidos': n, 'backend': backend},
+                                   **preparo, **medicao})
+    return resultados
+
+
+async def bench_chat(args, diretorio: Path) -> List[Dict]:
+    import httpx
+
+    import api
+    from harness import carga
+
+    bases = [
+        'Vocês têm notebook para trabalho?',
+        'Qual a política de garantia da loja?',
+        'Qual o status do pedido #12345?',
+        'Como funciona o pagamento?',
+        'Quero um presente de cozinha',
+        'Olá, preciso de ajuda',
+    ]
+    # Sufixo único por requisição: sem repetição exata entre mensagens
+    mensagens = [f'{bases[i % len(bases)]} (atendimento {i})' for i in range(args.requisicoes_chat)]
+
+    resultados = []
+    async with api.lifespan(api.app):
+        preparo: Dict = {}
+        inicio = time.perf_counter()
+        while not api.app.state.rag_system.ready:
+            if api.app.state.warmup_error is not None:
+                raise api.app.state.warmup_error
+            await asyncio.sleep(0.01)
+        preparo['preparo_s'] = round(time.perf_counter() - inicio, 3)
+
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            async def conversar(mensagem):
+                resposta = await client.post('/chat', json={
+                    'content': mensagem, 'context': {'session_id': f'bench-{hash(mensagem) % 50}'},
+                })
+                resposta.raise_for_status()
+
+            # Aquecimento: imports tardios e primeira montagem de prompt fora da medição
+            for base in bases:
+                await conversar(base)
+
+            for concorrencia in args.concorrencia_chat:
+                medicao = await carga(conversar, mensagens, concorrencia)
+                resultados.append({'cenario': 'chat', 'parametros': {'latencia_llm_ms': args.latencia_llm_ms},
+                                   **preparo, **medicao})
+    return resultados
+
+
+def comparar(atual: Dict, anterior: Dict, tolerancia: float) -> int:
+    """Imprime a variação de p95 e vazão por cenário e retorna o número de regressões."""
+    antes = {chave(r): r for r in anterior['resultados']}
+    regressoes = 0
+    print(f"\nComparação com {anterior.get('commit', '?')} (tolerância {tolerancia:.0%}):")
+    for resultado in atual['resultados']:
+        anterior_r = antes.get(chave(resultado))
+        if anterior_r is None:
+            continue
+        p95_antes, p95 = anterior_r['latencia_ms']['p95'], resultado['latencia_ms']['p95']
+        vazao_antes, vazao = anterior_r['vazao_rps'], resultado['vazao_rps']
+        variacao_p95 = p95 / p95_antes - 1 if p95_antes else 0.0
+        variacao_vazao = vazao / vazao_antes - 1 if vazao_antes else 0.0
+        regrediu = variacao_p95 > tolerancia or variacao_vazao < -tolerancia
+        regressoes += regrediu
+        print(f"  {'REGRESSÃO ' if regrediu else ''}{chave(resultado)}: "
+              f"p95 {p95_antes:.2f} -> {p95:.2f} ms ({variacao_p95:+.1%}), "
+              f"vazão {vazao_antes:.1f} -> {vazao:.1f} rps ({variacao_vazao:+.1%})")
+    return regressoes
+
+
+def imprimir(resultado: Dict):
+    latencia = resultado['latencia_ms']
+    print(f"{chave(resultado)}: {resultado['vazao_rps']:.1f} rps, "
+          f"p50 {latencia['p50']:.2f} / p95 {latencia['p95']:.2f} / p99 {latencia['p99']:.2f} ms, "
+          f"preparo {resultado.get('preparo_s', 0):.2f} s"
+          + (f", pico {resultado['pico_memoria_mb']:.1f} MB" if 'pico_memoria_mb' in resultado else '')
+          + (f", {resultado['erros']} erros" if resultado['erros'] else ''))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cenarios', nargs='+', choices=CENARIOS, default=list(CENARIOS))
+    parser.add_argument('--produtos', nargs='+', type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument('--pedidos', nargs='+', type=int, default=[10_000, 100_000])
+    parser.add_argument('--documentos', type=int, default=300)
+    parser.add_argument('--consultas', type=int, default=500, help='consultas por cenário de busca/pedidos')
+    parser.add_argument('--concorrencia', nargs='+', type=int, default=[1, 16])
+    parser.add_argument('--requisicoes-chat', type=int, default=200)
+    parser.add_argument('--concorrencia-chat', nargs='+', type=int, default=[1, 16, 64])
+    parser.add_argument('--latencia-llm-ms', type=float, default=50.0)
+    parser.add_argument('--com-cache', action='store_true', help='mantém o cache de respostas ligado no /chat')
+    parser.add_argument('--sem-memoria', dest='memoria', action='store_false',
+                        help='não mede o pico de memória (o tracemalloc deixa a preparação mais lenta)')
+    parser.add_argument('--rapido', action='store_true', help='tamanhos pequenos, para verificar o script')
+    parser.add_argument('--saida', type=Path, help='arquivo JSON (padrão: benchmarks/results/<commit>.json)')
+    parser.add_argument('--comparar', type=Path, help='resultado anterior para detectar regressões')
+    parser.add_argument('--tolerancia', type=float, default=0.10)
+    args = parser.parse_args(argv)
+    if args.rapido:
+        args.produtos, args.pedidos, args.documentos = [200], [1_000], 20
+        args.consultas, args.requisicoes_chat = 50, 24
+        args.concorrencia, args.concorrencia_chat, args.latencia_llm_ms = [1, 4], [1, 8], 5.0
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory(prefix='bench-assistente-') as tmp:
+        diretorio = Path(tmp)
+        configurar_ambiente(diretorio, args.latencia_llm_ms, args.com_cache)
+        from harness import rss_maximo_mb
+
+        funcoes = {
+            'busca_produtos': bench_busca_produtos,
+            'base_conhecimento': bench_base_conhecimento,
+            'pedidos': bench_pedidos,
+            'chat': bench_chat,
+        }
+        resultados = []
+        for cenario in args.cenarios:
+            for resultado in asyncio.run(funcoes[cenario](args, diretorio)):
+                imprimir(resultado)
+                resultados.append(resultado)
+
+    commit = commit_atual()
+    relatorio = {
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'ambiente': {
+            'embeddings': os.environ['ASSISTENTE_EMBEDDINGS'],
+            'embeddings_dim': int(os.getenv('ASSISTENTE_EMBEDDINGS_DIM', '384')),
+            'latencia_llm_ms': args.latencia_llm_ms,
+            'cache_respostas': args.com_cache,
+        },
+        'rss_maximo_mb': rss_maximo_mb(),
+        'resultados': resultados,
+    }
+    saida = args.saida or RESULTS_DIR / f'{commit}.json'
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f'\nResultados em {saida}')
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            regressoes = comparar(relatorio, json.load(f), args.tolerancia)
+        if regressoes:
+            print(f'{regressoes} regressão(ões) acima da tolerância')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Geradores determinísticos de dados sintéticos (catálogo, pedidos e base de conhecimento)."""
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+CATEGORIAS = {
+    'Eletrônicos': (['Notebook', 'Smartphone', 'Monitor', 'Fone de Ouvido', 'Tablet', 'Smartwatch'],
+                    ['Dell', 'Samsung', 'LG', 'Lenovo', 'Xiaomi', 'Apple', 'Motorola']),
+    'Casa': (['Jogo de Panelas', 'Liquidificador', 'Cafeteira', 'Air Fryer', 'Jogo de Facas', 'Aspirador'],
+             ['Tramontina', 'Philips', 'Mondial', 'Electrolux', 'Oster', 'Britânia']),
+    'Esportes': (['Tênis de Corrida', 'Bola de Futebol', 'Bicicleta', 'Mochila', 'Esteira', 'Halteres'],
+                 ['Nike', 'Adidas', 'Asics', 'Caloi', 'Penalty', 'Olympikus']),
+    'Livros': (['Livro Python para Iniciantes', 'Livro de Receitas', 'Romance', 'Livro de Finanças',
+                'Guia de Viagem', 'Livro Infantil'],
+               ['Novatec', 'Companhia das Letras', 'Rocco', 'Intrínseca', 'Sextante', 'Globo']),
+}
+
+ADJETIVOS = ['ideal para o dia a dia', 'com ótimo custo-benefício', 'resistente e durável',
+             'leve e compacto', 'de alta performance', 'com acabamento premium', 'para iniciantes']
+
+STATUS_PEDIDO = ['Em processamento', 'Em trânsito', 'Entregue', 'Cancelado']
+
+TOPICOS = {
+    'entrega': ['prazo de entrega', 'frete grátis', 'transportadora', 'rastreamento', 'endereço', 'dias úteis'],
+    'pagamento': ['cartão de crédito', 'boleto', 'pix', 'parcelamento', 'estorno', 'nota fiscal'],
+    'garantia': ['garantia', 'defeito', 'assistência técnica', 'reparo', 'fabricante', '90 dias'],
+    'trocas': ['troca', 'devolução', 'embalagem original', 'reembolso', '7 dias corridos', 'arrependimento'],
+    'suporte': ['atendimento', 'chat', 'e-mail', 'horário comercial', 'protocolo', 'ouvidoria'],
+}
+
+
+def gerar_produtos(n: int, seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    produtos = []
+    categorias = list(CATEGORIAS)
+    for i in range(n):
+        categoria = categorias[i % len(categorias)]
+        tipos, marcas = CATEGORIAS[categoria]
+        tipo, marca = rng.choice(tipos), rng.choice(marcas)
+        produtos.append({
+            'id': f'PROD{i:07d}',
+            'nome': f'{tipo} {marca} {rng.randint(1, 999)}',
+            'categoria': categoria,
+            'preco': round(rng.uniform(20, 8000), 2),
+            'descricao': f'{tipo} da marca {marca}, {rng.choice(ADJETIVOS)} e {rng.choice(ADJETIVOS)}.',
+            'especificacoes': {'marca': marca, 'modelo': f'{rng.randint(100, 9999)}', 'cor': rng.choice(
+                ['preto', 'branco', 'azul', 'vermelho', 'cinza'])},
+            'disponivel': rng.random() > 0.2,
+        })
+    return produtos
+
+
+def gerar_consultas_produtos(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    consultas = []
+    for _ in range(n):
+        categoria = rng.choice(list(CATEGORIAS))
+        tipos, marcas = CATEGORIAS[categoria]
+        consultas.append(f'Quero um {rng.choice(tipos).lower()} {rng.choice(marcas)} {rng.choice(ADJETIVOS)}')
+    return consultas
+
+
+def gerar_pedidos(n: int, catalogo: List[Dict], seed: int = 42) -> List[Dict]:
+    rng = random.Random(seed)
+    pedidos = []
+    for i in range(n):
+        itens = rng.sample(catalogo, k=min(len(catalogo), rng.randint(1, 3)))
+        pedidos.append({
+            'pedido_id': str(100000 + i),
+            'status': rng.choice(STATUS_PEDIDO),
+            'produtos': [{'id': p['id'], 'nome': p['nome']} for p in itens],
+            'data_compra': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'previsao_entrega': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+        })
+    return pedidos
+
+
+def gerar_base_conhecimento(diretorio: Path, documentos: int, paragrafos: int = 12, seed: int = 42) -> List[str]:
+    """Escreve `documentos` arquivos em diretorio/knowledge e retorna consultas de exemplo."""
+    rng = random.Random(seed)
+    pasta = Path(diretorio) / 'knowledge'
+    pasta.mkdir(parents=True, exist_ok=True)
+    consultas = []
+    for i in range(documentos):
+        topico = rng.choice(list(TOPICOS))
+        termos = TOPICOS[topico]
+        linhas = [f'# {topico.capitalize()} — documento {i}', '']
+        for _ in range(paragrafos):
+            a, b, c = rng.sample(termos, 3)
+            linhas.append(f'Sobre {a}: o cliente deve considerar {b} e também {c}, '
+                          f'conforme as regras de {topico} válidas para a loja {i % 17}.')
+            linhas.append('')
+        (pasta / f'doc_{i:05d}.md').write_text('\n'.join(linhas), encoding='utf-8')
+        consultas.append(f'Como funciona {rng.choice(termos)} na política de {topico}?')
+    return consultas
+
+
+def escrever_json(caminho: Path, dados) -> Path:
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False)
+    return Path(caminho)
@@ -0,0 +1,95 @@
+"""Verifica se os workers de uma instância em execução compartilham estado.
+
+Cada requisição abre uma conexão nova, para que o kernel a entregue a workers diferentes.
+Confere que:
+  - todos os workers vistos servem a mesma versão de catálogo e base de conhecimento;
+  - o histórico gravado por um worker é lido por todos;
+  - o cache de respostas tem o mesmo número de entradas em todos (backend compartilhado).
+
+    python deploy/check_shared_state.py --url http://127.0.0.1:8000 --workers 4
+"""
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Dict, Optional
+
+
+def requisicao(url: str, metodo: str = 'GET', corpo: Optional[Dict] = None, timeout: float = 30) -> Dict:
+    dados = json.dumps(corpo).encode('utf-8') if corpo is not None else None
+    req = urllib.request.Request(url, data=dados, method=metodo,
+                                 headers={'Content-Type': 'application/json', 'Connection': 'close'})
+    with urllib.request.urlopen(req, timeout=timeout) as resposta:
+        return json.loads(resposta.read().decode('utf-8'))
+
+
+def esperar_pronto(base: str, prazo: float):
+    limite = time.monotonic() + prazo
+    while True:
+        try:
+            requisicao(f'{base}/health/ready', timeout=5)
+            return
+        except (urllib.error.URLError, OSError):
+            if time.monotonic() > limite:
+                raise SystemExit(f'{base} não ficou pronto em {prazo:.0f}s')
+            time.sleep(0.5)
+
+
+def verificar(base: str, workers: int, tentativas: int) -> bool:
+    sessao = f'verificacao-{uuid.uuid4().hex[:8]}'
+    # Pergunta respondida pelo LLM: passa pelo cache de respostas e pelo histórico
+    mensagem = f'Qual a política de garantia? ({sessao})'
+    requisicao(f'{base}/chat', 'POST', {'content': mensagem, 'context': {'session_id': sessao}})
+
+    vistos: Dict[int, Dict] = {}
+    leituras_sem_historico = 0
+    for _ in range(tentativas):
+        stats = requisicao(f'{base}/stats')
+        if not stats.get('ready'):
+            # Worker ainda aquecendo os índices
+            time.sleep(0.2)
+            continue
+        vistos.setdefault(stats['worker'], stats)
+        if requisicao(f'{base}/chat/history?session_id={sessao}')['total'] < 1:
+            leituras_sem_historico += 1
+        if len(vistos) >= workers:
+            break
+
+    ok = True
+    print(f'workers vistos: {sorted(vistos)}')
+    if len(vistos) < min(workers, 2):
+        print(f'FALHA: só {len(vistos)} worker(s) pronto(s) em {tentativas} tentativas')
+        ok = False
+    versoes = {stats['data_version'] for stats in vistos.values()}
+    if len(versoes) != 1:
+        print(f'FALHA: versões de dados diferentes entre workers: {sorted(versoes)}')
+        ok = False
+    if leituras_sem_historico:
+        print(f'FALHA: {leituras_sem_historico} leitura(s) do histórico não viram a mensagem gravada')
+        ok = False
+    entradas = {stats['response_cache']['entries'] for stats in vistos.values()}
+    if len(entradas) != 1 or 0 in entradas:
+        print(f'FALHA: cache de respostas não compartilhado (entradas por worker: {sorted(entradas)})')
+        ok = False
+    requisicao(f'{base}/chat/history?session_id={sessao}', 'DELETE')
+    print('OK: estado compartilhado entre os workers' if ok else 'Estado NÃO compartilhado')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--workers', type=int, default=2, help='workers esperados')
+    parser.add_argument('--tentativas', type=int, default=200)
+    parser.add_argument('--prazo', type=float, default=300, help='segundos de espera pelo /health/ready')
+    args = parser.parse_args()
+    base = args.url.rstrip('/')
+    esperar_pronto(base, args.prazo)
+    sys.exit(0 if verificar(base, args.workers, args.tentativas) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""Configuração do gunicorn com workers do uvicorn, equivalente ao src/launcher.py.
+
+    gunicorn -c deploy/gunicorn.conf.py api:app
+
+O hook on_starting roda no processo mestre: escolhe os backends compartilhados e constrói
+os índices uma vez, antes dos workers subirem.
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+sys.path.insert(0, str(SRC_DIR))
+
+from launcher import configurar_estado_compartilhado, numero_workers, preparar_indices  # noqa: E402
+
+chdir = str(SRC_DIR)
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = numero_workers()
+worker_class = 'uvicorn.workers.UvicornWorker'
+# O aquecimento dos índices acontece no lifespan de cada worker, depois do boot
+timeout = 120
+
+
+def on_starting(server):
+    configurar_estado_compartilhado(workers)
+    asyncio.run(preparar_indices())
@@ -0,0 +1,28 @@
+#!/usr/bin/env bash
+# Sobe a API com vários workers (um por CPU, ou WEB_CONCURRENCY) e confere, assim que os
+# índices ficam prontos, se os workers compartilham estado. Se a verificação falhar, o
+# servidor é encerrado e o script sai com erro.
+#
+#   deploy/start.sh                  # porta 8000, um worker por CPU
+#   WEB_CONCURRENCY=4 PORT=9000 deploy/start.sh
+set -euo pipefail
+
+cd "$(dirname "$0")/.."
+PORT="${PORT:-8000}"
+PYTHON="${PYTHON:-python}"
+WORKERS="${WEB_CONCURRENCY:-$("$PYTHON" -c 'import sys; sys.path.insert(0, "src"); from launcher import numero_workers; print(numero_workers())')}"
+
+"$PYTHON" src/launcher.py --port "$PORT" --workers "$WORKERS" &
+SERVER_PID=$!
+trap 'kill "$SERVER_PID" 2>/dev/null || true' INT TERM
+
+if [ "$WORKERS" -gt 1 ]; then
+    if ! "$PYTHON" deploy/check_shared_state.py --url "http://127.0.0.1:$PORT" --workers "$WORKERS"; then
+        echo "Workers sem estado compartilhado; encerrando." >&2
+        kill "$SERVER_PID"
+        wait "$SERVER_PID" || true
+        exit 1
+    fi
+fi
+
+wait "$SERVER_PID"
@@ -1,17 +1,27 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager, suppress
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
-from typing import Dict, List, Optional
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Literal, Optional
 from pathlib import Path
 from dotenv import load_dotenv
+import asyncio
+import hmac
 import logging
+import os
 import re
 import json
+import time
 
 from assistente import AssistenteVirtual
+from chat_history import DEFAULT_SESSION, session_id_from_context
+from ingestion import INGEST_DIR, ErroIngestao, ingerir
+from metrics import (HTTP_SECONDS, REGISTRY, request_notes, request_timings, reset_request_timing,
+                     server_timing_header, start_request_timing)
 from rag_system import RAGSystem
+from registros import ErroFormato
 
 load_dotenv()
 
@@ -22,6 +32,18 @@ logger = logging.getLogger(__name__)
 BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "static"
 
+# Default number of messages of a /chat/batch request processed at the same time
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+
+# Adds a Server-Timing header with the duration of each processing stage
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in ("1", "true", "yes")
+
+# Token required (X-Admin-Token header) by the /admin endpoints; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# How often (seconds) each worker checks for a catalog activated by another process; 0 disables
+CATALOG_REFRESH_INTERVAL = float(os.getenv("CATALOG_REFRESH_INTERVAL", "30"))
+
 
 def handle_error(endpoint: str, error: Exception) -> JSONResponse:
     """Log the error and return a standardized JSON response."""
@@ -31,10 +53,49 @@ def handle_error(endpoint: str, error: Exception) -> JSONResponse:
         content={"error": "Ocorreu um erro interno. Por favor, tente novamente mais tarde."},
     )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the shared RAG engine once and warm its indexes in the background."""
+    rag_system = RAGSystem()
+    app.state.rag_system = rag_system
+    app.state.assistente = AssistenteVirtual(rag_system=rag_system)
+    app.state.warmup_error = None
+    app.state.ingestion = None
+    app.state.ingestion_info = None
+
+    async def warmup():
+        try:
+            await rag_system.warmup()
+        except Exception as e:
+            app.state.warmup_error = e
+            logger.exception("Error warming up indexes: %s", e)
+
+    async def refresh_catalog():
+        # Picks up catalogs ingested through another worker or the CLI
+        while True:
+            await asyncio.sleep(CATALOG_REFRESH_INTERVAL)
+            try:
+                await rag_system.refresh_products()
+            except Exception as e:
+                logger.exception("Error reloading the product catalog: %s", e)
+
+    tasks = [asyncio.create_task(warmup())]
+    if CATALOG_REFRESH_INTERVAL > 0:
+        tasks.append(asyncio.create_task(refresh_catalog()))
+    yield
+    if app.state.ingestion is not None:
+        tasks.append(app.state.ingestion)
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+
 app = FastAPI(
     title="Assistente Virtual E-commerce",
     description="API para o assistente virtual de e-commerce",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -46,12 +107,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+async def instrument_requests(request: Request, call_next):
+    """Record request latency per route and, when enabled, the Server-Timing header.
+
+    Streaming (SSE) responses get no Server-Timing: their headers go out before the body
+    runs, so the header would only cover the stages finished before the first token.
+    """
+    token = start_request_timing() if SERVER_TIMING else None
+    inicio = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        timings = request_timings() if token is not None else None
+        notes = request_notes() if token is not None else None
+        if token is not None:
+            reset_request_timing(token)
+    # Route templates (not raw paths) keep the label cardinality bounded
+    route = getattr(request.scope.get("route"), "path", "other")
+    HTTP_SECONDS.observe(time.perf_counter() - inicio, request.method, route, str(response.status_code))
+    streaming = response.headers.get("content-type", "").startswith("text/event-stream")
+    if (timings or notes) and not streaming:
+        response.headers["Server-Timing"] = server_timing_header(timings, notes)
+    return response
+
+# Without metrics or Server-Timing there is nothing to record, so skip the middleware entirely
+if REGISTRY.enabled or SERVER_TIMING:
+    app.middleware("http")(instrument_requests)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
-# Initialize components
-assistente = AssistenteVirtual()
-rag_system = RAGSystem()
+def get_assistente(request: Request) -> AssistenteVirtual:
+    """Shared assistant created in the lifespan hook."""
+    return request.app.state.assistente
+
+def get_rag_system(request: Request) -> RAGSystem:
+    """Shared RAG engine created in the lifespan hook."""
+    return request.app.state.rag_system
 
 class ChatRequest(BaseModel):
     content: str
@@ -60,10 +152,34 @@ class ChatRequest(BaseModel):
 class SearchRequest(BaseModel):
     query: str
     filters: Optional[Dict] = None
+    k: int = Field(5, ge=1, le=100)
+    min_score: Optional[float] = None
+
+class ChatBatchRequest(BaseModel):
+    messages: List[ChatRequest] = Field(..., min_length=1, max_length=1000)
+    concurrency: Optional[int] = Field(None, ge=1, le=64)
+
+class SearchBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=1000)
+    filters: Optional[Dict] = None
+    k: int = Field(5, ge=1, le=100)
+    min_score: Optional[float] = None
 
 class KnowledgeRequest(BaseModel):
     query: str
 
+class IngestRequest(BaseModel):
+    kind: Literal["produtos", "pedidos"]
+    # Array JSON or JSONL file, relative to INGEST_DIR
+    path: str
+
+def require_admin(request: Request):
+    """Check the X-Admin-Token header; without ADMIN_TOKEN the admin endpoints do not exist."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Endpoints de admin desativados (ADMIN_TOKEN não definido)")
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Token de admin inválido")
+
 @app.get("/")
 async def read_root():
     """
@@ -71,26 +187,139 @@ async def read_root():
     """
     return FileResponse(str(STATIC_DIR / "index.html"))
 
+@app.get("/health")
+async def health():
+    """Verifica o status do servidor."""
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+async def health_ready(request: Request, rag_system: RAGSystem = Depends(get_rag_system)):
+    """Informa se os índices de produtos e da base de conhecimento já estão carregados."""
+    if request.app.state.warmup_error is not None:
+        status = "error"
+    else:
+        status = "ready" if rag_system.ready else "warming"
+    return JSONResponse(
+        status_code=200 if status == "ready" else 503,
+        content={"status": status, **rag_system.readiness()},
+    )
+
+@app.get("/stats")
+async def stats(assistente: AssistenteVirtual = Depends(get_assistente),
+                rag_system: RAGSystem = Depends(get_rag_system)):
+    """Estatísticas dos caches (acertos, erros e chamadas ao LLM economizadas).
+
+    Com vários workers, os contadores são do worker que respondeu (identificado por ``worker``).
+    """
+    return {
+        "worker": os.getpid(),
+        "ready": rag_system.ready,
+        "data_version": rag_system.data_version(),
+        "response_cache": assistente.response_cache.stats(),
+        "query_embeddings": rag_system.query_embedder.stats(),
+        "embedding_cache": rag_system.embeddings.cache.stats(),
+        "llm_gateway": assistente.llm.stats(),
+        "prompt_builder": assistente.prompt_builder.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas no formato texto do Prometheus (etapas, intents, cache, embeddings, LLM e HTTP)."""
+    if not REGISTRY.enabled:
+        raise HTTPException(status_code=404, detail="Métricas desativadas (METRICS_ENABLED=0)")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, assistente: AssistenteVirtual = Depends(get_assistente)):
     """Processa uma mensagem do usuário e retorna a resposta do assistente."""
     try:
         resposta = await assistente.processar_mensagem(request.content, request.context)
-        return {"response": resposta}
+        return {"response": resposta, "session_id": session_id_from_context(request.context)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest, assistente: AssistenteVirtual = Depends(get_assistente)):
+    """Processa um lote de mensagens com concorrência limitada; cada item tem seu status."""
+    concorrencia = request.concurrency or CHAT_BATCH_CONCURRENCY
+    resultados = await assistente.processar_mensagens(
+        [(item.content, item.context) for item in request.messages], concorrencia
+    )
+    return {"results": resultados}
+
+def sse_event(data: Dict, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Events message."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, assistente: AssistenteVirtual = Depends(get_assistente)):
+    """Processa uma mensagem e envia a resposta em streaming (Server-Sent Events)."""
+    async def eventos():
+        async for parte in assistente.processar_mensagem_stream(request.content, request.context):
+            yield sse_event({"token": parte})
+        yield sse_event({"session_id": session_id_from_context(request.context)}, event="done")
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """Chat via WebSocket: recebe {content, context} e envia os pedaços da resposta."""
+    await websocket.accept()
+    assistente = websocket.app.state.assistente
+    try:
+        while True:
+            try:
+                request = ChatRequest.model_validate(json.loads(await websocket.receive_text()))
+            except (json.JSONDecodeError, ValidationError) as e:
+                # Mensagem inválida: avisa o cliente e continua esperando a próxima
+                await websocket.send_json({"type": "error", "error": type(e).__name__, "detail": str(e)})
+                continue
+            partes = []
+            async for parte in assistente.processar_mensagem_stream(request.content, request.context):
+                partes.append(parte)
+                await websocket.send_json({"type": "token", "content": parte})
+            await websocket.send_json({
+                "type": "done",
+                "response": "".join(partes),
+                "session_id": session_id_from_context(request.context),
+            })
+    except WebSocketDisconnect:
+        pass
+
 @app.post("/search/products")
-async def search_products(request: SearchRequest):
+async def search_products(request: SearchRequest, rag_system: RAGSystem = Depends(get_rag_system)):
     """Busca produtos no catálogo."""
     try:
-        produtos = await rag_system.search_products(request.query, request.filters)
-        return {"products": produtos}
+        resultados = await rag_system.search_products_scored(
+            request.query, request.filters, k=request.k, min_score=request.min_score
+        )
+        return {"products": [{**produto, "score": score} for produto, score in resultados]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/search/products/batch")
+async def search_products_batch(request: SearchBatchRequest, rag_system: RAGSystem = Depends(get_rag_system)):
+    """Busca várias consultas no catálogo com uma única chamada de embeddings."""
+    try:
+        resultados = await rag_system.search_products_batch(
+            request.queries, request.filters, k=request.k, min_score=request.min_score
+        )
+        itens = [
+            {"query": query, "status": "ok", "products": [{**produto, "score": score} for produto, score in resultado]}
+            for query, resultado in zip(request.queries, resultados)
+        ]
+    except Exception as e:
+        logger.exception("Error in /search/products/batch: %s", e)
+        itens = [{"query": query, "status": "error", "error": type(e).__name__} for query in request.queries]
+    return {"results": itens}
+
 @app.post("/query/knowledge")
-async def query_knowledge(request: KnowledgeRequest):
+async def query_knowledge(request: KnowledgeRequest, rag_system: RAGSystem = Depends(get_rag_system)):
     """Consulta a base de conhecimento."""
     try:
         info_chunks = await rag_system.query_knowledge_base(request.query)
@@ -99,22 +328,72 @@ async def query_knowledge(request: KnowledgeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/chat/history")
-async def get_chat_history():
-    """Retorna o histórico de chat."""
+async def get_chat_history(
+    session_id: str = DEFAULT_SESSION,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    assistente: AssistenteVirtual = Depends(get_assistente),
+):
+    """Retorna uma página do histórico de chat da sessão."""
     try:
-        return {"history": assistente.get_chat_history()}
+        history, total = assistente.get_chat_history(session_id, offset, limit)
+        return {"session_id": session_id, "history": history, "total": total, "offset": offset, "limit": limit}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/chat/history")
-async def clear_chat_history():
-    """Limpa o histórico de chat."""
+async def clear_chat_history(session_id: str = DEFAULT_SESSION,
+                             assistente: AssistenteVirtual = Depends(get_assistente)):
+    """Limpa o histórico de chat da sessão."""
     try:
-        assistente.clear_chat_history()
+        assistente.clear_chat_history(session_id)
         return {"message": "Histórico de chat limpo com sucesso"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/admin/ingest", status_code=202, dependencies=[Depends(require_admin)])
+async def admin_ingest(body: IngestRequest, request: Request, rag_system: RAGSystem = Depends(get_rag_system)):
+    """Inicia a ingestão de um arquivo de INGEST_DIR; o andamento fica em GET /admin/ingest."""
+    origem = (INGEST_DIR / body.path).resolve()
+    if not origem.is_relative_to(INGEST_DIR.resolve()):
+        raise HTTPException(status_code=400, detail="O arquivo deve estar em INGEST_DIR")
+    if not origem.is_file():
+        raise HTTPException(status_code=404, detail=f"Arquivo não encontrado: {body.path}")
+    state = request.app.state
+    if state.ingestion is not None and not state.ingestion.done():
+        raise HTTPException(status_code=409, detail="Já há uma ingestão em andamento neste worker")
+
+    async def executar() -> Dict:
+        try:
+            if body.kind == "produtos":
+                # Shares the embedding cache; this worker switches right away, the others on their
+                # next catalog refresh
+                resultado = await ingerir(body.kind, origem, embeddings=rag_system.embeddings)
+                await rag_system.reload_products()
+            else:
+                resultado = await ingerir(body.kind, origem)
+            return {"status": "done", **resultado._asdict()}
+        except (ErroIngestao, ErroFormato) as e:
+            return {"status": "failed", "error": str(e)}
+        except Exception as e:
+            logger.exception("Error in /admin/ingest: %s", e)
+            return {"status": "failed", "error": type(e).__name__}
+
+    state.ingestion_info = {"kind": body.kind, "path": body.path, "worker": os.getpid()}
+    state.ingestion = asyncio.create_task(executar())
+    return {"status": "running", **state.ingestion_info}
+
+@app.get("/admin/ingest", dependencies=[Depends(require_admin)])
+async def admin_ingest_status(request: Request):
+    """Andamento ou resultado da última ingestão iniciada neste worker."""
+    state = request.app.state
+    if state.ingestion is None:
+        return {"status": "idle"}
+    if not state.ingestion.done():
+        return {"status": "running", **state.ingestion_info}
+    return {**state.ingestion_info, **state.ingestion.result()}
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
+    from launcher import main
+    main()
+
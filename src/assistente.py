@@ -1,198 +1,368 @@
-import os
-from typing import Dict, List, Optional
-from langchain_openai import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import HumanMessage, SystemMessage
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
 from datetime import datetime
 from rag_system import RAGSystem
-import re
-import json
-from pathlib import Path
-from prompts import SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
+import time
+from prompts import RESPOSTA_PRAZO_TROCA, SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
+from intent_router import IntentRouter, Rota
+from order_store import PEDIDOS_FILE, create_order_store
+from response_cache import ResponseCache, create_response_cache
+from providers import create_llm
+from llm_gateway import LLMGateway, LLMGatewayError
+from metrics import (CACHE_RESULTS, CATALOG_MISMATCHES, LLM_SECONDS, LLM_TOKENS, MESSAGES, PROMPT_TOKENS, REGISTRY,
+                     note_request, span)
+from product_matcher import Divergencia, ProductMatcher
+from prompt_builder import ContextoPrompt, PromptBuilder
+from tokens import contar_tokens, contar_tokens_mensagens
+from chat_history import DEFAULT_SESSION, ChatHistoryStore, create_chat_history, session_id_from_context
 
 load_dotenv()
 
-# Get the absolute path to the project root directory
-PROJECT_ROOT = Path(__file__).parent.parent.absolute()
-PEDIDOS_FILE = PROJECT_ROOT / 'data' / 'pedidos.json'
+MENSAGEM_SEM_PRODUTOS = 'Desculpe, não encontrei produtos relevantes no nosso catálogo.'
+MENSAGEM_INDISPONIVEL = "Estamos com muitas solicitações no momento. Por favor, tente novamente em alguns instantes."
+MENSAGEM_ERRO = "Desculpe, tive um problema ao processar sua mensagem. Por favor, tente novamente em alguns instantes."
 
-def load_pedidos() -> List[Dict]:
-    """Carrega os pedidos do arquivo JSON."""
-    try:
-        if not PEDIDOS_FILE.exists():
-            return []
-            
-        with open(PEDIDOS_FILE, 'r', encoding='utf-8') as f:
-            pedidos = json.load(f)
-            
-        if not isinstance(pedidos, list):
-            return []
-            
-        return pedidos
-    except Exception:
-        return []
-
-def filtrar_resposta_produtos(resposta: str, produtos_catalogo: List[Dict]) -> str:
-    nomes_produtos = [p['nome'].lower() for p in produtos_catalogo]
-    linhas = resposta.split('\n')
-    resposta_filtrada = []
-    for linha in linhas:
-        if any(nome in linha.lower() for nome in nomes_produtos):
-            resposta_filtrada.append(linha)
-    if not resposta_filtrada:
-        return 'Desculpe, não encontrei produtos relevantes no nosso catálogo.'
-    return '\n'.join(resposta_filtrada)
+def filtrar_resposta_produtos(resposta: str, produtos_catalogo: List[Dict],
+                              matcher: Optional[ProductMatcher] = None) -> str:
+    filtro = FiltroProdutosIncremental(produtos_catalogo, matcher)
+    return ''.join(filtro.feed(resposta)) + ''.join(filtro.close())
+
+class FiltroProdutosIncremental:
+    """Aplica filtrar_resposta_produtos linha a linha sobre uma resposta recebida em partes.
+
+    Só libera uma linha quando ela termina; a concatenação de tudo que é emitido é igual ao
+    resultado de filtrar_resposta_produtos sobre a resposta completa.
+
+    Uma linha passa se cita algum dos produtos recebidos. Com o matcher do catálogo inteiro
+    (RAGSystem.product_matcher) a busca não depende do número de produtos; sem ele, monta-se
+    um matcher só com os produtos recebidos. Preços e disponibilidade das linhas aprovadas que
+    não batem com o catálogo ficam em ``divergencias``.
+    """
+
+    def __init__(self, produtos_catalogo: List[Dict], matcher: Optional[ProductMatcher] = None):
+        if matcher is None or any('id' not in p for p in produtos_catalogo):
+            self.matcher = ProductMatcher(produtos_catalogo)
+            self.permitidos = None
+        else:
+            self.matcher = matcher
+            self.permitidos = {str(p['id']) for p in produtos_catalogo}
+        self.divergencias: List[Divergencia] = []
+        self._buffer = ''
+        self._emitiu = False
+
+    def _linha(self, linha: str) -> Iterator[str]:
+        mencoes = self.matcher.mencoes(linha)
+        if self.permitidos is not None:
+            mencoes = [m for m in mencoes if m.produto_id in self.permitidos]
+        if mencoes:
+            for divergencia in self.matcher.verificar(linha, mencoes):
+                CATALOG_MISMATCHES.inc(divergencia.tipo)
+                self.divergencias.append(divergencia)
+            yield ('\n' if self._emitiu else '') + linha
+            self._emitiu = True
+
+    def feed(self, texto: str) -> Iterator[str]:
+        """Recebe um pedaço da resposta e emite as linhas completas aprovadas."""
+        self._buffer += texto
+        *linhas, self._buffer = self._buffer.split('\n')
+        for linha in linhas:
+            yield from self._linha(linha)
+
+    def close(self) -> Iterator[str]:
+        """Processa a última linha e, se nada foi aprovado, emite a mensagem padrão."""
+        yield from self._linha(self._buffer)
+        self._buffer = ''
+        if not self._emitiu:
+            yield MENSAGEM_SEM_PRODUTOS
+
+@dataclass
+class Preparo:
+    """Resultado das etapas que antecedem a chamada ao LLM."""
+    # Resposta pronta (prazo de troca, pedido ou cache); quando presente o LLM não é chamado
+    resposta: Optional[str] = None
+    # Se a resposta pronta entra no histórico da sessão (acertos de cache)
+    registrar: bool = False
+    mensagens: Optional[List] = None
+    # Produtos usados no filtro de catálogo da resposta; None quando o filtro não se aplica
+    produtos_filtro: Optional[List[Dict]] = None
+    matcher: Optional[ProductMatcher] = None
+    embedding_consulta: Optional[List[float]] = None
+    # Tokens das mensagens enviadas ao LLM, contados uma vez na montagem
+    tokens_prompt: int = 0
 
 class AssistenteVirtual:
-    def __init__(self):
-        """Initialize the virtual assistant with necessary components."""
-        self.llm = ChatOpenAI(
+    def __init__(self, rag_system: Optional[RAGSystem] = None, response_cache: Optional[ResponseCache] = None,
+                 chat_history: Optional[ChatHistoryStore] = None, router: Optional[IntentRouter] = None):
+        """Initialize the virtual assistant, optionally sharing an existing RAG engine."""
+        # OpenAI por padrão; ASSISTENTE_LLM=echo usa o modelo local (ver providers.py).
+        # Toda geração passa pelo gateway (concorrência, taxa, prazo e novas tentativas),
+        # por isso o cliente não faz retentativas próprias.
+        self.llm = LLMGateway.from_env(create_llm(
             model_name="gpt-4",
             temperature=0.1,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+            max_retries=0,
+        ))
         
-        self.rag_system = RAGSystem()
+        self.rag_system = rag_system if rag_system is not None else RAGSystem(router=router)
         self.system_prompt = SYSTEM_PROMPT
-        self.chat_history: List[Dict] = []
-        self.pedidos = load_pedidos()
+        self.chat_history = chat_history if chat_history is not None else create_chat_history()
+        self.response_cache = response_cache if response_cache is not None else create_response_cache()
+        self.pedidos = create_order_store(PEDIDOS_FILE)
+        # Um único roteador, o mesmo do RAGSystem (intents.json é carregado uma vez)
+        self.router = router if router is not None else self.rag_system.router
+        self.prompt_builder = PromptBuilder.from_env()
+
+    def _montar_prompt(self, conteudo: str) -> List:
+        """Monta as mensagens (sistema + usuário) enviadas ao LLM."""
+        from langchain.prompts import ChatPromptTemplate
+        from langchain.schema import HumanMessage, SystemMessage
+
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=self.system_prompt),
+            HumanMessage(content=conteudo)
+        ])
+        return prompt.format_messages()
 
     def _extract_category(self, message: str) -> Optional[str]:
         """Extract category from message if present."""
-        categories = {
-            'eletrônicos': ['eletrônicos', 'eletronicos', 'notebook', 'computador', 'celular', 'smartphone'],
-            'casa': ['casa', 'panelas', 'utensílios', 'utensilios', 'cozinha', 'fogão', 'panela', 'presente de cozinha'],
-            'esportes': ['esportes', 'tênis', 'tenis', 'corrida'],
-            'livros': ['livros', 'livro', 'leitura']
-        }
-        
-        message = message.lower()
-        for category, keywords in categories.items():
-            if any(keyword in message for keyword in keywords):
-                return category
-        return None
-
-    def _buscar_pedido(self, mensagem: str) -> Optional[Dict]:
-        """Busca informações de um pedido específico."""
-        pedido_id = None
-        
-        # Procura por padrões como #12345, pedido: 12345, etc.
-        match = re.search(r'(?:pedido[\s#:]*|#)(\d+)', mensagem.lower())
-        if match:
-            pedido_id = match.group(1)
-        else:
-            # Fallback: pega qualquer número na mensagem se 'pedido' estiver presente
-            if 'pedido' in mensagem.lower():
-                numeros = re.findall(r'\d+', mensagem)
-                if numeros:
-                    pedido_id = numeros[0]
-        
+        return self.router.classificar(message).categoria
+
+    def _buscar_pedido(self, mensagem: str, rota: Optional[Rota] = None) -> Optional[Dict]:
+        """Busca informações de um pedido específico (#12345, pedido: 12345, etc.)."""
+        pedido_id = (rota or self.router.classificar(mensagem)).pedido_id
         if not pedido_id:
             return None
             
-        # Converte para string e remove espaços para comparação
-        pedido_id = str(pedido_id).strip()
-        
-        # Recarrega pedidos para garantir dados atualizados
-        self.pedidos = load_pedidos()
-        
-        for pedido in self.pedidos:
-            pedido_atual = str(pedido['pedido_id']).strip()
-            if pedido_atual == pedido_id:
-                return pedido
-                
-        return None
+        # Busca indexada; o repositório recarrega sozinho quando o arquivo muda
+        return self.pedidos.get(pedido_id)
+
+    async def _preparar(self, mensagem: str) -> Preparo:
+        """Resolve respostas determinísticas e em cache, ou monta o prompt para o LLM."""
+        # Classificação em uma passada: intent, categoria e número do pedido
+        with span('routing'):
+            rota = self.router.classificar(mensagem)
+        MESSAGES.inc(rota.intent)
+
+        # Checagem simples de prazo de troca
+        if rota.intent == 'prazo_troca':
+            return Preparo(resposta=RESPOSTA_PRAZO_TROCA)
+
+        # Consulta de pedidos
+        if rota.intent == 'pedido':
+            with span('order_lookup'):
+                # Fora do event loop: a primeira carga do repositório pode ler o arquivo inteiro
+                pedido = await asyncio.to_thread(self._buscar_pedido, mensagem, rota)
+            
+            if pedido:
+                try:
+                    produtos = ', '.join([p['nome'] for p in pedido['produtos']])
+                    return Preparo(resposta=f"Status do pedido {pedido['pedido_id']}: {pedido['status']}. Produtos: {produtos}. Data da compra: {pedido['data_compra']}. Previsão de entrega: {pedido['previsao_entrega']}.")
+                except KeyError:
+                    return Preparo(resposta="Desculpe, encontrei o pedido mas há informações faltando. Por favor, entre em contato com o suporte.")
+            elif rota.tem_numero:
+                return Preparo(resposta="Desculpe, não encontrei esse pedido em nossa base. Verifique o número e tente novamente.")
+            else:
+                return Preparo(resposta="Para consultar o status do seu pedido, por favor informe o número do pedido. Exemplo: 'Qual o status do pedido #12345?'")
+
+        # Cache de respostas: primeiro o texto normalizado, depois a similaridade semântica
+        with span('response_cache'):
+            # Os métodos a* do cache em SQLite consultam o banco fora do event loop
+            await self.response_cache.aset_version(self.rag_system.data_version())
+            resposta_cache = await self.response_cache.aget_exact(mensagem)
+            resultado_cache = 'exact'
+            embedding_consulta = None
+            if resposta_cache is None and self.response_cache.semantic_enabled:
+                embedding_consulta = await self.rag_system.embed_query(mensagem)
+                resposta_cache = await self.response_cache.aget_semantic(embedding_consulta)
+                resultado_cache = 'semantic'
+        if resposta_cache is not None:
+            CACHE_RESULTS.inc(resultado_cache)
+            return Preparo(resposta=resposta_cache, registrar=True)
+        CACHE_RESULTS.inc('miss')
+        self.response_cache.record_miss()
+
+        produtos = []
+        contexto = None
+        # Perguntas sobre produtos
+        if rota.intent == 'produtos':
+            filters = {"category": rota.categoria} if rota.categoria else None
+            catalogo = getattr(self.rag_system, 'produtos', None)
+            encontrados = await self.rag_system.search_products_scored(mensagem, filters)
+            produtos = [p for p, _ in encontrados]
+            # Blocos em cache por versão do catálogo; se ele foi trocado durante a busca, pelo conteúdo
+            versao_catalogo = (getattr(catalogo, 'version', None)
+                               if catalogo is not None and self.rag_system.produtos is catalogo else None)
+            with span('prompt_build'):
+                # Contexto dentro do orçamento de tokens, por relevância (ver prompt_builder.py)
+                contexto = self.prompt_builder.contexto_produtos(encontrados, mensagem, versao_catalogo)
+                prompt_text = USER_PROMPT_TEMPLATE.format(
+                    mensagem=mensagem,
+                    produtos_contexto=contexto.texto if contexto.incluidos else "Nenhum produto relevante encontrado.",
+                )
+                mensagens = self._montar_prompt(prompt_text)
+
+        # Perguntas sobre políticas da loja
+        elif rota.intent == 'politicas':
+            # Os trechos já vêm cortados pelo orçamento do prompt; o builder só os junta
+            info_chunks = await self.rag_system.query_knowledge_base(mensagem, token_budget=self.prompt_builder.budget)
+            with span('prompt_build'):
+                contexto = self.prompt_builder.contexto_trechos(info_chunks)
+                mensagens = self._montar_prompt(f"{mensagem}\n\nInformações relevantes da política da loja:\n{contexto.texto}")
+
+        else:
+            # Para outras mensagens, usa o prompt normal
+            with span('prompt_build'):
+                mensagens = self._montar_prompt(mensagem)
+
+        tokens_prompt = self._registrar_prompt(rota.intent, mensagens, contexto)
+        # Pós-processamento para garantir que só produtos do catálogo sejam exibidos
+        return Preparo(
+            mensagens=mensagens,
+            produtos_filtro=produtos if rota.filtrar_catalogo else None,
+            matcher=self.rag_system.product_matcher() if rota.filtrar_catalogo else None,
+            embedding_consulta=embedding_consulta,
+            tokens_prompt=tokens_prompt,
+        )
+
+    @staticmethod
+    def _registrar_prompt(intent: str, mensagens: List, contexto: Optional[ContextoPrompt]) -> int:
+        """Conta os tokens do prompt uma vez: métrica por intent e nota no Server-Timing."""
+        tokens = contar_tokens_mensagens(mensagens)
+        note_request('prompt_tokens', tokens)
+        if REGISTRY.enabled:
+            PROMPT_TOKENS.observe(tokens, intent, 'total')
+            if contexto is not None:
+                PROMPT_TOKENS.observe(contexto.tokens, intent, 'context')
+        return tokens
+
+    @staticmethod
+    def _registrar_llm(modo: str, preparo: Preparo, resposta_texto: str, latencia: float):
+        """Latência e tokens (prompt e resposta) da chamada ao LLM."""
+        if not REGISTRY.enabled:
+            return
+        LLM_SECONDS.observe(latencia, modo)
+        LLM_TOKENS.observe(preparo.tokens_prompt, 'prompt')
+        LLM_TOKENS.observe(contar_tokens(resposta_texto), 'completion')
+
+    async def _concluir(self, session_id: str, mensagem: str, preparo: Preparo, resposta_texto: str, latencia: float):
+        """Guarda a resposta gerada pelo LLM no cache e no histórico."""
+        await self.response_cache.aput(mensagem, resposta_texto, latencia, preparo.embedding_consulta)
+        self._registrar_historico(session_id, mensagem, resposta_texto)
+
+    async def _processar(self, mensagem: str, contexto: Optional[Dict] = None) -> str:
+        """Processa a mensagem, propagando erros (usado por processar_mensagem e pelo lote)."""
+        session_id = session_id_from_context(contexto)
+        preparo = await self._preparar(mensagem)
+        if preparo.resposta is not None:
+            if preparo.registrar:
+                self._registrar_historico(session_id, mensagem, preparo.resposta)
+            return preparo.resposta
+
+        # Get response from LLM
+        inicio = time.perf_counter()
+        with span('llm'):
+            response = await self.llm.agenerate([preparo.mensagens])
+        latencia = time.perf_counter() - inicio
+        resposta_texto = response.generations[0][0].text
+        self._registrar_llm('generate', preparo, resposta_texto, latencia)
+
+        if preparo.produtos_filtro is not None:
+            with span('catalog_filter'):
+                resposta_texto = filtrar_resposta_produtos(resposta_texto, preparo.produtos_filtro, preparo.matcher)
+
+        await self._concluir(session_id, mensagem, preparo, resposta_texto, latencia)
+        return resposta_texto
 
     async def processar_mensagem(self, mensagem: str, contexto: Optional[Dict] = None) -> str:
         try:
-            # Checagem simples de prazo de troca
-            resposta_troca = self.rag_system.checar_prazo_troca(mensagem)
-            if resposta_troca:
-                return resposta_troca
-
-            # Consulta de pedidos
-            if 'pedido' in mensagem.lower():
-                pedido = self._buscar_pedido(mensagem)
-                
-                if pedido:
-                    try:
-                        produtos = ', '.join([p['nome'] for p in pedido['produtos']])
-                        return f"Status do pedido {pedido['pedido_id']}: {pedido['status']}. Produtos: {produtos}. Data da compra: {pedido['data_compra']}. Previsão de entrega: {pedido['previsao_entrega']}."
-                    except KeyError:
-                        return "Desculpe, encontrei o pedido mas há informações faltando. Por favor, entre em contato com o suporte."
-                elif re.search(r'\d+', mensagem):
-                    return "Desculpe, não encontrei esse pedido em nossa base. Verifique o número e tente novamente."
-                else:
-                    return "Para consultar o status do seu pedido, por favor informe o número do pedido. Exemplo: 'Qual o status do pedido #12345?'"
-
-            # Perguntas sobre produtos
-            if any(keyword in mensagem.lower() for keyword in ['produto', 'produtos', 'notebook', 'smartphone', 'celular', 'computador', 'livro', 'tênis', 'panelas', 'cozinha', 'presente']):
-                category = self._extract_category(mensagem)
-                filters = {"category": category} if category else None
-                produtos = await self.rag_system.search_products(mensagem, filters)
-                if produtos:
-                    produtos_info = []
-                    for i, p in enumerate(produtos):
-                        specs = ", ".join([f"{k}: {v}" for k, v in p['especificacoes'].items()])
-                        produto_info = f"""
-{i+1}. {p['nome']}
-   Preço: R${p['preco']:.2f}
-   Categoria: {p['categoria']}
-   Descrição: {p['descricao']}
-   Especificações: {specs}
-   Status: {'Disponível' if p['disponivel'] else 'Indisponível'}
-"""
-                        produtos_info.append(produto_info)
-                    contexto_produtos = "Produtos disponíveis no catálogo:\n" + "\n".join(produtos_info)
-                else:
-                    contexto_produtos = "Nenhum produto relevante encontrado no catálogo."
-                prompt_text = USER_PROMPT_TEMPLATE.format(mensagem=mensagem, produtos_contexto=produtos_info if produtos else "Nenhum produto relevante encontrado.")
-                prompt = ChatPromptTemplate.from_messages([
-                    SystemMessage(content=self.system_prompt),
-                    HumanMessage(content=prompt_text)
-                ])
-
-            # Perguntas sobre políticas da loja
-            elif any(keyword in mensagem.lower() for keyword in ['política', 'politica', 'troca', 'devolução', 'devolucao', 'entrega', 'pagamento', 'garantia', 'prazo', 'suporte']):
-                info_chunks = await self.rag_system.query_knowledge_base(mensagem)
-                contexto_politicas = "\n".join(info_chunks)
-                prompt = ChatPromptTemplate.from_messages([
-                    SystemMessage(content=self.system_prompt),
-                    HumanMessage(content=f"{mensagem}\n\nInformações relevantes da política da loja:\n{contexto_politicas}")
-                ])
+            return await self._processar(mensagem, contexto)
+        except LLMGatewayError:
+            return MENSAGEM_INDISPONIVEL
+        except Exception:
+            return MENSAGEM_ERRO
 
-            else:
-                # Para outras mensagens, usa o prompt normal
-                prompt = ChatPromptTemplate.from_messages([
-                    SystemMessage(content=self.system_prompt),
-                    HumanMessage(content=mensagem)
-                ])
-
-            # Get response from LLM
-            response = await self.llm.agenerate([prompt.format_messages()])
-            resposta_texto = response.generations[0][0].text
-
-            # Pós-processamento para garantir que só produtos do catálogo sejam exibidos
-            if 'produtos' in mensagem.lower() or 'presente' in mensagem.lower() or 'cozinha' in mensagem.lower():
-                resposta_texto = filtrar_resposta_produtos(resposta_texto, produtos if 'produtos' in locals() else [])
-            
-            # Store in chat history
-            self.chat_history.append({
-                "user": mensagem,
-                "assistant": resposta_texto,
-                "timestamp": datetime.now().isoformat()
-            })
-            
-            return resposta_texto
-            
+    async def processar_mensagens(self, itens: List[Tuple[str, Optional[Dict]]],
+                                  concorrencia: int = 8) -> List[Dict]:
+        """Processa um lote de (mensagem, contexto) com no máximo `concorrencia` chamadas simultâneas.
+
+        Retorna, na ordem de entrada, {"status": "ok", "response": ...} ou
+        {"status": "error", "response": MENSAGEM_ERRO, "error": ...} para cada item.
+        """
+        semaforo = asyncio.Semaphore(max(1, concorrencia))
+
+        async def processar(mensagem: str, contexto: Optional[Dict]) -> Dict:
+            async with semaforo:
+                try:
+                    return {"status": "ok", "response": await self._processar(mensagem, contexto)}
+                except LLMGatewayError as e:
+                    return {"status": "error", "response": MENSAGEM_INDISPONIVEL, "error": type(e).__name__}
+                except Exception as e:
+                    return {"status": "error", "response": MENSAGEM_ERRO, "error": type(e).__name__}
+
+        return await asyncio.gather(*(processar(mensagem, contexto) for mensagem, contexto in itens))
+
+    async def processar_mensagem_stream(self, mensagem: str, contexto: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Versão em streaming de processar_mensagem: emite a resposta à medida que o LLM gera.
+
+        Respostas determinísticas (pedidos, prazo de troca) e acertos de cache saem em um único
+        pedaço; o filtro de catálogo é aplicado linha a linha.
+        """
+        session_id = session_id_from_context(contexto)
+        try:
+            preparo = await self._preparar(mensagem)
         except Exception:
-            return "Desculpe, tive um problema ao processar sua mensagem. Por favor, tente novamente em alguns instantes."
+            yield MENSAGEM_ERRO
+            return
+
+        if preparo.resposta is not None:
+            if preparo.registrar:
+                self._registrar_historico(session_id, mensagem, preparo.resposta)
+            yield preparo.resposta
+            return
+
+        filtro = (FiltroProdutosIncremental(preparo.produtos_filtro, preparo.matcher)
+                  if preparo.produtos_filtro is not None else None)
+        partes: List[str] = []
+        inicio = time.perf_counter()
+        try:
+            async for chunk in self.llm.astream(preparo.mensagens):
+                texto = chunk.content
+                if not texto:
+                    continue
+                for parte in (filtro.feed(texto) if filtro else [texto]):
+                    partes.append(parte)
+                    yield parte
+        except LLMGatewayError:
+            yield MENSAGEM_INDISPONIVEL
+            return
+        except Exception:
+            yield MENSAGEM_ERRO
+            return
+
+        latencia = time.perf_counter() - inicio
+        if filtro:
+            for parte in filtro.close():
+                partes.append(parte)
+                yield parte
+        resposta_texto = ''.join(partes)
+        self._registrar_llm('stream', preparo, resposta_texto, latencia)
+        await self._concluir(session_id, mensagem, preparo, resposta_texto, latencia)
+
+    def _registrar_historico(self, session_id: str, mensagem: str, resposta: str):
+        """Store in the session's chat history."""
+        self.chat_history.append(session_id, {
+            "user": mensagem,
+            "assistant": resposta,
+            "timestamp": datetime.now().isoformat()
+        })
 
-    def get_chat_history(self) -> List[Dict]:
-        """Return the chat history."""
-        return self.chat_history
+    def get_chat_history(self, session_id: str = DEFAULT_SESSION, offset: int = 0,
+                         limit: int = 50) -> Tuple[List[Dict], int]:
+        """Return a page of the session's chat history and the session total."""
+        return self.chat_history.get(session_id, offset, limit)
 
-    def clear_chat_history(self):
-        """Clear the chat history."""
-        self.chat_history = [] 
+    def clear_chat_history(self, session_id: str = DEFAULT_SESSION):
+        """Clear the session's chat history."""
+        self.chat_history.clear(session_id)
@@ -0,0 +1,105 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Sequence
+
+import numpy as np
+
+from texto import normalizar_texto
+
+# Palavras sem valor de busca (já sem acento, como ficam após normalizar_texto)
+STOPWORDS = frozenset('''
+a o as os um uma uns umas de da do das dos d e ou em no na nos nas ao aos a para pra por pelo pela pelos
+pelas com sem que qual quais quando onde como se sobre entre ate apos meu minha meus minhas seu sua seus
+suas eu voce voces nos ele ela eles elas isso isto esse essa este esta aquele aquela e sao ser estar esta
+tem ter ha foi mais menos muito muita mas nao sim ja tambem so lhe me te vos
+'''.split())
+
+_PALAVRAS = re.compile(r'\w+')
+
+
+def radical(palavra: str) -> str:
+    """Redução leve de plural ('trocas' -> 'troca', 'devolucoes' -> 'devolucao')."""
+    if len(palavra) > 4 and palavra.endswith('oes'):
+        return palavra[:-3] + 'ao'
+    if len(palavra) > 3 and palavra.endswith('s'):
+        return palavra[:-1]
+    return palavra
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Termos de busca: texto sem acento, sem stopwords e com plural reduzido."""
+    return [radical(p) for p in _PALAVRAS.findall(normalizar_texto(texto)) if p not in STOPWORDS]
+
+
+class LexicalHit(NamedTuple):
+    id: str
+    score: float
+    # Fração dos termos da consulta presentes no trecho
+    cobertura: float
+
+
+class BM25Index:
+    """Índice invertido com pontuação BM25 sobre trechos identificados por id.
+
+    Os pesos BM25 de cada (termo, trecho) são calculados na construção, então uma consulta é só
+    a soma dos pesos das listas invertidas dos seus termos.
+    """
+
+    def __init__(self, ids: Sequence[str], textos: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.ids: List[str] = list(ids)
+        self.textos: Dict[str, str] = dict(zip(self.ids, textos))
+        termos_por_trecho = [Counter(tokenizar(texto)) for texto in textos]
+        tamanhos = np.asarray([sum(t.values()) for t in termos_por_trecho], dtype=np.float32)
+        media = float(tamanhos.mean()) if len(tamanhos) and tamanhos.mean() > 0 else 1.0
+
+        ocorrencias: Dict[str, Dict[int, int]] = {}
+        for linha, termos in enumerate(termos_por_trecho):
+            for termo, tf in termos.items():
+                ocorrencias.setdefault(termo, {})[linha] = tf
+
+        total = len(self.ids)
+        self._postings: Dict[str, tuple] = {}
+        for termo, trechos in ocorrencias.items():
+            linhas = np.fromiter(trechos.keys(), dtype=np.int32, count=len(trechos))
+            tf = np.fromiter(trechos.values(), dtype=np.float32, count=len(trechos))
+            idf = math.log(1 + (total - len(trechos) + 0.5) / (len(trechos) + 0.5))
+            normalizacao = k1 * (1 - b + b * tamanhos[linhas] / media)
+            self._postings[termo] = (linhas, (idf * tf * (k1 + 1) / (tf + normalizacao)).astype(np.float32))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, consulta: str, k: int = 10) -> List[LexicalHit]:
+        """Até k trechos com algum termo da consulta, do maior para o menor score."""
+        termos = list(dict.fromkeys(tokenizar(consulta)))
+        listas = [self._postings[t] for t in termos if t in self._postings]
+        if not listas or k <= 0:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        encontrados = np.zeros(len(self.ids), dtype=np.int32)
+        for linhas, pesos in listas:
+            scores[linhas] += pesos
+            encontrados[linhas] += 1
+
+        candidatos = np.flatnonzero(scores)
+        if candidatos.size > k:
+            candidatos = candidatos[np.argpartition(-scores[candidatos], k - 1)[:k]]
+        candidatos = candidatos[np.argsort(-scores[candidatos], kind='stable')]
+        return [LexicalHit(self.ids[i], float(scores[i]), encontrados[i] / len(termos)) for i in candidatos]
+
+
+def lexical_decisivo(hits: List[LexicalHit], margem: float = 1.5) -> bool:
+    """Se o melhor trecho tem todos os termos da consulta e supera o segundo por `margem` vezes."""
+    if not hits or hits[0].cobertura < 1.0:
+        return False
+    return len(hits) == 1 or hits[0].score >= margem * hits[1].score
+
+
+def fusao_rrf(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """Reciprocal-rank fusion: ordena os ids pela soma de 1 / (k + posição) em cada ranking."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for posicao, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + posicao + 1)
+    return sorted(scores, key=scores.get, reverse=True)
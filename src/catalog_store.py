@@ -0,0 +1,316 @@
+import fcntl
+import hashlib
+import io
+import json
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from registros import ESQUEMA_PRODUTO, Rejeitados, registros_validos
+
+# Get the absolute path to the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+INDEX_DIR = Path(os.getenv('INDEX_DIR', str(PROJECT_ROOT / 'data' / 'index')))
+PRODUTOS_FILE = PROJECT_ROOT / 'data' / 'produtos.json'
+
+# Versão do formato em disco; mudar invalida os catálogos já compilados
+CATALOG_FORMAT = 1
+
+# Por quanto tempo uma versão desativada fica em disco: os workers que ainda a usam passam
+# para a nova em até CATALOG_REFRESH_INTERVAL segundos
+CATALOG_RETENTION_SECONDS = float(os.getenv('CATALOG_RETENTION_SECONDS', '600'))
+# Marca, dentro do diretório de uma versão, do momento em que ela deixou de ser a ativa
+_INATIVO = '.inativo'
+
+_COLUNAS = ('precos', 'disponivel', 'categorias', 'offsets')
+
+logger = logging.getLogger(__name__)
+
+
+def product_text(product: Dict) -> str:
+    """Return the text used to embed a product."""
+    return f"{product['nome']} {product['descricao']} {product['categoria']}"
+
+
+def acquire_file_lock(path: Path, blocking: bool = True):
+    """Trava exclusiva entre processos (flock) no arquivo `path`; devolve o arquivo aberto.
+
+    Com ``blocking=False``, devolve None se outro processo já tem a trava.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    arquivo = open(path, 'a')
+    try:
+        fcntl.flock(arquivo, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        arquivo.close()
+        return None
+    return arquivo
+
+
+def release_file_lock(arquivo):
+    fcntl.flock(arquivo, fcntl.LOCK_UN)
+    arquivo.close()
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Serializa entre workers a construção de um índice persistido."""
+    arquivo = acquire_file_lock(path)
+    try:
+        yield
+    finally:
+        release_file_lock(arquivo)
+
+
+def _sha256_arquivo(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 16), b''):
+            digest.update(bloco)
+    return digest.hexdigest()
+
+
+def _codificar(produtos: Iterable[Dict], registros) -> Dict:
+    """Grava cada produto como JSON em `registros` e devolve as colunas e o manifesto.
+
+    `produtos` pode ser um gerador: só as colunas ficam em memória, em arrays compactos.
+    """
+    precos = array('d')
+    disponivel = array('b')
+    codigos = array('i')
+    categorias: Dict[str, int] = {}
+    offsets = array('q', [0])
+    # Hash só do texto embutido: mudança de preço ou estoque não pede novos embeddings
+    textos = hashlib.sha256()
+    conteudo = hashlib.sha256()
+    for produto in produtos:
+        registro = json.dumps(produto, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        registros.write(registro)
+        conteudo.update(registro)
+        offsets.append(offsets[-1] + len(registro))
+        textos.update(product_text(produto).encode('utf-8'))
+        textos.update(b'\0')
+        precos.append(float(produto['preco']))
+        disponivel.append(bool(produto.get('disponivel', True)))
+        categoria = str(produto['categoria']).lower()
+        codigos.append(categorias.setdefault(categoria, len(categorias)))
+
+    return {
+        'colunas': {
+            'precos': np.asarray(precos, dtype=np.float64),
+            'disponivel': np.asarray(disponivel, dtype=bool),
+            'categorias': np.asarray(codigos, dtype=np.int32),
+            'offsets': np.asarray(offsets, dtype=np.int64),
+        },
+        'manifesto': {
+            'format': CATALOG_FORMAT,
+            'version': conteudo.hexdigest(),
+            'text_hash': textos.hexdigest(),
+            'count': len(precos),
+            'categorias': list(categorias),
+        },
+    }
+
+
+class CatalogStore:
+    """Catálogo em formato colunar: preço, disponibilidade e categoria (códigos de dicionário) em
+    arrays numpy e os produtos completos como JSON num blob com offsets.
+
+    Aberto de disco, tudo é mapeado em memória só para leitura, então as páginas são
+    compartilhadas entre os workers. Os dicts só são montados para os produtos pedidos.
+    """
+
+    def __init__(self, colunas: Dict[str, np.ndarray], registros, manifesto: Dict,
+                 diretorio: Optional[Path] = None):
+        self.precos: np.ndarray = colunas['precos']
+        self.disponivel: np.ndarray = colunas['disponivel']
+        self.categorias: np.ndarray = colunas['categorias']
+        self.offsets: np.ndarray = colunas['offsets']
+        self._registros = registros
+        self.manifesto = manifesto
+        self.version: str = manifesto['version']
+        self.text_hash: str = manifesto['text_hash']
+        self.nomes_categorias: List[str] = manifesto['categorias']
+        self.category_codes: Dict[str, int] = {c: i for i, c in enumerate(self.nomes_categorias)}
+        self.diretorio = diretorio
+
+    @classmethod
+    def from_products(cls, produtos: Iterable[Dict]) -> 'CatalogStore':
+        """Catálogo em memória (testes, benchmarks), com o mesmo layout do compilado."""
+        if isinstance(produtos, CatalogStore):
+            return produtos
+        registros = io.BytesIO()
+        codificado = _codificar(produtos, registros)
+        return cls(codificado['colunas'], registros.getvalue(), codificado['manifesto'])
+
+    @classmethod
+    def open(cls, diretorio: Path) -> 'CatalogStore':
+        """Abre um catálogo compilado, mapeando os arquivos em memória (somente leitura)."""
+        diretorio = Path(diretorio)
+        with open(diretorio / 'manifest.json', 'r', encoding='utf-8') as f:
+            manifesto = json.load(f)
+        if manifesto.get('format') != CATALOG_FORMAT:
+            raise ValueError(f'Formato de catálogo {manifesto.get("format")} não suportado')
+        colunas = {nome: np.load(diretorio / f'{nome}.npy', mmap_mode='r') for nome in _COLUNAS}
+        if colunas['offsets'].shape[0] != manifesto['count'] + 1:
+            raise ValueError(f'Catálogo incompleto em {diretorio}')
+        with open(diretorio / 'registros.bin', 'rb') as f:
+            # mmap não aceita arquivo vazio
+            registros = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if manifesto['count'] else b''
+        return cls(colunas, registros, manifesto, diretorio)
+
+    def __len__(self) -> int:
+        return self.precos.shape[0]
+
+    def __getitem__(self, i: int) -> Dict:
+        """Produto da linha i, decodificado do blob (um dict novo a cada chamada)."""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        inicio, fim = int(self.offsets[i]), int(self.offsets[i + 1])
+        return json.loads(self._registros[inicio:fim])
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def produtos(self, linhas: Sequence[int]) -> List[Dict]:
+        return [self[i] for i in linhas]
+
+    def textos(self) -> Iterator[str]:
+        """Texto de embedding de cada produto, na ordem das linhas."""
+        for produto in self:
+            yield product_text(produto)
+
+
+def compile_catalog(produtos: Iterable[Dict], index_dir: Path = INDEX_DIR, name: str = 'catalogo',
+                    fonte: Optional[str] = None, activate: bool = True) -> Path:
+    """Compila os produtos em ``index_dir/<name>-<versão>/`` e aponta ``<name>.json`` para ele.
+
+    O diretório é montado num temporário e renomeado, e o ponteiro é trocado com os.replace:
+    quem já tem o catálogo anterior mapeado continua lendo os arquivos antigos. Com
+    ``activate=False`` o ponteiro fica como está (ver activate_catalog).
+    """
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    temporario = Path(tempfile.mkdtemp(prefix=f'.{name}-', dir=index_dir))
+    try:
+        with open(temporario / 'registros.bin', 'wb') as registros:
+            codificado = _codificar(produtos, registros)
+        for nome, coluna in codificado['colunas'].items():
+            np.save(temporario / f'{nome}.npy', coluna)
+        manifesto = codificado['manifesto']
+        with open(temporario / 'manifest.json', 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False)
+
+        destino = index_dir / f'{name}-{manifesto["version"][:16]}'
+        # mkdtemp cria o diretório com modo 0700; o catálogo é lido por outros usuários também
+        os.chmod(temporario, 0o755)
+        try:
+            os.rename(temporario, destino)
+        except OSError:
+            # Outro worker já compilou o mesmo conteúdo
+            if not (destino / 'manifest.json').exists():
+                raise
+    finally:
+        shutil.rmtree(temporario, ignore_errors=True)
+
+    if activate:
+        activate_catalog(destino, index_dir, name, fonte)
+    return destino
+
+
+def activate_catalog(destino: Path, index_dir: Path = INDEX_DIR, name: str = 'catalogo',
+                     fonte: Optional[str] = None, retencao: Optional[float] = None):
+    """Aponta ``<name>.json`` para o catálogo compilado em `destino` e apaga os anteriores.
+
+    Uma versão desativada só é apagada depois de `retencao` segundos (padrão:
+    CATALOG_RETENTION_SECONDS), numa ativação seguinte: os workers que ainda não passaram
+    para a nova versão continuam lendo os arquivos dela.
+    """
+    index_dir, destino = Path(index_dir), Path(destino)
+    with open(destino / 'manifest.json', 'r', encoding='utf-8') as f:
+        versao = json.load(f)['version']
+    ponteiro = index_dir / f'{name}.json'
+    tmp_ponteiro = ponteiro.with_suffix(f'.json.{os.getpid()}.tmp')
+    with open(tmp_ponteiro, 'w', encoding='utf-8') as f:
+        json.dump({'dir': destino.name, 'version': versao, 'source_sha256': fonte}, f)
+    os.replace(tmp_ponteiro, ponteiro)
+    # Uma versão reativada volta a não ter prazo
+    (destino / _INATIVO).unlink(missing_ok=True)
+
+    retencao = CATALOG_RETENTION_SECONDS if retencao is None else retencao
+    agora = time.time()
+    for antigo in index_dir.glob(f'{name}-*'):
+        if antigo == destino or not antigo.is_dir():
+            continue
+        marca = antigo / _INATIVO
+        try:
+            desde = marca.stat().st_mtime
+        except FileNotFoundError:
+            marca.touch()
+            desde = agora
+        if agora - desde >= retencao:
+            shutil.rmtree(antigo, ignore_errors=True)
+
+
+def catalog_pointer(index_dir: Path = INDEX_DIR, name: str = 'catalogo') -> Optional[Dict]:
+    """Conteúdo de ``<name>.json`` (dir, version, source_sha256), ou None se não houver."""
+    try:
+        with open(Path(index_dir) / f'{name}.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def open_catalog(index_dir: Path = INDEX_DIR, name: str = 'catalogo') -> Optional[CatalogStore]:
+    """Catálogo ativo indicado por ``<name>.json``, sem conferir o arquivo de origem."""
+    ponteiro = catalog_pointer(index_dir, name)
+    return CatalogStore.open(Path(index_dir) / ponteiro['dir']) if ponteiro else None
+
+
+def load_catalog(products_file: Path = PRODUTOS_FILE, index_dir: Path = INDEX_DIR,
+                 name: str = 'catalogo') -> CatalogStore:
+    """Catálogo compilado de `products_file`, recompilando só quando o arquivo muda."""
+    products_file = Path(products_file)
+    if not products_file.exists():
+        return CatalogStore.from_products([])
+    fonte = _sha256_arquivo(products_file)
+    catalogo = _abrir_compilado(Path(index_dir), name, fonte)
+    if catalogo is not None:
+        return catalogo
+
+    # Só um worker compila; os demais esperam e abrem o resultado
+    with file_lock(Path(index_dir) / f'{name}.lock'):
+        catalogo = _abrir_compilado(Path(index_dir), name, fonte)
+        if catalogo is not None:
+            return catalogo
+        # Leitura em fluxo: o arquivo nunca é carregado inteiro; registros inválidos ficam de fora
+        rejeitados = Rejeitados()
+        destino = compile_catalog(registros_validos(products_file, ESQUEMA_PRODUTO, rejeitados),
+                                  index_dir, name, fonte=fonte)
+        if rejeitados.total:
+            logger.warning('%s: %d produto(s) inválido(s) ignorado(s); use ingestion.py para ver os erros',
+                           products_file, rejeitados.total)
+    return CatalogStore.open(destino)
+
+
+def _abrir_compilado(index_dir: Path, name: str, fonte: str) -> Optional[CatalogStore]:
+    ponteiro = catalog_pointer(index_dir, name)
+    try:
+        if ponteiro and ponteiro.get('source_sha256') == fonte:
+            return CatalogStore.open(index_dir / ponteiro['dir'])
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
@@ -0,0 +1,193 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Deque, Dict, List, Tuple
+
+from catalog_store import INDEX_DIR
+
+CHAT_HISTORY_DB = INDEX_DIR / 'chat_history.sqlite'
+
+DEFAULT_SESSION = 'default'
+
+
+def session_id_from_context(context) -> str:
+    """Extrai o session_id de ChatRequest.context (ou usa a sessão padrão)."""
+    session_id = (context or {}).get('session_id')
+    return str(session_id) if session_id else DEFAULT_SESSION
+
+
+class ChatHistoryStore(ABC):
+    """Interface do armazenamento de histórico de chat por sessão.
+
+    Cada sessão guarda no máximo ``max_messages`` trocas (as mais antigas são descartadas)
+    e sessões sem atividade por mais de ``idle_ttl`` segundos são removidas.
+    """
+
+    @abstractmethod
+    def append(self, session_id: str, entry: Dict):
+        """Acrescenta uma troca ao fim do histórico da sessão."""
+
+    @abstractmethod
+    def get(self, session_id: str, offset: int = 0, limit: int = 50) -> Tuple[List[Dict], int]:
+        """Retorna uma página do histórico (mais antigas primeiro) e o total da sessão."""
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        """Apaga o histórico da sessão."""
+
+    @abstractmethod
+    def expire_idle(self) -> int:
+        """Remove sessões ociosas e retorna quantas foram removidas."""
+
+
+class InMemoryChatHistory(ChatHistoryStore):
+    """Histórico em memória: um buffer circular por sessão."""
+
+    def __init__(self, max_messages: int = 50, idle_ttl: float = 3600.0, clock=time.monotonic):
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        # Ordenado do acesso mais antigo para o mais recente
+        self._sessions: 'OrderedDict[str, Deque[Dict]]' = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _touch(self, session_id: str):
+        self._last_access[session_id] = self.clock()
+        self._sessions.move_to_end(session_id)
+
+    def append(self, session_id: str, entry: Dict):
+        with self._lock:
+            self._expire_idle()
+            buffer = self._sessions.get(session_id)
+            if buffer is None:
+                buffer = self._sessions[session_id] = deque(maxlen=self.max_messages)
+            buffer.append(entry)
+            self._touch(session_id)
+
+    def get(self, session_id: str, offset: int = 0, limit: int = 50) -> Tuple[List[Dict], int]:
+        with self._lock:
+            self._expire_idle()
+            buffer = self._sessions.get(session_id)
+            if buffer is None:
+                return [], 0
+            self._touch(session_id)
+            return list(buffer)[offset:offset + limit], len(buffer)
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._last_access.pop(session_id, None)
+
+    def _expire_idle(self) -> int:
+        limite = self.clock() - self.idle_ttl
+        removidas = 0
+        while self._sessions:
+            session_id = next(iter(self._sessions))
+            if self._last_access[session_id] >= limite:
+                break
+            del self._sessions[session_id]
+            del self._last_access[session_id]
+            removidas += 1
+        return removidas
+
+    def expire_idle(self) -> int:
+        with self._lock:
+            return self._expire_idle()
+
+
+class SqliteChatHistory(ChatHistoryStore):
+    """Histórico em SQLite (modo WAL), que sobrevive a reinícios e é compartilhado entre workers."""
+
+    def __init__(self, db_path: Path = CHAT_HISTORY_DB, max_messages: int = 50, idle_ttl: float = 3600.0,
+                 clock=time.time):
+        self.db_path = Path(db_path)
+        self.max_messages = max_messages
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS mensagens (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                user TEXT NOT NULL,
+                assistant TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS mensagens_sessao ON mensagens (session_id, id);
+            CREATE TABLE IF NOT EXISTS sessoes (
+                session_id TEXT PRIMARY KEY,
+                ultimo_acesso REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessoes_acesso ON sessoes (ultimo_acesso);
+        ''')
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def _touch(self, session_id: str):
+        self._conn.execute('INSERT OR REPLACE INTO sessoes VALUES (?, ?)', (session_id, self.clock()))
+
+    def append(self, session_id: str, entry: Dict):
+        with self._lock, self._conn:
+            self._expire_idle()
+            self._conn.execute(
+                'INSERT INTO mensagens (session_id, user, assistant, timestamp) VALUES (?, ?, ?, ?)',
+                (session_id, entry['user'], entry['assistant'], entry['timestamp']),
+            )
+            # Mantém só as max_messages mais recentes da sessão
+            self._conn.execute(
+                '''DELETE FROM mensagens WHERE session_id = ? AND id <= (
+                       SELECT id FROM mensagens WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+                   )''',
+                (session_id, session_id, self.max_messages),
+            )
+            self._touch(session_id)
+
+    def get(self, session_id: str, offset: int = 0, limit: int = 50) -> Tuple[List[Dict], int]:
+        with self._lock, self._conn:
+            self._expire_idle()
+            total = self._conn.execute(
+                'SELECT COUNT(*) FROM mensagens WHERE session_id = ?', (session_id,)
+            ).fetchone()[0]
+            rows = self._conn.execute(
+                'SELECT user, assistant, timestamp FROM mensagens WHERE session_id = ? ORDER BY id LIMIT ? OFFSET ?',
+                (session_id, limit, offset),
+            ).fetchall()
+            if total:
+                self._touch(session_id)
+        return [{'user': u, 'assistant': a, 'timestamp': t} for u, a, t in rows], total
+
+    def clear(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM mensagens WHERE session_id = ?', (session_id,))
+            self._conn.execute('DELETE FROM sessoes WHERE session_id = ?', (session_id,))
+
+    def _expire_idle(self) -> int:
+        limite = self.clock() - self.idle_ttl
+        ociosas = [row[0] for row in self._conn.execute(
+            'SELECT session_id FROM sessoes WHERE ultimo_acesso < ?', (limite,)
+        )]
+        for session_id in ociosas:
+            self._conn.execute('DELETE FROM mensagens WHERE session_id = ?', (session_id,))
+            self._conn.execute('DELETE FROM sessoes WHERE session_id = ?', (session_id,))
+        return len(ociosas)
+
+    def expire_idle(self) -> int:
+        with self._lock, self._conn:
+            return self._expire_idle()
+
+
+def create_chat_history() -> ChatHistoryStore:
+    """Cria o armazenamento escolhido por CHAT_HISTORY_BACKEND (memory ou sqlite)."""
+    max_messages = int(os.getenv('CHAT_HISTORY_MAX_MESSAGES', '50'))
+    idle_ttl = float(os.getenv('CHAT_HISTORY_IDLE_TTL', '3600'))
+    if os.getenv('CHAT_HISTORY_BACKEND', 'memory').lower() == 'sqlite':
+        db_path = Path(os.getenv('CHAT_HISTORY_DB', str(CHAT_HISTORY_DB)))
+        return SqliteChatHistory(db_path, max_messages, idle_ttl)
+    return InMemoryChatHistory(max_messages, idle_ttl)
@@ -0,0 +1,117 @@
+import asyncio
+import os
+from typing import Dict, List, Optional, Set
+
+
+class EmbeddingBatcher:
+    """Agrupa embeddings de consultas concorrentes em uma única chamada a embed_documents.
+
+    Consultas já no cache de embeddings são respondidas na hora. Sem nenhum lote em
+    andamento, as demais saem na próxima volta do event loop (junto com as que chegaram na
+    mesma volta); com um lote em andamento, esperam até ``window`` segundos (ou até
+    ``max_batch`` textos) e seguem todas em um só ``aembed_documents``. Textos repetidos no
+    mesmo lote são enviados uma única vez.
+    """
+
+    def __init__(self, embeddings, window: float = 0.005, max_batch: int = 256):
+        self.embeddings = embeddings
+        self.window = window
+        self.max_batch = max_batch
+        # Consulta sem espera ao cache (CachedEmbeddings.cached), se o cliente tiver um
+        self._cached = getattr(embeddings, 'cached', None)
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._flush_handle: Optional[asyncio.Handle] = None
+        # Referências fortes: o event loop só guarda referências fracas às tarefas
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.texts = 0
+        self.requests = 0
+        self.cache_hits = 0
+
+    @classmethod
+    def from_env(cls, embeddings) -> 'EmbeddingBatcher':
+        """Cria o agrupador a partir de EMBEDDING_BATCH_WINDOW_MS e EMBEDDING_BATCH_MAX."""
+        return cls(
+            embeddings,
+            window=float(os.getenv('EMBEDDING_BATCH_WINDOW_MS', '5')) / 1000,
+            max_batch=int(os.getenv('EMBEDDING_BATCH_MAX', '256')),
+        )
+
+    async def embed(self, text: str) -> List[float]:
+        """Embedding de uma consulta, possivelmente calculado junto com outras."""
+        self.requests += 1
+        if self._cached is not None:
+            vector = self._cached(text)
+            if vector is not None:
+                self.cache_hits += 1
+                return vector
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.setdefault(text, []).append(future)
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            if self._running:
+                self._flush_handle = loop.call_later(self.window, self._flush)
+            else:
+                self._flush_handle = loop.call_soon(self._flush)
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de várias consultas em uma chamada (sem esperar a janela)."""
+        self.batches += 1
+        self.texts += len(texts)
+        self.requests += len(texts)
+        return await self.embeddings.aembed_documents(texts)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        if pending:
+            task = asyncio.ensure_future(self._run(pending))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, pending: Dict[str, List[asyncio.Future]]):
+        texts = list(pending)
+        self.batches += 1
+        self.texts += len(texts)
+        try:
+            vectors = await self.embeddings.aembed_documents(texts)
+        except asyncio.CancelledError:
+            self._finish(pending, error=None)
+            raise
+        except Exception as e:
+            self._finish(pending, error=e)
+            return
+        self._finish(pending, dict(zip(texts, vectors)))
+
+    def _finish(self, pending: Dict[str, List[asyncio.Future]], vectors: Optional[Dict[str, List[float]]] = None,
+                error: Optional[Exception] = None):
+        """Encerra o lote antes de acordar quem espera, que pode já mandar a próxima consulta."""
+        self._running.discard(asyncio.current_task())
+        # Sem lote em andamento a janela fecha: o que esperava por ela sai agora
+        if self._pending and not self._running:
+            self._flush()
+        for text, futures in pending.items():
+            for future in futures:
+                if future.done():
+                    continue
+                if vectors is not None:
+                    future.set_result(vectors[text])
+                elif error is not None:
+                    future.set_exception(error)
+                else:
+                    future.cancel()
+
+    def stats(self) -> Dict:
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'batches': self.batches,
+            'texts_embedded': self.texts,
+            'avg_batch_size': self.texts / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,273 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from metrics import EMBEDDING_SECONDS, EMBEDDING_TEXTS
+from catalog_store import INDEX_DIR
+from product_index import embedding_model_name
+
+EMBEDDING_CACHE_DB = INDEX_DIR / 'embeddings.sqlite'
+
+# Maximum number of keys per SELECT ... IN (...) on the disk tier
+_SQLITE_BATCH = 500
+
+
+def cache_key(model: str, text: str) -> str:
+    """Cache key for a text embedded by a given model."""
+    return hashlib.sha256(f'{model}\0{text}'.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: an in-memory LRU over an optional SQLite table of float32 vectors.
+
+    The async methods serve the memory tier inline and run SQLite reads and writes in a worker
+    thread, so a slow disk or a WAL checkpoint does not stall the event loop.
+    """
+
+    def __init__(self, db_path: Optional[Path] = EMBEDDING_CACHE_DB, max_memory_entries: int = 10000):
+        self.max_memory_entries = max_memory_entries
+        self._memory: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        self._memory_bytes = 0
+        # Memory tier and SQLite connection have separate locks: a slow disk read in a worker
+        # thread must not block memory lookups made on the event loop
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if db_path is not None:
+            db_path = Path(db_path)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False, timeout=30)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL)'
+            )
+            self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> 'EmbeddingCache':
+        """Configure from EMBEDDING_CACHE_DB (empty disables the disk tier) and EMBEDDING_CACHE_MEMORY_ENTRIES."""
+        db_path = os.getenv('EMBEDDING_CACHE_DB', str(EMBEDDING_CACHE_DB))
+        return cls(
+            db_path=Path(db_path) if db_path else None,
+            max_memory_entries=int(os.getenv('EMBEDDING_CACHE_MEMORY_ENTRIES', '10000')),
+        )
+
+    def _remember(self, key: str, vector: np.ndarray):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous.nbytes
+        self._memory[key] = vector
+        self._memory_bytes += vector.nbytes
+        while len(self._memory) > self.max_memory_entries:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def get_memory(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Look keys up in the memory tier only; None for keys not in memory."""
+        with self._lock:
+            vectors = []
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                vectors.append(vector)
+            return vectors
+
+    def _get_disk(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Look keys missing from memory up on disk, promoting the hits to memory."""
+        found: Dict[str, np.ndarray] = {}
+        if self._conn is not None:
+            unique = list(dict.fromkeys(keys))
+            with self._db_lock:
+                for start in range(0, len(unique), _SQLITE_BATCH):
+                    chunk = unique[start:start + _SQLITE_BATCH]
+                    rows = self._conn.execute(
+                        f'SELECT key, vector FROM embeddings WHERE key IN ({",".join("?" * len(chunk))})', chunk
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(blob, dtype=np.float32)
+        with self._lock:
+            for key, vector in found.items():
+                self._remember(key, vector)
+            for key in keys:
+                if key in found:
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Look keys up in memory, then on disk; None for misses."""
+        vectors = self.get_memory(keys)
+        missing = [key for key, vector in zip(keys, vectors) if vector is None]
+        found = self._get_disk(missing) if missing else {}
+        return [found.get(key) if vector is None else vector for key, vector in zip(keys, vectors)]
+
+    async def aget_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Like get_many, with the disk tier read in a worker thread instead of on the event loop."""
+        vectors = self.get_memory(keys)
+        missing = [key for key, vector in zip(keys, vectors) if vector is None]
+        if not missing:
+            return vectors
+        if self._conn is not None:
+            found = await asyncio.to_thread(self._get_disk, missing)
+        else:
+            found = self._get_disk(missing)
+        return [found.get(key) if vector is None else vector for key, vector in zip(keys, vectors)]
+
+    def _remember_many(self, keys: List[str], arrays: List[np.ndarray]):
+        with self._lock:
+            for key, vector in zip(keys, arrays):
+                self._remember(key, vector)
+
+    def _store(self, keys: List[str], arrays: List[np.ndarray]):
+        with self._db_lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)',
+                [(key, vector.size, vector.tobytes()) for key, vector in zip(keys, arrays)],
+            )
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        """Store vectors in memory and, when enabled, on disk."""
+        arrays = [np.asarray(v, dtype=np.float32) for v in vectors]
+        self._remember_many(keys, arrays)
+        if self._conn is not None:
+            self._store(keys, arrays)
+
+    async def aput_many(self, keys: List[str], vectors: List[List[float]]):
+        """Like put_many, with the disk write in a worker thread."""
+        arrays = [np.asarray(v, dtype=np.float32) for v in vectors]
+        self._remember_many(keys, arrays)
+        if self._conn is not None:
+            await asyncio.to_thread(self._store, keys, arrays)
+
+    def stats(self) -> Dict:
+        disk_bytes = 0
+        if self._conn is not None:
+            with self._db_lock:
+                page_count = self._conn.execute('PRAGMA page_count').fetchone()[0]
+                page_size = self._conn.execute('PRAGMA page_size').fetchone()[0]
+            disk_bytes = page_count * page_size
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                'memory_entries': len(self._memory),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': hits / total if total else 0.0,
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': disk_bytes,
+            }
+
+
+class CachedEmbeddings:
+    """Embeddings client wrapper that goes through an EmbeddingCache.
+
+    Exposes the same methods as the wrapped client. Concurrent async requests for a text
+    that is already being embedded wait for that call instead of issuing another one.
+    """
+
+    def __init__(self, embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = embedding_model_name(embeddings)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _lookup(self, texts: List[str]):
+        keys = [cache_key(self.model, text) for text in texts]
+        return keys, self.cache.get_many(keys)
+
+    def cached(self, text: str) -> Optional[List[float]]:
+        """Embedding of the text if it is in the memory tier (no disk access, safe on the event loop)."""
+        vector = self.cache.get_memory([cache_key(self.model, text)])[0]
+        return None if vector is None else vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, vectors = self._lookup(texts)
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            inicio = time.perf_counter()
+            computed = self.embeddings.embed_documents([text_by_key[key] for key in missing])
+            EMBEDDING_SECONDS.observe(time.perf_counter() - inicio)
+            EMBEDDING_TEXTS.inc(amount=len(missing))
+            self.cache.put_many(missing, computed)
+            fresh = dict(zip(missing, computed))
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        return [v.tolist() if isinstance(v, np.ndarray) else v for v in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model, text) for text in texts]
+        vectors = await self.cache.aget_many(keys)
+        text_by_key = dict(zip(keys, texts))
+        loop = asyncio.get_running_loop()
+
+        own: List[str] = []
+        waiting: Dict[str, asyncio.Future] = {}
+        for key, vector in zip(keys, vectors):
+            if vector is not None or key in waiting or key in own:
+                continue
+            future = self._inflight.get(key)
+            if future is not None:
+                waiting[key] = future
+            else:
+                self._inflight[key] = loop.create_future()
+                own.append(key)
+
+        results: Dict[str, List[float]] = {}
+        if own:
+            try:
+                inicio = time.perf_counter()
+                computed = await self.embeddings.aembed_documents([text_by_key[key] for key in own])
+                EMBEDDING_SECONDS.observe(time.perf_counter() - inicio)
+                EMBEDDING_TEXTS.inc(amount=len(own))
+            except BaseException as e:
+                # Also on cancellation: nobody may be left waiting on a computation that stopped
+                for key in own:
+                    future = self._inflight.pop(key)
+                    if isinstance(e, Exception):
+                        future.set_exception(e)
+                        future.exception()  # mark as retrieved when nobody else is waiting
+                    else:
+                        future.cancel()
+                raise
+            for key, vector in zip(own, computed):
+                results[key] = vector
+                self._inflight.pop(key).set_result(vector)
+            # Only after the futures are settled, so a failing write cannot strand the waiters
+            await self.cache.aput_many(own, computed)
+        for key, future in waiting.items():
+            try:
+                # Shielded: cancelling this caller must not cancel the owner's future
+                results[key] = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The owner was cancelled before finishing: compute it here instead
+                results[key] = (await self.aembed_documents([text_by_key[key]]))[0]
+
+        return [
+            results[key] if vector is None else vector.tolist()
+            for key, vector in zip(keys, vectors)
+        ]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
@@ -0,0 +1,212 @@
+"""Ingestão em fluxo dos arquivos de produtos e pedidos (array JSON ou JSONL, de qualquer tamanho).
+
+Cada registro é lido, validado contra o esquema (registros.py) e repassado aos índices em lotes;
+os recusados vão para um arquivo JSONL à parte. Os novos índices são montados ao lado dos atuais
+e trocados atomicamente no fim, com a API no ar.
+
+    python src/ingestion.py produtos /exportacoes/produtos.jsonl
+    python src/ingestion.py pedidos /exportacoes/pedidos.json --rejeitados /tmp/pedidos.rejeitados.jsonl
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
+
+from catalog_store import (INDEX_DIR, PRODUTOS_FILE, PROJECT_ROOT, CatalogStore, acquire_file_lock,
+                           activate_catalog, compile_catalog, release_file_lock)
+from order_store import PEDIDOS_DB, PEDIDOS_FILE, SqliteOrderStore, file_signature
+from registros import ESQUEMA_PEDIDO, ESQUEMA_PRODUTO, ErroFormato, Rejeitados, registros_validos
+
+# Diretório dos arquivos recusados (um por ingestão) e dos arquivos aceitos pelo endpoint de admin
+INGEST_REJECTS_DIR = Path(os.getenv('INGEST_REJECTS_DIR', str(INDEX_DIR / 'rejeitados')))
+INGEST_DIR = Path(os.getenv('INGEST_DIR', str(PROJECT_ROOT / 'data' / 'ingest')))
+
+logger = logging.getLogger('ingestion')
+
+
+class ErroIngestao(Exception):
+    """A ingestão não pôde ser concluída; a versão em uso continua valendo."""
+
+
+class ResultadoIngestao(NamedTuple):
+    tipo: str
+    aceitos: int
+    rejeitados: int
+    # JSONL com os registros recusados (None se nenhum foi recusado)
+    arquivo_rejeitados: Optional[str]
+    versao: str
+    segundos: float
+
+
+class _ArrayJson:
+    """Grava registros como um array JSON, um por linha, calculando o sha256 do arquivo."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.sha256 = hashlib.sha256()
+        self.total = 0
+        self._arquivo = open(self.path, 'wb')
+        self._gravar(b'[')
+
+    def _gravar(self, dados: bytes):
+        self._arquivo.write(dados)
+        self.sha256.update(dados)
+
+    def repassar(self, registros: Iterable[Dict]) -> Iterator[Dict]:
+        """Grava cada registro e o repassa adiante (uma única leitura da origem)."""
+        for registro in registros:
+            separador = b',\n' if self.total else b'\n'
+            self._gravar(separador + json.dumps(registro, ensure_ascii=False).encode('utf-8'))
+            self.total += 1
+            yield registro
+
+    def close(self):
+        if not self._arquivo.closed:
+            self._gravar(b'\n]\n')
+            self._arquivo.close()
+
+
+def caminho_rejeitados(tipo: str) -> Path:
+    return INGEST_REJECTS_DIR / f'{tipo}-{datetime.now().strftime("%Y%m%dT%H%M%S")}.jsonl'
+
+
+def _resultado(tipo: str, aceitos: int, rejeitados: Rejeitados, versao: str, inicio: float) -> ResultadoIngestao:
+    return ResultadoIngestao(tipo, aceitos, rejeitados.total, str(rejeitados.path) if rejeitados.total else None,
+                             versao, round(time.perf_counter() - inicio, 3))
+
+
+def _temporario(destino: Path) -> Path:
+    return destino.with_name(f'.{destino.name}.{os.getpid()}.tmp')
+
+
+async def ingerir_produtos(origem: Path, rejeitados: Optional[Path] = None, embeddings=None,
+                           destino: Path = PRODUTOS_FILE, index_dir: Path = INDEX_DIR) -> ResultadoIngestao:
+    """Compila o catálogo e a matriz de embeddings da origem e os ativa.
+
+    Numa única leitura da origem, os produtos válidos vão para o catálogo colunar e para o novo
+    `destino` (array JSON). Com a matriz pronta (só refeita se o texto dos produtos mudou), o
+    arquivo e o ponteiro do catálogo são trocados; os workers em execução passam para a nova
+    versão em RAGSystem.refresh_products.
+    """
+    from product_index import ProductIndex
+
+    inicio = time.perf_counter()
+    origem, destino, index_dir = Path(origem), Path(destino), Path(index_dir)
+    if embeddings is None:
+        from embedding_cache import CachedEmbeddings, EmbeddingCache
+        from providers import create_embeddings
+        embeddings = CachedEmbeddings(create_embeddings(), EmbeddingCache.from_env())
+
+    temporario = _temporario(destino)
+    # A mesma trava de load_catalog: nenhum worker recompila o arquivo antigo no meio da troca
+    lock = await asyncio.to_thread(acquire_file_lock, index_dir / 'catalogo.lock')
+    try:
+        with Rejeitados(rejeitados or caminho_rejeitados('produtos')) as recusados:
+            saida = _ArrayJson(temporario)
+            try:
+                validos = saida.repassar(registros_validos(origem, ESQUEMA_PRODUTO, recusados))
+                compilado = await asyncio.to_thread(compile_catalog, validos, index_dir, activate=False)
+            finally:
+                saida.close()
+        if not saida.total:
+            raise ErroIngestao(f'{origem.name}: nenhum produto válido ({recusados.total} recusados)')
+
+        catalogo = CatalogStore.open(compilado)
+        await ProductIndex(catalogo, embeddings, index_dir=index_dir).ensure_ready()
+
+        os.replace(temporario, destino)
+        activate_catalog(compilado, index_dir, fonte=saida.sha256.hexdigest())
+    finally:
+        release_file_lock(lock)
+        if temporario.exists():
+            temporario.unlink()
+
+    resultado = _resultado('produtos', saida.total, recusados, catalogo.version, inicio)
+    logger.info('Produtos: %s', resultado)
+    return resultado
+
+
+def ingerir_pedidos(origem: Path, rejeitados: Optional[Path] = None, destino: Path = PEDIDOS_FILE,
+                    db_path: Optional[Path] = None, indexar: Optional[bool] = None) -> ResultadoIngestao:
+    """Valida os pedidos da origem, monta a tabela SQLite em lotes e troca arquivo e tabela.
+
+    A tabela só é montada com PEDIDOS_BACKEND=sqlite (ou ``indexar=True``); o backend em
+    memória relê o novo arquivo sozinho quando ele muda.
+    """
+    inicio = time.perf_counter()
+    origem, destino = Path(origem), Path(destino)
+    if indexar is None:
+        indexar = os.getenv('PEDIDOS_BACKEND', 'memory').lower() == 'sqlite'
+    db_path = Path(db_path or os.getenv('PEDIDOS_DB', str(PEDIDOS_DB)))
+    # Conexão própria: os workers continuam lendo a tabela atual durante a importação
+    store = SqliteOrderStore(destino, db_path) if indexar else None
+    lock = acquire_file_lock(db_path.with_suffix('.lock'))
+    temporario = _temporario(destino)
+    try:
+        with Rejeitados(rejeitados or caminho_rejeitados('pedidos')) as recusados:
+            saida = _ArrayJson(temporario)
+            try:
+                validos = saida.repassar(registros_validos(origem, ESQUEMA_PEDIDO, recusados))
+                if store is not None:
+                    store.import_staging(validos)
+                else:
+                    # Sem tabela: só grava o novo arquivo
+                    deque(validos, maxlen=0)
+            finally:
+                saida.close()
+        if not saida.total:
+            raise ErroIngestao(f'{origem.name}: nenhum pedido válido ({recusados.total} recusados)')
+
+        os.replace(temporario, destino)
+        if store is not None:
+            store.swap_staging(file_signature(destino))
+    finally:
+        release_file_lock(lock)
+        if store is not None:
+            store.close()
+        if temporario.exists():
+            temporario.unlink()
+
+    resultado = _resultado('pedidos', saida.total, recusados, saida.sha256.hexdigest(), inicio)
+    logger.info('Pedidos: %s', resultado)
+    return resultado
+
+
+async def ingerir(tipo: str, origem: Path, rejeitados: Optional[Path] = None, embeddings=None) -> ResultadoIngestao:
+    """Ponto de entrada comum do CLI e do endpoint de admin."""
+    if not Path(origem).is_file():
+        raise ErroIngestao(f'Arquivo não encontrado: {origem}')
+    if tipo == 'produtos':
+        return await ingerir_produtos(origem, rejeitados, embeddings)
+    if tipo == 'pedidos':
+        return await asyncio.to_thread(ingerir_pedidos, origem, rejeitados)
+    raise ErroIngestao(f'Tipo desconhecido: {tipo}')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('tipo', choices=['produtos', 'pedidos'])
+    parser.add_argument('origem', type=Path, help='array JSON ou JSONL (.jsonl/.ndjson)')
+    parser.add_argument('--rejeitados', type=Path, help=f'padrão: {INGEST_REJECTS_DIR}/<tipo>-<data>.jsonl')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    try:
+        resultado = asyncio.run(ingerir(args.tipo, args.origem, args.rejeitados))
+    except (ErroIngestao, ErroFormato) as e:
+        logger.error('%s', e)
+        return 1
+    print(json.dumps(resultado._asdict(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import json
+import os
+import re
+from pathlib import Path
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from texto import normalizar_texto
+
+# Get the absolute path to the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+INTENTS_FILE = PROJECT_ROOT / 'data' / 'intents.json'
+
+INTENT_GERAL = 'geral'
+
+
+class Rota(NamedTuple):
+    """Classificação de uma mensagem."""
+    # Intent vencedora, pela ordem das regras da configuração
+    intent: str
+    # Todas as intents com alguma palavra-chave na mensagem
+    intents: FrozenSet[str]
+    categoria: Optional[str]
+    pedido_id: Optional[str]
+    tem_numero: bool
+    # Se a resposta do LLM deve passar pelo filtro de produtos do catálogo
+    filtrar_catalogo: bool
+
+
+def _menor_bit(mascara: int) -> int:
+    return (mascara & -mascara).bit_length() - 1
+
+
+def regex_trie(palavras: List[str]) -> str:
+    """Alternância fatorada em trie ('casa|cozinha' -> 'c(?:asa|ozinha)'), preferindo a palavra mais longa."""
+    trie: Dict = {}
+    for palavra in palavras:
+        no = trie
+        for letra in palavra:
+            no = no.setdefault(letra, {})
+        no[''] = {}
+
+    def montar(no: Dict) -> str:
+        ramos = [re.escape(letra) + montar(filho) for letra, filho in sorted(no.items()) if letra]
+        if not ramos:
+            return ''
+        alternancia = ramos[0] if len(ramos) == 1 else '(?:' + '|'.join(ramos) + ')'
+        if '' not in no:
+            return alternancia
+        return f'(?:{alternancia})?'
+
+    return montar(trie)
+
+
+class IntentRouter:
+    """Roteador de intents orientado a dados, compilado em uma única expressão regular.
+
+    As tabelas de palavras-chave (regras de intent, categorias, filtro de catálogo) vêm de
+    ``data/intents.json``. Todas as palavras, sem acento, viram uma única alternância em trie,
+    de modo que uma mensagem é classificada em uma passada, junto com o número do pedido.
+    Como nas verificações ``palavra in mensagem`` que substitui, a busca é por substring;
+    uma palavra encontrada também conta para as palavras-chave contidas nela.
+    """
+
+    def __init__(self, config: Dict):
+        self.regras: List[str] = [regra['intent'] for regra in config.get('regras', [])]
+        self.categorias: List[str] = list(config.get('categorias', {}))
+        self._intents_cache: Dict[int, FrozenSet[str]] = {}
+        # Regras cujas mensagens usam o primeiro número solto como número do pedido
+        self._extrai_pedido = sum(1 << i for i, regra in enumerate(config.get('regras', []))
+                                  if regra.get('extrair_pedido'))
+
+        # Máscaras de bits de cada palavra: regras, categorias e filtro de catálogo
+        mascaras: Dict[str, List[int]] = {}
+        for i, regra in enumerate(config.get('regras', [])):
+            for palavra in regra['palavras']:
+                mascaras.setdefault(normalizar_texto(palavra), [0, 0, 0])[0] |= 1 << i
+        for j, categoria in enumerate(self.categorias):
+            for palavra in config['categorias'][categoria]:
+                mascaras.setdefault(normalizar_texto(palavra), [0, 0, 0])[1] |= 1 << j
+        for palavra in config.get('filtro_catalogo', []):
+            mascaras.setdefault(normalizar_texto(palavra), [0, 0, 0])[2] = 1
+        mascaras.pop('', None)
+
+        # Uma ocorrência de 'produtos' também é uma ocorrência de 'produto'
+        self._mascaras: Dict[str, Tuple[int, int, int]] = {
+            palavra: self._contidas(mascaras, palavra) for palavra in mascaras
+        }
+
+        prefixos = [p for p in map(normalizar_texto, config.get('referencia_pedido', [])) if p]
+        self._mascaras_referencia = {p: self._contidas(mascaras, p) for p in prefixos}
+        # Alternativas: referência ao pedido (prefixo + número, ou #número), palavra-chave, número
+        # solto. Todas começam por um caractere literal, então o re monta o conjunto de caracteres
+        # iniciais e pula em C as posições que não iniciam nada (bem mais rápido em mensagens longas).
+        iniciais: Dict[str, List[str]] = {}
+        for palavra in mascaras:
+            iniciais.setdefault(palavra[0], []).append(palavra[1:])
+        self._padrao = re.compile('|'.join(
+            [re.escape(p) + r'[\s#:]*\d+' for p in prefixos] + [r'#\d+']
+            + [re.escape(letra) + regex_trie(restos) for letra, restos in sorted(iniciais.items())]
+            + [rf'{digito}\d*' for digito in range(10)]
+        ))
+
+    @staticmethod
+    def _contidas(mascaras: Dict[str, List[int]], texto: str) -> Tuple[int, int, int]:
+        regras = categorias = filtro = 0
+        for palavra, (r, c, f) in mascaras.items():
+            if palavra in texto:
+                regras, categorias, filtro = regras | r, categorias | c, filtro | f
+        return regras, categorias, filtro
+
+    @classmethod
+    def from_file(cls, path: Optional[Path] = None) -> 'IntentRouter':
+        """Carrega as tabelas de INTENTS_FILE (ou do caminho informado)."""
+        path = Path(path or os.getenv('INTENTS_FILE', str(INTENTS_FILE)))
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def classificar(self, mensagem: str) -> Rota:
+        """Classifica a mensagem em uma passada: intent, categoria e número do pedido."""
+        regras = categorias = filtro = 0
+        pedido_id = None
+        primeiro_numero = None
+
+        # dict.fromkeys remove ocorrências repetidas mantendo a ordem de aparição
+        for trecho in dict.fromkeys(self._padrao.findall(normalizar_texto(mensagem))):
+            mascara = self._mascaras.get(trecho)
+            if mascara is not None:
+                r, c, f = mascara
+            elif trecho[0].isdigit():
+                if primeiro_numero is None:
+                    primeiro_numero = trecho
+                continue
+            else:
+                prefixo = trecho.rstrip('0123456789')
+                referencia = trecho[len(prefixo):]
+                r, c, f = self._mascaras_referencia.get(prefixo.rstrip(' \t\r\n#:'), (0, 0, 0))
+                if pedido_id is None:
+                    pedido_id = referencia
+                if primeiro_numero is None:
+                    primeiro_numero = referencia
+            regras, categorias, filtro = regras | r, categorias | c, filtro | f
+
+        intents = self._intents_cache.get(regras)
+        if intents is None:
+            intents = frozenset(intent for i, intent in enumerate(self.regras) if regras >> i & 1)
+            self._intents_cache[regras] = intents
+
+        # Sem referência explícita (#123, pedido 123), usa o primeiro número se alguma regra
+        # encontrada extrai o número do pedido (extrair_pedido na configuração)
+        if pedido_id is None and regras & self._extrai_pedido:
+            pedido_id = primeiro_numero
+
+        return Rota(
+            intent=self.regras[_menor_bit(regras)] if regras else INTENT_GERAL,
+            intents=intents,
+            categoria=self.categorias[_menor_bit(categorias)] if categorias else None,
+            pedido_id=pedido_id,
+            tem_numero=primeiro_numero is not None,
+            filtrar_catalogo=bool(filtro),
+        )
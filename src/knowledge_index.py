@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bm25 import BM25Index
+from catalog_store import file_lock
+from product_index import INDEX_DIR, PROJECT_ROOT, embedding_model_name
+
+DATA_DIR = PROJECT_ROOT / 'data'
+
+# Documents ingested into the knowledge base, relative to data/
+KNOWLEDGE_SOURCES = ['knowledge/*.txt', 'knowledge/*.md', '*.md']
+
+# Bumped when the persisted layout changes (2: chunk ids stored in the chunk metadata)
+KNOWLEDGE_FORMAT = 2
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def langchain_embeddings(embeddings):
+    """Adapt a duck-typed embeddings client to langchain's Embeddings interface, as FAISS expects."""
+    from langchain_core.embeddings import Embeddings
+
+    if isinstance(embeddings, Embeddings):
+        return embeddings
+
+    class _Adapter(Embeddings):
+        def embed_documents(self, texts):
+            return embeddings.embed_documents(texts)
+
+        def embed_query(self, text):
+            return embeddings.embed_query(text)
+
+        async def aembed_documents(self, texts):
+            return await embeddings.aembed_documents(texts)
+
+        async def aembed_query(self, text):
+            return await embeddings.aembed_query(text)
+
+    return _Adapter()
+
+
+class KnowledgeIndex:
+    """FAISS index over the knowledge documents, persisted and updated file by file.
+
+    After load(), ``lexical`` holds a BM25 index over the same chunks, keyed by chunk id.
+    """
+
+    def __init__(self, embeddings, data_dir: Path = DATA_DIR, index_dir: Path = INDEX_DIR / 'knowledge',
+                 sources: Optional[List[str]] = None):
+        self.embeddings = embeddings
+        self.data_dir = Path(data_dir)
+        self.index_dir = Path(index_dir)
+        self.manifest_file = self.index_dir / 'manifest.json'
+        self.sources = sources or KNOWLEDGE_SOURCES
+        self.model_name = embedding_model_name(embeddings)
+        self.version: Optional[str] = None
+        self.lexical: Optional[BM25Index] = None
+
+    def discover(self) -> Dict[str, Path]:
+        """Map each knowledge file (relative to data/) to its path."""
+        files = {}
+        for pattern in self.sources:
+            for path in sorted(self.data_dir.glob(pattern)):
+                if path.is_file():
+                    files[path.relative_to(self.data_dir).as_posix()] = path
+        return files
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get('model') != self.model_name or manifest.get('format') != KNOWLEDGE_FORMAT:
+            return {}
+        return manifest
+
+    def _save(self, store, manifest: Dict):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        store.save_local(str(self.index_dir))
+        tmp_manifest = self.manifest_file.with_suffix(f'.json.{os.getpid()}.tmp')
+        with open(tmp_manifest, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_manifest, self.manifest_file)
+
+    def _split(self, name: str, path: Path, digest: str):
+        """Chunk one file, returning the chunks and their stable ids."""
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        from langchain_community.document_loaders import TextLoader
+
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200
+        )
+        documents = TextLoader(str(path), encoding='utf-8').load()
+        for document in documents:
+            document.metadata['source'] = name
+        chunks = text_splitter.split_documents(documents)
+        ids = [f'{name}:{digest[:12]}:{i}' for i in range(len(chunks))]
+        for chunk, chunk_id in zip(chunks, ids):
+            chunk.metadata['chunk_id'] = chunk_id
+        return chunks, ids
+
+    def load(self):
+        """Load the persisted FAISS index, re-embedding only new or changed files.
+
+        Also rebuilds the BM25 index from the chunks in the store; that needs no embeddings.
+        """
+        # Workers starting together wait for whichever one is updating the index
+        with file_lock(self.index_dir.with_suffix('.lock')):
+            store = self._load_store()
+        if store is None:
+            self.lexical = BM25Index([], [])
+        else:
+            ids = list(store.index_to_docstore_id.values())
+            self.lexical = BM25Index(ids, [store.docstore.search(i).page_content for i in ids])
+        return store
+
+    def _load_store(self):
+        # FAISS and langchain are imported here so that importing this module stays cheap
+        from langchain_community.vectorstores import FAISS
+
+        embeddings = langchain_embeddings(self.embeddings)
+        files = self.discover()
+        manifest = self._load_manifest()
+        indexed: Dict[str, Dict] = manifest.get('files', {})
+
+        store = None
+        if indexed:
+            try:
+                store = FAISS.load_local(str(self.index_dir), embeddings,
+                                         allow_dangerous_deserialization=True)
+            except Exception:
+                store, indexed = None, {}
+
+        hashes = {name: file_hash(path) for name, path in files.items()}
+        self.version = hashlib.sha256(
+            json.dumps([self.model_name, sorted(hashes.items())]).encode('utf-8')
+        ).hexdigest()
+        stale = [name for name, entry in indexed.items() if hashes.get(name) != entry['sha256']]
+        fresh = [name for name in files if name not in indexed or name in stale]
+
+        if not stale and not fresh:
+            return store
+
+        stale_ids = [chunk_id for name in stale for chunk_id in indexed[name]['chunk_ids']]
+        if store is not None and stale_ids:
+            store.delete(stale_ids)
+        for name in stale:
+            del indexed[name]
+
+        chunks, ids = [], []
+        for name in fresh:
+            file_chunks, file_ids = self._split(name, files[name], hashes[name])
+            chunks.extend(file_chunks)
+            ids.extend(file_ids)
+            indexed[name] = {'sha256': hashes[name], 'chunk_ids': file_ids}
+
+        if chunks:
+            if store is None:
+                store = FAISS.from_documents(chunks, embeddings, ids=ids)
+            else:
+                store.add_documents(chunks, ids=ids)
+
+        if not any(entry['chunk_ids'] for entry in indexed.values()):
+            shutil.rmtree(self.index_dir, ignore_errors=True)
+            return None
+
+        self._save(store, {'model': self.model_name, 'format': KNOWLEDGE_FORMAT, 'files': indexed})
+        return store
@@ -0,0 +1,103 @@
+"""Sobe a API com vários workers do uvicorn compartilhando os índices e o estado do host.
+
+Antes de criar os workers, o launcher compila o catálogo e constrói (ou valida) os índices
+persistidos em INDEX_DIR; cada worker só mapeia os arquivos prontos. Com mais de um worker,
+histórico, pedidos e cache de respostas passam para os backends SQLite (modo WAL), a menos
+que as variáveis correspondentes tenham sido definidas explicitamente.
+
+    python src/launcher.py --workers 4 --port 8000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SRC_DIR = Path(__file__).resolve().parent
+
+# Backends que precisam ser compartilhados entre workers
+BACKENDS_COMPARTILHADOS = {
+    'CHAT_HISTORY_BACKEND': 'sqlite',
+    'PEDIDOS_BACKEND': 'sqlite',
+    'RESPONSE_CACHE_BACKEND': 'sqlite',
+}
+
+logger = logging.getLogger('launcher')
+
+
+def cpus_disponiveis() -> int:
+    """CPUs que o processo pode usar: afinidade e, em contêiner, a cota do cgroup v2."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        cota, periodo = Path('/sys/fs/cgroup/cpu.max').read_text().split()
+        if cota != 'max':
+            cpus = min(cpus, max(1, int(int(cota) // int(periodo))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def numero_workers(pedido: Optional[int] = None) -> int:
+    """Workers a usar: o pedido, WEB_CONCURRENCY ou um por CPU disponível."""
+    if pedido:
+        return max(1, pedido)
+    if os.getenv('WEB_CONCURRENCY'):
+        return max(1, int(os.environ['WEB_CONCURRENCY']))
+    return cpus_disponiveis()
+
+
+def configurar_estado_compartilhado(workers: int) -> Dict[str, str]:
+    """Com mais de um worker, escolhe os backends SQLite para o estado ainda não configurado.
+
+    Retorna os backends que continuam por worker (configurados explicitamente como memory).
+    """
+    if workers <= 1:
+        return {}
+    locais = {}
+    for variavel, backend in BACKENDS_COMPARTILHADOS.items():
+        valor = os.environ.setdefault(variavel, backend)
+        if valor.lower() != backend:
+            locais[variavel] = valor
+            logger.warning('%s=%s: esse estado não será compartilhado entre os %d workers', variavel, valor, workers)
+    return locais
+
+
+async def preparar_indices():
+    """Compila o catálogo e constrói os índices uma vez, antes dos workers subirem."""
+    from rag_system import RAGSystem
+
+    rag_system = RAGSystem()
+    await rag_system.warmup()
+    return rag_system.data_version()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '8000')))
+    parser.add_argument('--workers', type=int, help='padrão: WEB_CONCURRENCY ou uma por CPU')
+    parser.add_argument('--sem-preparo', action='store_true',
+                        help='não constrói os índices antes (cada worker carrega ou constrói no aquecimento)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    if str(SRC_DIR) not in sys.path:
+        sys.path.insert(0, str(SRC_DIR))
+    workers = numero_workers(args.workers)
+    configurar_estado_compartilhado(workers)
+    if not args.sem_preparo:
+        versao = asyncio.run(preparar_indices())
+        logger.info('Índices prontos (versão %s)', versao)
+
+    import uvicorn
+    logger.info('Subindo %d worker(s) em %s:%d', workers, args.host, args.port)
+    uvicorn.run('api:app', host=args.host, port=args.port, workers=workers, app_dir=str(SRC_DIR))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import os
+import random
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from metrics import LLM_IN_FLIGHT, LLM_QUEUE_DEPTH, LLM_QUEUE_SECONDS, LLM_RETRIES
+
+
+class LLMGatewayError(Exception):
+    """O LLM não respondeu: tentativas esgotadas ou prazo estourado."""
+
+
+class LLMTimeoutError(LLMGatewayError):
+    """O prazo da chamada (fila, tentativas e esperas incluídas) terminou."""
+
+
+def status_code(erro: BaseException) -> Optional[int]:
+    """Status HTTP de um erro do provedor (openai.APIStatusError e semelhantes), se houver."""
+    for origem in (erro, getattr(erro, 'response', None)):
+        codigo = getattr(origem, 'status_code', None)
+        if isinstance(codigo, int):
+            return codigo
+    return None
+
+
+def retry_after(erro: BaseException) -> Optional[float]:
+    """Segundos pedidos pelo cabeçalho Retry-After da resposta de erro, se houver."""
+    headers = getattr(getattr(erro, 'response', None), 'headers', None)
+    try:
+        return float(headers.get('retry-after')) if headers is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def retentavel(erro: BaseException) -> bool:
+    """429 (rate limit) e 5xx valem nova tentativa; o resto é erro da requisição."""
+    codigo = status_code(erro)
+    return codigo is not None and (codigo == 429 or 500 <= codigo < 600)
+
+
+def chave_mensagens(lotes: List[List]) -> str:
+    """Identifica um prompt (tipo e conteúdo de cada mensagem) para juntar chamadas idênticas."""
+    digest = hashlib.sha256()
+    for mensagens in lotes:
+        for mensagem in mensagens:
+            digest.update(type(mensagem).__name__.encode('utf-8'))
+            digest.update(b'\0')
+            digest.update(str(getattr(mensagem, 'content', mensagem)).encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(b'\1')
+    return digest.hexdigest()
+
+
+class TokenBucket:
+    """Limita a taxa de chamadas: `rate` fichas por segundo, acumulando até `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.clock = clock
+        self._fichas = self.burst
+        self._atualizado = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # O lock mantém a ordem de chegada entre quem espera ficha
+        async with self._lock:
+            while True:
+                agora = self.clock()
+                self._fichas = min(self.burst, self._fichas + (agora - self._atualizado) * self.rate)
+                self._atualizado = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                await asyncio.sleep((1 - self._fichas) / self.rate)
+
+
+class LLMGateway:
+    """Ponto único das chamadas ao LLM, com a mesma interface ``agenerate``/``astream``.
+
+    - no máximo ``max_concurrency`` chamadas simultâneas; as demais esperam na fila;
+    - taxa limitada por um token bucket (``rate_limit`` chamadas/s; 0 desliga);
+    - prazo de ``timeout`` segundos por chamada, contando fila, tentativas e esperas;
+    - até ``max_retries`` novas tentativas em 429/5xx, com backoff exponencial e jitter
+      (respeitando Retry-After);
+    - chamadas ``agenerate`` com o mesmo prompt em andamento viram uma só chamada ao provedor.
+
+    No streaming só se tenta de novo antes do primeiro pedaço ser emitido.
+    """
+
+    def __init__(self, llm, max_concurrency: int = 8, rate_limit: float = 0.0, burst: Optional[float] = None,
+                 timeout: float = 60.0, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 rng: Optional[random.Random] = None):
+        self.llm = llm
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rng = rng or random.Random()
+        self._semaforo = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = TokenBucket(rate_limit, burst)
+        self._em_andamento: Dict[str, asyncio.Task] = {}
+
+        self.chamadas = 0
+        self.deduplicadas = 0
+        self.tentativas_extras = 0
+        self.timeouts = 0
+        self.erros = 0
+        self.na_fila = 0
+        self.ativas = 0
+        self.max_fila = 0
+
+    @classmethod
+    def from_env(cls, llm) -> 'LLMGateway':
+        """Configura a partir de LLM_MAX_CONCURRENCY, LLM_RATE_LIMIT, LLM_RATE_BURST, LLM_TIMEOUT,
+        LLM_MAX_RETRIES, LLM_BACKOFF_BASE e LLM_BACKOFF_MAX."""
+        burst = os.getenv('LLM_RATE_BURST')
+        return cls(
+            llm,
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '8')),
+            rate_limit=float(os.getenv('LLM_RATE_LIMIT', '0')),
+            burst=float(burst) if burst else None,
+            timeout=float(os.getenv('LLM_TIMEOUT', '60')),
+            max_retries=int(os.getenv('LLM_MAX_RETRIES', '3')),
+            backoff_base=float(os.getenv('LLM_BACKOFF_BASE', '0.5')),
+            backoff_max=float(os.getenv('LLM_BACKOFF_MAX', '8')),
+        )
+
+    @staticmethod
+    def _restante(prazo: float) -> float:
+        restante = prazo - time.monotonic()
+        if restante <= 0:
+            raise asyncio.TimeoutError
+        return restante
+
+    async def _entrar(self, prazo: float):
+        """Espera vaga no semáforo e ficha no token bucket, dentro do prazo."""
+        inicio = time.monotonic()
+        self.na_fila += 1
+        self.max_fila = max(self.max_fila, self.na_fila)
+        LLM_QUEUE_DEPTH.set(self.na_fila)
+        try:
+            await asyncio.wait_for(self._semaforo.acquire(), self._restante(prazo))
+        finally:
+            self.na_fila -= 1
+            LLM_QUEUE_DEPTH.set(self.na_fila)
+        try:
+            await asyncio.wait_for(self._bucket.acquire(), self._restante(prazo))
+        except BaseException:
+            self._semaforo.release()
+            raise
+        self.ativas += 1
+        LLM_IN_FLIGHT.set(self.ativas)
+        LLM_QUEUE_SECONDS.observe(time.monotonic() - inicio)
+
+    def _sair(self):
+        self.ativas -= 1
+        LLM_IN_FLIGHT.set(self.ativas)
+        self._semaforo.release()
+
+    async def _esperar_nova_tentativa(self, tentativa: int, erro: BaseException, prazo: float):
+        """Backoff exponencial com jitter completo; desiste se a espera passaria do prazo."""
+        espera = self.rng.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** tentativa))
+        espera = max(espera, retry_after(erro) or 0.0)
+        if time.monotonic() + espera >= prazo:
+            self.timeouts += 1
+            raise LLMTimeoutError(f'Prazo de {self.timeout:.0f}s esgotado antes de nova tentativa') from erro
+        self.tentativas_extras += 1
+        LLM_RETRIES.inc(str(status_code(erro)))
+        await asyncio.sleep(espera)
+
+    async def _gerar(self, lotes: List[List], kwargs: Dict):
+        prazo = time.monotonic() + self.timeout
+        tentativa = 0
+        while True:
+            try:
+                await self._entrar(prazo)
+                try:
+                    return await asyncio.wait_for(self.llm.agenerate(lotes, **kwargs), self._restante(prazo))
+                finally:
+                    self._sair()
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMTimeoutError(f'O LLM não respondeu em {self.timeout:.0f}s') from None
+            except Exception as erro:
+                if not retentavel(erro) or tentativa >= self.max_retries:
+                    self.erros += 1
+                    if retentavel(erro):
+                        raise LLMGatewayError(f'LLM indisponível após {tentativa + 1} tentativas') from erro
+                    raise
+                await self._esperar_nova_tentativa(tentativa, erro, prazo)
+                tentativa += 1
+
+    async def agenerate(self, lotes: List[List], **kwargs):
+        """Como ``llm.agenerate``, passando pelos limites do gateway e juntando prompts idênticos."""
+        self.chamadas += 1
+        chave = chave_mensagens(lotes)
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is not None:
+            self.deduplicadas += 1
+        else:
+            tarefa = asyncio.ensure_future(self._gerar(lotes, kwargs))
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda _: self._em_andamento.pop(chave, None))
+        # shield: se quem iniciou a chamada for cancelado, os demais ainda recebem a resposta
+        return await asyncio.shield(tarefa)
+
+    async def astream(self, mensagens: List, **kwargs) -> AsyncIterator:
+        """Como ``llm.astream``, com fila, taxa, prazo e novas tentativas antes do primeiro pedaço."""
+        self.chamadas += 1
+        prazo = time.monotonic() + self.timeout
+        tentativa = 0
+        while True:
+            emitiu = False
+            try:
+                await self._entrar(prazo)
+                iterador = self.llm.astream(mensagens, **kwargs).__aiter__()
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(iterador.__anext__(), self._restante(prazo))
+                        except StopAsyncIteration:
+                            return
+                        emitiu = True
+                        yield chunk
+                finally:
+                    self._sair()
+                    aclose = getattr(iterador, 'aclose', None)
+                    if aclose is not None:
+                        try:
+                            await aclose()
+                        except Exception:
+                            pass
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMTimeoutError(f'O LLM não respondeu em {self.timeout:.0f}s') from None
+            except Exception as erro:
+                if emitiu or not retentavel(erro) or tentativa >= self.max_retries:
+                    self.erros += 1
+                    raise
+                await self._esperar_nova_tentativa(tentativa, erro, prazo)
+                tentativa += 1
+
+    def stats(self) -> Dict:
+        return {
+            'max_concurrency': self.max_concurrency,
+            'in_flight': self.ativas,
+            'queue_depth': self.na_fila,
+            'max_queue_depth': self.max_fila,
+            'calls': self.chamadas,
+            'deduplicated': self.deduplicadas,
+            'retries': self.tentativas_extras,
+            'timeouts': self.timeouts,
+            'errors': self.erros,
+        }
@@ -0,0 +1,250 @@
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Métricas ligadas por padrão; METRICS_ENABLED=0 transforma spans e contadores em no-ops
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# Durações das etapas da requisição atual, para o cabeçalho Server-Timing (None: não coletar)
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_timings', default=None)
+# Valores sem duração da requisição atual (ex.: tokens do prompt), também enviados no Server-Timing
+_request_notes: ContextVar[Optional[Dict[str, str]]] = ContextVar('request_notes', default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pares = list(zip(names, values)) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escape(valor)}"' for nome, valor in pares) + '}'
+
+
+def _numero(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Registry:
+    """Conjunto de métricas exportadas no formato texto do Prometheus."""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        linhas: List[str] = []
+        for metric in self._metrics:
+            linhas.append(f'# HELP {metric.name} {metric.help}')
+            linhas.append(f'# TYPE {metric.name} {metric.kind}')
+            linhas.extend(metric.samples())
+        return '\n'.join(linhas) + '\n'
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labelnames, labels)} {_numero(v)}' for labels, v in items]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value: float, *labels: str):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.registry = registry
+        # Por combinação de labels: [contagem por bucket (não cumulativa) + overflow, soma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value: float, *labels: str):
+        if not self.registry.enabled:
+            return
+        indice = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            serie = self._series.get(labels)
+            if serie is None:
+                serie = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += value
+            serie[2] += 1
+
+    def count(self, *labels: str) -> int:
+        serie = self._series.get(labels)
+        return serie[2] if serie else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        linhas = []
+        for labels, (contagens, soma, total) in items:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                linhas.append(f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", _numero(limite))])} '
+                              f'{acumulado}')
+            linhas.append(f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", "+Inf")])} {total}')
+            linhas.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {soma!r}')
+            linhas.append(f'{self.name}_count{_labels(self.labelnames, labels)} {total}')
+        return linhas
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+STAGE_SECONDS = Histogram('assistente_stage_duration_seconds', 'Duração de cada etapa do processamento de uma mensagem',
+                          ['stage'])
+MESSAGES = Counter('assistente_messages_total', 'Mensagens processadas por intent', ['intent'])
+CACHE_RESULTS = Counter('assistente_response_cache_total', 'Consultas ao cache de respostas por resultado',
+                        ['result'])
+EMBEDDING_SECONDS = Histogram('assistente_embedding_request_duration_seconds',
+                              'Latência das chamadas ao modelo de embeddings')
+EMBEDDING_TEXTS = Counter('assistente_embedding_texts_total', 'Textos enviados ao modelo de embeddings')
+KNOWLEDGE_RETRIEVAL = Counter('assistente_knowledge_retrieval_total',
+                              'Buscas na base de conhecimento: só léxica (BM25 decisivo) ou híbrida', ['mode'])
+CATALOG_MISMATCHES = Counter('assistente_catalog_mismatches_total',
+                             'Preços ou disponibilidade citados pelo LLM que divergem do catálogo', ['kind'])
+PROMPT_TOKENS = Histogram('assistente_prompt_tokens', 'Tokens de cada prompt montado, total e só do contexto',
+                          ['intent', 'part'], buckets=TOKEN_BUCKETS)
+LLM_SECONDS = Histogram('assistente_llm_duration_seconds', 'Latência das chamadas ao LLM', ['mode'])
+LLM_QUEUE_DEPTH = Gauge('assistente_llm_queue_depth', 'Chamadas ao LLM esperando vaga no gateway')
+LLM_IN_FLIGHT = Gauge('assistente_llm_in_flight', 'Chamadas ao LLM em andamento')
+LLM_QUEUE_SECONDS = Histogram('assistente_llm_queue_wait_seconds', 'Espera por vaga (concorrência e taxa) no gateway')
+LLM_RETRIES = Counter('assistente_llm_retries_total', 'Novas tentativas de chamadas ao LLM por status', ['status'])
+LLM_TOKENS = Histogram('assistente_llm_tokens', 'Tokens por chamada ao LLM', ['kind'], buckets=TOKEN_BUCKETS)
+HTTP_SECONDS = Histogram('assistente_http_request_duration_seconds', 'Latência das requisições HTTP',
+                         ['method', 'route', 'status'])
+
+
+class _Span:
+    __slots__ = ('stage', 'inicio')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duracao = time.perf_counter() - self.inicio
+        STAGE_SECONDS.observe(duracao, self.stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((self.stage, duracao))
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    """Context manager que mede uma etapa (histograma por etapa e, se ativo, Server-Timing)."""
+    if not REGISTRY.enabled and _request_timings.get() is None:
+        return _NO_SPAN
+    return _Span(stage)
+
+
+def start_request_timing():
+    """Começa a coletar as etapas da requisição atual; retorna o token para reset_request_timing."""
+    return _request_timings.set([]), _request_notes.set({})
+
+
+def reset_request_timing(token):
+    timings_token, notes_token = token
+    _request_timings.reset(timings_token)
+    _request_notes.reset(notes_token)
+
+
+def request_timings() -> List[Tuple[str, float]]:
+    return list(_request_timings.get() or [])
+
+
+def note_request(name: str, value):
+    """Anota um valor da requisição atual para o Server-Timing (no-op fora de uma requisição)."""
+    notes = _request_notes.get()
+    if notes is not None:
+        notes[name] = str(value)
+
+
+def request_notes() -> Dict[str, str]:
+    return dict(_request_notes.get() or {})
+
+
+def server_timing_header(timings: List[Tuple[str, float]], notes: Optional[Dict[str, str]] = None) -> str:
+    """Cabeçalho Server-Timing (durações em ms, somadas por etapa, na ordem em que terminaram)."""
+    total: Dict[str, float] = {}
+    for stage, duracao in timings:
+        total[stage] = total.get(stage, 0.0) + duracao
+    partes = [f'{stage};dur={duracao * 1000:.2f}' for stage, duracao in total.items()]
+    partes += [f'{nome};desc="{_escape(valor)}"' for nome, valor in (notes or {}).items()]
+    return ', '.join(partes)
@@ -0,0 +1,232 @@
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from catalog_store import INDEX_DIR, acquire_file_lock, release_file_lock
+from registros import ESQUEMA_PEDIDO, ErroFormato, Rejeitados, registros_validos
+
+# Get the absolute path to the project root directory
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+PEDIDOS_FILE = PROJECT_ROOT / 'data' / 'pedidos.json'
+PEDIDOS_DB = INDEX_DIR / 'pedidos.sqlite'
+# Pedidos gravados por transação na reimportação para o SQLite
+PEDIDOS_BATCH = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+def iter_pedidos(path: Path = PEDIDOS_FILE, rejeitados: Optional[Rejeitados] = None) -> Iterable[Dict]:
+    """Pedidos válidos do arquivo (array JSON ou JSONL), lidos em fluxo.
+
+    Registros fora do esquema vão para `rejeitados`; um arquivo malformado levanta ErroFormato.
+    """
+    path = Path(path)
+    if not path.exists():
+        return iter(())
+    return registros_validos(path, ESQUEMA_PEDIDO, rejeitados)
+
+
+def load_pedidos(path: Path = PEDIDOS_FILE) -> List[Dict]:
+    """Carrega os pedidos válidos do arquivo ([] se ele não existe; ErroFormato se malformado)."""
+    rejeitados = Rejeitados()
+    pedidos = list(iter_pedidos(path, rejeitados))
+    if rejeitados.total:
+        logger.warning('%s: %d pedido(s) inválido(s) ignorado(s)', path, rejeitados.total)
+    return pedidos
+
+
+def normalizar_pedido_id(pedido_id) -> str:
+    """Chave usada para indexar e buscar pedidos."""
+    return str(pedido_id).strip()
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) do arquivo, ou None se ele não existir."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class OrderStore(ABC):
+    """Interface dos repositórios de pedidos, recarregados quando o arquivo muda.
+
+    A primeira carga é feita na hora. As seguintes rodam numa thread, e as consultas continuam
+    vendo a versão anterior até a nova ficar pronta.
+    """
+
+    def __init__(self, path: Path = PEDIDOS_FILE):
+        self.path = Path(path)
+        self._signature = None
+        self._lock = threading.Lock()
+        self._recarga: Optional[threading.Thread] = None
+
+    @abstractmethod
+    def get(self, pedido_id) -> Optional[Dict]:
+        """Pedido pelo id, ou None."""
+
+    @abstractmethod
+    def _recarregar(self, signature) -> bool:
+        """Carrega a versão `signature` do arquivo; False se ela deve ser tentada de novo depois."""
+
+    def _tem_versao(self) -> bool:
+        """Se já há uma versão para servir enquanto a nova é carregada."""
+        return self._signature is not None
+
+    def _refresh(self):
+        signature = file_signature(self.path)
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature or (self._recarga is not None and self._recarga.is_alive()):
+                return
+            if not self._tem_versao():
+                self._executar_recarga(signature)
+                return
+            self._recarga = threading.Thread(target=self._executar_recarga, args=(signature,),
+                                             name='order-store-refresh', daemon=True)
+            self._recarga.start()
+
+    def _executar_recarga(self, signature):
+        try:
+            if not self._recarregar(signature):
+                return
+        except (OSError, ErroFormato, sqlite3.Error):
+            # Mantém a versão anterior até o arquivo mudar de novo
+            logger.exception('Erro ao carregar %s; mantendo os pedidos anteriores', self.path)
+        self._signature = signature
+
+    def wait_refresh(self, timeout: Optional[float] = None):
+        """Espera a recarga em segundo plano, se houver uma em andamento."""
+        recarga = self._recarga
+        if recarga is not None:
+            recarga.join(timeout)
+
+
+class JsonOrderStore(OrderStore):
+    """Pedidos em memória indexados por pedido_id, recarregados quando o arquivo muda."""
+
+    def __init__(self, path: Path = PEDIDOS_FILE):
+        super().__init__(path)
+        self._pedidos: Dict[str, Dict] = {}
+
+    def _recarregar(self, signature) -> bool:
+        # Troca a referência de uma vez: quem consulta vê o dicionário antigo ou o novo
+        self._pedidos = {normalizar_pedido_id(p['pedido_id']): p for p in load_pedidos(self.path)}
+        return True
+
+    def get(self, pedido_id) -> Optional[Dict]:
+        self._refresh()
+        return self._pedidos.get(normalizar_pedido_id(pedido_id))
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._pedidos)
+
+
+class SqliteOrderStore(OrderStore):
+    """Pedidos em uma tabela SQLite indexada, para arquivos grandes demais para a memória."""
+
+    def __init__(self, path: Path = PEDIDOS_FILE, db_path: Path = PEDIDOS_DB):
+        super().__init__(path)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Um processo por vez reimporta; os demais continuam lendo a tabela atual
+        self.lock_file = self.db_path.with_suffix('.lock')
+        # WAL e timeout: vários workers leem a tabela enquanto um deles reimporta o arquivo
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS pedidos (pedido_id TEXT PRIMARY KEY, dados TEXT NOT NULL)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)')
+        self._conn.commit()
+
+    def _stored_signature(self) -> Optional[str]:
+        row = self._conn.execute("SELECT valor FROM meta WHERE chave = 'signature'").fetchone()
+        return row[0] if row else None
+
+    def _tem_versao(self) -> bool:
+        # Uma tabela importada antes (por este ou outro processo) já pode ser servida
+        return self._signature is not None or self._stored_signature() is not None
+
+    def _recarregar(self, signature) -> bool:
+        # Outro processo já está reimportando: serve a tabela atual e confere de novo depois
+        lock = acquire_file_lock(self.lock_file, blocking=False)
+        if lock is None:
+            return False
+        try:
+            # Conexão própria: as consultas seguem pela conexão principal durante a importação
+            importador = SqliteOrderStore(self.path, self.db_path)
+            try:
+                if json.dumps(signature) != importador._stored_signature():
+                    importador._rebuild(signature)
+            finally:
+                importador.close()
+        finally:
+            release_file_lock(lock)
+        return True
+
+    def rebuild(self, signature=None):
+        """Reimporta o arquivo de pedidos para a tabela, esperando outra reimportação terminar."""
+        lock = acquire_file_lock(self.lock_file)
+        try:
+            self._rebuild(signature)
+        finally:
+            release_file_lock(lock)
+
+    def _rebuild(self, signature=None):
+        self.import_staging(iter_pedidos(self.path))
+        self.swap_staging(signature or file_signature(self.path))
+
+    def import_staging(self, pedidos: Iterable[Dict]) -> int:
+        """Grava os pedidos numa tabela nova, em lotes de PEDIDOS_BATCH por transação.
+
+        Leitores continuam vendo a tabela atual; a troca é feita por swap_staging.
+        """
+        with self._conn:
+            self._conn.execute('DROP TABLE IF EXISTS pedidos_novos')
+            self._conn.execute('CREATE TABLE pedidos_novos (pedido_id TEXT PRIMARY KEY, dados TEXT NOT NULL)')
+        rows = (
+            (normalizar_pedido_id(p['pedido_id']), json.dumps(p, ensure_ascii=False))
+            for p in pedidos
+        )
+        total = 0
+        while True:
+            lote = list(itertools.islice(rows, PEDIDOS_BATCH))
+            if not lote:
+                return total
+            with self._conn:
+                self._conn.executemany('INSERT OR REPLACE INTO pedidos_novos VALUES (?, ?)', lote)
+            total += len(lote)
+
+    def swap_staging(self, signature):
+        """Troca a tabela atual pela importada numa única transação."""
+        with self._conn:
+            self._conn.execute('DROP TABLE pedidos')
+            self._conn.execute('ALTER TABLE pedidos_novos RENAME TO pedidos')
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('signature', ?)", (json.dumps(signature),))
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, pedido_id) -> Optional[Dict]:
+        self._refresh()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT dados FROM pedidos WHERE pedido_id = ?', (normalizar_pedido_id(pedido_id),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+def create_order_store(path: Path = PEDIDOS_FILE) -> OrderStore:
+    """Cria o repositório de pedidos escolhido por PEDIDOS_BACKEND (memory ou sqlite)."""
+    backend = os.getenv('PEDIDOS_BACKEND', 'memory').lower()
+    if backend == 'sqlite':
+        return SqliteOrderStore(path, Path(os.getenv('PEDIDOS_DB', str(PEDIDOS_DB))))
+    return JsonOrderStore(path)
@@ -0,0 +1,261 @@
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from catalog_store import (INDEX_DIR, PROJECT_ROOT, CatalogStore, acquire_file_lock, product_text,
+                           release_file_lock)
+
+# Number of product texts sent to the embedding model per request
+EMBED_BATCH_SIZE = 256
+# Up to this fraction of the catalog, filtered searches copy the selected rows out of the matrix;
+# above it, scoring the whole memory-mapped matrix and then selecting columns is faster
+FILTER_GATHER_FRACTION = 1 / 3
+
+
+def catalog_hash(catalogo: CatalogStore, model_name: str) -> str:
+    """Hash the embedded catalog text together with the embedding model name."""
+    return hashlib.sha256(f'{model_name}\0{catalogo.text_hash}'.encode('utf-8')).hexdigest()
+
+
+def embedding_model_name(embeddings) -> str:
+    """Best-effort identifier of the embedding model behind a client."""
+    return str(getattr(embeddings, 'model', None) or type(embeddings).__name__)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row in place, leaving zero rows untouched."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def _link_or_copy(source: Path, target: Path):
+    """Hard-link (or copy, across file systems) `source` to `target`, replacing it atomically."""
+    tmp = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, target)
+
+
+class ProductIndex:
+    """Normalized float32 embedding matrix for the product catalog, persisted on disk.
+
+    The matrix is memory-mapped read-only, like the columnar catalog it sits next to, so every
+    worker on the host shares the same pages. A compiled catalog keeps its matrix inside its own
+    ``catalogo-<version>/`` directory: workers still on an older version keep their own matrix,
+    and it is deleted together with that directory.
+    """
+
+    def __init__(self, produtos: Union[CatalogStore, Sequence[Dict]], embeddings, index_dir: Path = INDEX_DIR,
+                 name: str = 'produtos'):
+        # Plain lists (tests, benchmarks) are encoded into an in-memory catalog with the same layout
+        self.produtos = CatalogStore.from_products(produtos)
+        self.embeddings = embeddings
+        self.index_dir = Path(index_dir)
+        # In-memory catalogs (tests, benchmarks) have no directory of their own
+        self.matrix_dir = self.produtos.diretorio or self.index_dir
+        self.matrix_file = self.matrix_dir / f'{name}.npy'
+        self.lock_file = self.matrix_dir / f'{name}.lock'
+        self.manifest_file = self.matrix_dir / f'{name}.manifest.json'
+        self.model_name = embedding_model_name(embeddings)
+        self.version = catalog_hash(self.produtos, self.model_name)
+        self.matrix: Optional[np.ndarray] = None
+        self._lock = asyncio.Lock()
+
+        # Filter columns come straight from the catalog, so filters are boolean masks
+        self.category_codes: Dict[str, int] = self.produtos.category_codes
+        self.categorias = self.produtos.categorias
+        self.precos = self.produtos.precos
+        self.disponivel = self.produtos.disponivel
+
+    @property
+    def ready(self) -> bool:
+        return self.matrix is not None
+
+    def load(self) -> bool:
+        """Load the persisted matrix if its manifest matches the current catalog."""
+        return self._load() or (self._adopt() and self._load())
+
+    def _load(self) -> bool:
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != self.version:
+                return False
+            matrix = np.load(self.matrix_file, mmap_mode='r')
+        except (OSError, ValueError):
+            return False
+
+        if matrix.shape[0] != len(self.produtos) or matrix.dtype != np.float32:
+            return False
+        self.matrix = matrix
+        return True
+
+    def _adopt(self) -> bool:
+        """Reuse the matrix of another catalog version with the same embedded text.
+
+        Happens when only prices or stock changed. The files are hard-linked when possible,
+        so both versions share the same pages on disk.
+        """
+        if self.produtos.diretorio is None:
+            return False
+        for manifest_file in self.matrix_dir.parent.glob(f'*/{self.manifest_file.name}'):
+            if manifest_file.parent == self.matrix_dir:
+                continue
+            try:
+                with open(manifest_file, 'r', encoding='utf-8') as f:
+                    if json.load(f).get('version') != self.version:
+                        continue
+                _link_or_copy(manifest_file.parent / self.matrix_file.name, self.matrix_file)
+                _link_or_copy(manifest_file, self.manifest_file)
+            except (OSError, ValueError):
+                continue
+            return True
+        return False
+
+    def save(self):
+        """Persist the matrix and its manifest, replacing the previous files atomically."""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_matrix = self.matrix_file.with_suffix(f'.npy.{os.getpid()}.tmp')
+        with open(tmp_matrix, 'wb') as f:
+            np.save(f, self.matrix)
+        os.replace(tmp_matrix, self.matrix_file)
+        self._save_manifest(self.matrix.shape)
+
+    def _save_manifest(self, shape: Tuple[int, ...]):
+        manifest = {
+            'version': self.version,
+            'model': self.model_name,
+            'count': int(shape[0]),
+            'dim': int(shape[1]) if len(shape) == 2 else 0,
+        }
+        tmp_manifest = self.manifest_file.with_suffix(f'.json.{os.getpid()}.tmp')
+        with open(tmp_manifest, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_manifest, self.manifest_file)
+
+    async def build(self):
+        """Embed the whole catalog in batches and persist the result.
+
+        Each batch is normalized and written straight into a memory-mapped temporary file, so
+        memory stays at one batch whatever the catalog size; the file then replaces the
+        previous matrix atomically.
+        """
+        if not len(self.produtos):
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+            self.save()
+            return
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_matrix = self.matrix_file.with_suffix(f'.npy.{os.getpid()}.tmp')
+        try:
+            matrix = None
+            row = 0
+            texts = self.produtos.textos()
+            while True:
+                batch = list(itertools.islice(texts, EMBED_BATCH_SIZE))
+                if not batch:
+                    break
+                vectors = await self.embeddings.aembed_documents(batch)
+                vectors = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(batch), -1))
+                if matrix is None:
+                    matrix = np.lib.format.open_memmap(tmp_matrix, mode='w+', dtype=np.float32,
+                                                       shape=(len(self.produtos), vectors.shape[1]))
+                matrix[row:row + len(batch)] = vectors
+                row += len(batch)
+            matrix.flush()
+            shape = matrix.shape
+            del matrix
+            os.replace(tmp_matrix, self.matrix_file)
+        finally:
+            if tmp_matrix.exists():
+                tmp_matrix.unlink()
+        self._save_manifest(shape)
+        # Share the pages of the file just written instead of keeping a private copy
+        self.load()
+
+    async def ensure_ready(self):
+        """Load the index from disk, building it first if it is missing or stale."""
+        if self.matrix is not None:
+            return
+        async with self._lock:
+            if self.matrix is not None or await asyncio.to_thread(self.load):
+                return
+            # Another worker may be building the same index: wait for it and load its result
+            lock = await asyncio.to_thread(acquire_file_lock, self.lock_file)
+            try:
+                if not await asyncio.to_thread(self.load):
+                    await self.build()
+            finally:
+                release_file_lock(lock)
+
+    def filter_mask(self, filters: Optional[Dict]) -> Optional[np.ndarray]:
+        """Boolean mask of the products that satisfy the filters (None means all)."""
+        if not filters:
+            return None
+        mask = np.ones(len(self.produtos), dtype=bool)
+        if filters.get('category'):
+            code = self.category_codes.get(str(filters['category']).lower())
+            if code is None:
+                return np.zeros(len(self.produtos), dtype=bool)
+            mask &= self.categorias == code
+        if filters.get('min_price') is not None:
+            mask &= self.precos >= float(filters['min_price'])
+        if filters.get('max_price') is not None:
+            mask &= self.precos <= float(filters['max_price'])
+        if filters.get('available') is not None:
+            mask &= self.disponivel == bool(filters['available'])
+        return mask
+
+    def search(self, query_embedding: List[float], k: int = 5, filters: Optional[Dict] = None,
+               min_score: Optional[float] = None) -> List[Tuple[int, float]]:
+        """Return up to k (row, score) pairs ordered by cosine similarity."""
+        return self.search_many([query_embedding], k, filters, min_score)[0]
+
+    def search_many(self, query_embeddings: List[List[float]], k: int = 5, filters: Optional[Dict] = None,
+                    min_score: Optional[float] = None) -> List[List[Tuple[int, float]]]:
+        """Score a batch of queries with one matrix-matrix product; one result list per query."""
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        normalize_rows(queries)
+
+        mask = self.filter_mask(filters)
+        if mask is None:
+            rows = None
+            scores = queries @ self.matrix.T
+        else:
+            rows = np.flatnonzero(mask)
+            if rows.size == 0:
+                return [[] for _ in query_embeddings]
+            if rows.size <= len(self.produtos) * FILTER_GATHER_FRACTION:
+                # Narrow filter: copying the few selected rows out of the mmap is cheaper
+                scores = queries @ self.matrix[rows].T
+            else:
+                # Broad filter: score every row in place and keep the selected columns
+                scores = (queries @ self.matrix.T)[:, rows]
+
+        return [self._top_k(row_scores, rows, k, min_score) for row_scores in scores]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, rows: Optional[np.ndarray], k: int,
+               min_score: Optional[float]) -> List[Tuple[int, float]]:
+        if min_score is not None:
+            keep = np.flatnonzero(scores >= min_score)
+            rows = keep if rows is None else rows[keep]
+            scores = scores[keep]
+
+        k = min(k, scores.size)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k] if k < scores.size else np.arange(scores.size)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        ids = top if rows is None else rows[top]
+        return list(zip(ids.tolist(), scores[top].tolist()))
@@ -0,0 +1,176 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from texto import normalizar_texto
+
+# Preços citados: 'R$ 2.899,99', 'R$2899.99', 'R$ 1.500', 'R$ 89,90'
+_PRECO = re.compile(r'r\$\s*(\d{1,3}(?:\.\d{3})+(?:,\d{2})?|\d+(?:[.,]\d{1,2})?)')
+_INDISPONIVEL = re.compile(r'\b(?:indisponive(?:l|is)|esgotad[oa]s?|sem estoque|fora de estoque)\b')
+_DISPONIVEL = re.compile(r'\b(?:disponive(?:l|is)|em estoque)\b')
+_ESPACOS = re.compile(r'\s+')
+
+
+def dobrar(texto: str) -> str:
+    """Forma usada na comparação de nomes: minúsculas, sem acentos e com espaços simples."""
+    return _ESPACOS.sub(' ', normalizar_texto(texto))
+
+
+def ler_preco(texto: str) -> float:
+    """'2.899,99' -> 2899.99; '2899.99' -> 2899.99; '1.500' -> 1500.0."""
+    if ',' in texto:
+        return float(texto.replace('.', '').replace(',', '.'))
+    if re.fullmatch(r'\d{1,3}(?:\.\d{3})+', texto):
+        return float(texto.replace('.', ''))
+    return float(texto)
+
+
+class Mencao(NamedTuple):
+    produto_id: str
+    # Posição na linha já dobrada
+    inicio: int
+    fim: int
+
+
+class Divergencia(NamedTuple):
+    produto_id: str
+    # 'preco' ou 'disponibilidade'
+    tipo: str
+    citado: str
+    catalogo: str
+
+
+class ProductMatcher:
+    """Autômato de Aho–Corasick sobre os nomes (e aliases) do catálogo, já dobrados.
+
+    Uma linha é percorrida uma única vez, qualquer que seja o tamanho do catálogo. Só contam
+    ocorrências com limite de palavra nas duas pontas, e entre nomes sobrepostos vale o mais
+    longo ('Notebook Dell Inspiron 15' e não 'Notebook Dell'). Construído uma vez por versão
+    do catálogo; também guarda preço e disponibilidade de cada produto para ``verificar``.
+    """
+
+    def __init__(self, produtos: Iterable[Dict], version: Optional[str] = None):
+        self.version = version
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._saida: List[List[int]] = [[]]
+        # Por padrão: (tamanho, ids dos produtos com esse nome)
+        self._padroes: List[Tuple[int, List[str]]] = []
+        self._indice_padrao: Dict[str, int] = {}
+        self.precos: Dict[str, float] = {}
+        self.disponivel: Dict[str, bool] = {}
+
+        for linha, produto in enumerate(produtos):
+            produto_id = str(produto.get('id', linha))
+            if 'preco' in produto:
+                self.precos[produto_id] = float(produto['preco'])
+            if 'disponivel' in produto:
+                self.disponivel[produto_id] = bool(produto['disponivel'])
+            for nome in [produto['nome'], *produto.get('aliases', ())]:
+                self._adicionar(dobrar(nome).strip(), produto_id)
+        self._ligar_falhas()
+
+    def __len__(self) -> int:
+        return len(self._padroes)
+
+    def _adicionar(self, padrao: str, produto_id: str):
+        if not padrao:
+            return
+        indice = self._indice_padrao.get(padrao)
+        if indice is not None:
+            if produto_id not in self._padroes[indice][1]:
+                self._padroes[indice][1].append(produto_id)
+            return
+        estado = 0
+        for letra in padrao:
+            proximo = self._goto[estado].get(letra)
+            if proximo is None:
+                proximo = len(self._goto)
+                self._goto[estado][letra] = proximo
+                self._goto.append({})
+                self._fail.append(0)
+                self._saida.append([])
+            estado = proximo
+        indice = self._indice_padrao[padrao] = len(self._padroes)
+        self._padroes.append((len(padrao), [produto_id]))
+        self._saida[estado].append(indice)
+
+    def _ligar_falhas(self):
+        # Busca em largura: a falha de um estado aponta para o maior sufixo que também é prefixo
+        fila = deque(self._goto[0].values())
+        while fila:
+            estado = fila.popleft()
+            for letra, proximo in self._goto[estado].items():
+                fila.append(proximo)
+                falha = self._fail[estado]
+                while falha and letra not in self._goto[falha]:
+                    falha = self._fail[falha]
+                self._fail[proximo] = self._goto[falha].get(letra, 0)
+                self._saida[proximo] = self._saida[proximo] + self._saida[self._fail[proximo]]
+
+    def _ocorrencias(self, texto: str) -> List[Tuple[int, int, int]]:
+        """(início, fim, padrão) de cada nome com limite de palavra nas duas pontas."""
+        ocorrencias = []
+        estado = 0
+        goto, fail, saida = self._goto, self._fail, self._saida
+        for posicao, letra in enumerate(texto):
+            while estado and letra not in goto[estado]:
+                estado = fail[estado]
+            estado = goto[estado].get(letra, 0)
+            for indice in saida[estado]:
+                fim = posicao + 1
+                inicio = fim - self._padroes[indice][0]
+                if ((inicio == 0 or not texto[inicio - 1].isalnum())
+                        and (fim == len(texto) or not texto[fim].isalnum())):
+                    ocorrencias.append((inicio, fim, indice))
+        return ocorrencias
+
+    def mencoes(self, linha: str) -> List[Mencao]:
+        """Produtos citados na linha, na ordem em que aparecem (o nome mais longo vence)."""
+        texto = dobrar(linha)
+        escolhidas: List[Mencao] = []
+        fim_anterior = 0
+        for inicio, fim, indice in sorted(self._ocorrencias(texto), key=lambda o: (o[0], o[0] - o[1])):
+            if inicio < fim_anterior:
+                continue
+            escolhidas.extend(Mencao(produto_id, inicio, fim) for produto_id in self._padroes[indice][1])
+            fim_anterior = fim
+        return escolhidas
+
+    def ids(self, linha: str) -> List[str]:
+        return list(dict.fromkeys(m.produto_id for m in self.mencoes(linha)))
+
+    def verificar(self, linha: str, mencoes: Optional[List[Mencao]] = None) -> List[Divergencia]:
+        """Preços e disponibilidade citados na linha que não batem com o catálogo.
+
+        Cada preço vale para o nome citado mais próximo antes dele (ou para o primeiro da linha).
+        Um nome compartilhado por vários produtos só diverge se nenhum deles confirmar o valor.
+        """
+        mencoes = self.mencoes(linha) if mencoes is None else mencoes
+        if not mencoes:
+            return []
+        # Produtos de cada nome citado, na ordem da linha
+        trechos: Dict[int, List[str]] = {}
+        for mencao in mencoes:
+            trechos.setdefault(mencao.inicio, []).append(mencao.produto_id)
+        texto = dobrar(linha)
+        divergencias = []
+        for preco in _PRECO.finditer(texto):
+            anteriores = [inicio for inicio in trechos if inicio < preco.start()]
+            candidatos = trechos[anteriores[-1] if anteriores else next(iter(trechos))]
+            citado = ler_preco(preco.group(1))
+            catalogo = [self.precos[i] for i in candidatos if i in self.precos]
+            if catalogo and all(abs(citado - valor) > 0.005 for valor in catalogo):
+                divergencias.append(Divergencia(candidatos[0], 'preco', preco.group(1), f'{catalogo[0]:.2f}'))
+
+        indisponivel = bool(_INDISPONIVEL.search(texto))
+        if indisponivel or _DISPONIVEL.search(texto):
+            for candidatos in trechos.values():
+                catalogo = [self.disponivel[i] for i in candidatos if i in self.disponivel]
+                if catalogo and all(disponivel == indisponivel for disponivel in catalogo):
+                    divergencias.append(Divergencia(
+                        candidatos[0], 'disponibilidade',
+                        'indisponível' if indisponivel else 'disponível',
+                        'disponível' if catalogo[0] else 'indisponível',
+                    ))
+        return divergencias
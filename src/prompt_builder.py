@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+from bm25 import tokenizar
+from tokens import contar_tokens
+
+# Tokens reservados ao contexto (produtos ou trechos da base de conhecimento) de cada prompt
+PROMPT_CONTEXT_BUDGET = int(os.getenv('PROMPT_CONTEXT_BUDGET', '1200'))
+# Especificações mantidas por mais tempo quando o contexto precisa encolher
+PROMPT_SPEC_PRIORITY = tuple(
+    chave.strip() for chave in
+    os.getenv('PROMPT_SPEC_PRIORITY', 'processador,memoria,armazenamento,tela,marca,modelo').split(',')
+    if chave.strip()
+)
+# Blocos de produto formatados (por versão do catálogo, id do produto e forma) guardados em memória
+PROMPT_BLOCK_CACHE_SIZE = int(os.getenv('PROMPT_BLOCK_CACHE_SIZE', '10000'))
+
+
+def versao_produto(produto: Dict) -> str:
+    """Identifica o conteúdo de um produto fora de um catálogo versionado (custa um sha1 por produto)."""
+    return hashlib.sha1(json.dumps(produto, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class ContextoPrompt(NamedTuple):
+    texto: str
+    tokens: int
+    # Itens (produtos ou trechos) que entraram e os que ficaram de fora pelo orçamento
+    incluidos: int
+    omitidos: int
+
+
+class PromptBuilder:
+    """Monta o contexto do prompt dentro de um orçamento de tokens.
+
+    Produtos entram na ordem de relevância. Se o contexto não cabe, ele encolhe nesta ordem,
+    sempre começando pelo produto menos relevante:
+      1. especificações que não estão em ``spec_priority`` nem são citadas na mensagem;
+      2. as de ``spec_priority``; 3. as citadas na mensagem;
+      4. descrições; 5. produtos inteiros (o mais relevante sempre fica).
+
+    Cada bloco formatado, com sua contagem de tokens, fica em cache por versão do catálogo
+    (CatalogStore.version, que muda com qualquer preço, estoque ou texto) e id do produto;
+    sem a versão do catálogo, pelo conteúdo do produto (versao_produto).
+    """
+
+    def __init__(self, budget: int = PROMPT_CONTEXT_BUDGET, spec_priority: Sequence[str] = PROMPT_SPEC_PRIORITY,
+                 cache_size: int = PROMPT_BLOCK_CACHE_SIZE):
+        self.budget = budget
+        self.spec_priority = tuple(spec_priority)
+        self.cache_size = cache_size
+        self._blocos: 'OrderedDict[Tuple, Tuple[str, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @classmethod
+    def from_env(cls) -> 'PromptBuilder':
+        return cls()
+
+    def bloco_produto(self, produto: Dict, specs: Sequence[str], com_descricao: bool = True,
+                      versao: Optional[str] = None) -> Tuple[str, int]:
+        """Texto de um produto (sem a numeração) e seus tokens, só com as especificações pedidas."""
+        chave = (produto.get('id'), versao or versao_produto(produto), tuple(specs), com_descricao)
+        with self._lock:
+            bloco = self._blocos.get(chave)
+            if bloco is not None:
+                self._blocos.move_to_end(chave)
+                self.cache_hits += 1
+                return bloco
+            self.cache_misses += 1
+
+        linhas = [
+            produto['nome'],
+            f"   Preço: R${produto['preco']:.2f}",
+            f"   Categoria: {produto['categoria']}",
+        ]
+        if com_descricao:
+            linhas.append(f"   Descrição: {produto['descricao']}")
+        especificacoes = produto.get('especificacoes') or {}
+        if specs:
+            linhas.append('   Especificações: ' + ', '.join(f'{k}: {especificacoes[k]}' for k in specs))
+        linhas.append(f"   Status: {'Disponível' if produto.get('disponivel') else 'Indisponível'}")
+        texto = '\n'.join(linhas)
+        bloco = (texto, contar_tokens(texto))
+
+        with self._lock:
+            self._blocos[chave] = bloco
+            while len(self._blocos) > self.cache_size:
+                self._blocos.popitem(last=False)
+        return bloco
+
+    def _nivel_spec(self, chave: str, valor, termos: set) -> int:
+        """0: descartável primeiro; 1: prioritária; 2: citada na mensagem."""
+        if termos & set(tokenizar(f'{chave} {valor}')):
+            return 2
+        return 1 if chave in self.spec_priority else 0
+
+    def contexto_produtos(self, produtos: Sequence[Tuple[Dict, float]], mensagem: str,
+                          versao_catalogo: Optional[str] = None) -> ContextoPrompt:
+        """Blocos numerados dos produtos (pares produto, score), dentro do orçamento.
+
+        `versao_catalogo` é a versão do catálogo de onde os produtos vieram.
+        """
+        ordenados = [p for p, _ in sorted(produtos, key=lambda item: item[1], reverse=True)]
+        if not ordenados:
+            return ContextoPrompt('', 0, 0, 0)
+        termos = set(tokenizar(mensagem))
+        versoes = [versao_catalogo or versao_produto(p) for p in ordenados]
+        niveis = [{k: self._nivel_spec(k, v, termos) for k, v in (p.get('especificacoes') or {}).items()}
+                  for p in ordenados]
+        # Estado de cada produto: nível mínimo das specs mantidas, descrição, presença
+        corte = [0] * len(ordenados)
+        descricao = [True] * len(ordenados)
+        presente = [True] * len(ordenados)
+
+        formas: Dict[Tuple[int, int, bool], Tuple[str, int]] = {}
+
+        def bloco(i: int) -> Tuple[str, int]:
+            forma = (i, corte[i], descricao[i])
+            if forma not in formas:
+                specs = [k for k, nivel in niveis[i].items() if nivel >= corte[i]]
+                formas[forma] = self.bloco_produto(ordenados[i], specs, descricao[i], versoes[i])
+            return formas[forma]
+
+        def total() -> int:
+            # Cada bloco ganha '{n}. ' e uma linha em branco de separação (~3 tokens)
+            return sum(bloco(i)[1] + 3 for i in range(len(ordenados)) if presente[i])
+
+        passos = [('specs', i, nivel) for nivel in (1, 2, 3) for i in reversed(range(len(ordenados)))]
+        passos += [('descricao', i, 0) for i in reversed(range(len(ordenados)))]
+        passos += [('remover', i, 0) for i in reversed(range(1, len(ordenados)))]
+        for tipo, i, nivel in passos:
+            if total() <= self.budget:
+                break
+            if tipo == 'specs':
+                corte[i] = nivel
+            elif tipo == 'descricao':
+                descricao[i] = False
+            else:
+                presente[i] = False
+
+        blocos = [bloco(i)[0] for i in range(len(ordenados)) if presente[i]]
+        texto = '\n\n'.join(f'{n}. {b}' for n, b in enumerate(blocos, 1))
+        return ContextoPrompt(texto, contar_tokens(texto), len(blocos), len(ordenados) - len(blocos))
+
+    def contexto_trechos(self, trechos: Sequence[str]) -> ContextoPrompt:
+        """Trechos da base de conhecimento, na ordem recebida.
+
+        O corte pelo orçamento acontece uma vez só, na busca: quem chama passa ``self.budget``
+        como ``token_budget`` de RAGSystem.query_knowledge_base.
+        """
+        texto = '\n'.join(trechos)
+        return ContextoPrompt(texto, contar_tokens(texto), len(trechos), 0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'budget': self.budget,
+                'cached_blocks': len(self._blocos),
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+            }
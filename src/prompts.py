@@ -12,4 +12,17 @@ USER_PROMPT_TEMPLATE = '''{mensagem}
 Produtos disponíveis no catálogo:
 {produtos_contexto}
 
-IMPORTANTE: Responda SOMENTE com base nos produtos listados acima. Não invente produtos ou características.''' 
+IMPORTANTE: Responda SOMENTE com base nos produtos listados acima. Não invente produtos ou características.'''
+
+RESPOSTA_PRAZO_TROCA = """O prazo para troca ou devolução é de 7 dias corridos a partir do recebimento do produto.
+
+Para realizar uma troca ou devolução:
+1. Entre em contato com nosso suporte
+2. Informe o número do pedido
+3. Descreva o motivo da troca/devolução
+4. Aguarde as instruções para envio do produto
+
+Observações:
+- O produto deve estar em perfeito estado
+- A embalagem original deve estar intacta
+- Todos os acessórios e manuais devem ser incluídos"""
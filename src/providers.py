@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import os
+import re
+from functools import lru_cache
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from texto import normalizar_texto
+
+# Provedores disponíveis por variável de ambiente
+EMBEDDINGS_PROVIDERS = ('openai', 'hashing')
+LLM_PROVIDERS = ('openai', 'echo')
+
+
+def _openai_chat(**kwargs):
+    """Cria o cliente de chat da OpenAI, importando langchain_openai só no primeiro uso."""
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(**kwargs)
+
+
+def _openai_embeddings(**kwargs):
+    """Cria o cliente de embeddings da OpenAI, importando langchain_openai só no primeiro uso."""
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(**kwargs)
+
+
+@lru_cache(maxsize=200_000)
+def _feature(token: str, dim: int) -> Tuple[int, float]:
+    # Hash estável entre processos (ao contrário de hash()), com sinal para reduzir colisões
+    valor = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+    return valor % dim, 1.0 if valor >> 63 else -1.0
+
+
+class HashingEmbeddings:
+    """Embeddings locais e determinísticos por hashing de palavras e trigramas de caracteres.
+
+    Não chama rede nem treina vocabulário: textos com palavras em comum ficam próximos, o que
+    basta para exercitar o pipeline (índices, FAISS, caches) offline e medir o nosso custo.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model = f'hashing-{dim}'
+
+    def _features(self, texto: str) -> Iterator[Tuple[int, float]]:
+        for palavra in re.findall(r'\w+', normalizar_texto(texto)):
+            yield _feature(palavra, self.dim)
+            marcada = f'<{palavra}>'
+            for i in range(len(marcada) - 2):
+                indice, sinal = _feature(marcada[i:i + 3], self.dim)
+                yield indice, sinal * 0.5
+
+    def embed_matrix(self, texts: List[str]) -> np.ndarray:
+        """Matriz (len(texts), dim) de vetores L2-normalizados."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for linha, texto in enumerate(texts):
+            features = list(self._features(texto))
+            if features:
+                indices, pesos = zip(*features)
+                matrix[linha] = np.bincount(indices, weights=pesos, minlength=self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_matrix(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+
+class EchoChatModel:
+    """LLM local que responde com um template sobre a última mensagem, com latência simulada.
+
+    Implementa ``agenerate`` e ``astream`` como os modelos de chat do langchain. ``latency`` é o
+    tempo até o primeiro token e ``token_latency`` o intervalo entre tokens no streaming (e o
+    custo de cada token no ``agenerate``), em segundos.
+    """
+
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0, template: str = '{mensagem}'):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.template = template
+        self.chamadas = 0
+
+    def _responder(self, mensagens: List) -> str:
+        mensagem = mensagens[-1].content if mensagens else ''
+        return self.template.format(mensagem=mensagem)
+
+    @staticmethod
+    def _tokens(texto: str) -> List[str]:
+        return re.findall(r'\s*\S+|\s+', texto)
+
+    async def agenerate(self, lotes: List[List], **kwargs):
+        from langchain_core.messages import AIMessage
+        from langchain_core.outputs import ChatGeneration, LLMResult
+
+        self.chamadas += 1
+        respostas = [self._responder(mensagens) for mensagens in lotes]
+        tokens = max((len(self._tokens(r)) for r in respostas), default=0)
+        await asyncio.sleep(self.latency + self.token_latency * tokens)
+        return LLMResult(generations=[[ChatGeneration(message=AIMessage(content=r))] for r in respostas])
+
+    async def astream(self, mensagens: List, **kwargs):
+        from langchain_core.messages import AIMessageChunk
+
+        self.chamadas += 1
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(self._tokens(self._responder(mensagens))):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield AIMessageChunk(content=token)
+
+
+def create_embeddings():
+    """Cria o cliente de embeddings escolhido por ASSISTENTE_EMBEDDINGS (openai ou hashing)."""
+    provider = os.getenv('ASSISTENTE_EMBEDDINGS', 'openai').lower()
+    if provider == 'hashing':
+        return HashingEmbeddings(dim=int(os.getenv('ASSISTENTE_EMBEDDINGS_DIM', '384')))
+    if provider == 'openai':
+        return _openai_embeddings(api_key=os.getenv('OPENAI_API_KEY'))
+    raise ValueError(f'ASSISTENTE_EMBEDDINGS inválido: {provider!r} (use {", ".join(EMBEDDINGS_PROVIDERS)})')
+
+
+def create_llm(**kwargs):
+    """Cria o LLM escolhido por ASSISTENTE_LLM (openai ou echo); kwargs vão para o ChatOpenAI."""
+    provider = os.getenv('ASSISTENTE_LLM', 'openai').lower()
+    if provider == 'echo':
+        return EchoChatModel(
+            latency=float(os.getenv('ASSISTENTE_LLM_LATENCY_MS', '0')) / 1000,
+            token_latency=float(os.getenv('ASSISTENTE_LLM_TOKEN_LATENCY_MS', '0')) / 1000,
+            template=os.getenv('ASSISTENTE_LLM_TEMPLATE', '{mensagem}'),
+        )
+    if provider == 'openai':
+        return _openai_chat(api_key=os.getenv('OPENAI_API_KEY'), **kwargs)
+    raise ValueError(f'ASSISTENTE_LLM inválido: {provider!r} (use {", ".join(LLM_PROVIDERS)})')
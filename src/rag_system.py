@@ -1,142 +1,220 @@
-from typing import List, Dict, Any, Optional
-import json
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
 import os
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-import numpy as np
-from functools import lru_cache
 import re
-from pathlib import Path
-from langchain_community.document_loaders import TextLoader
 from dotenv import load_dotenv
+from catalog_store import PRODUTOS_FILE, CatalogStore, catalog_pointer, load_catalog, open_catalog
+from product_index import ProductIndex
+from product_matcher import ProductMatcher
+from knowledge_index import KnowledgeIndex
+from bm25 import fusao_rrf, lexical_decisivo
+from tokens import limitar_por_tokens
+from intent_router import IntentRouter
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+from prompts import RESPOSTA_PRAZO_TROCA
+from providers import create_embeddings
+from metrics import KNOWLEDGE_RETRIEVAL, span
 
 load_dotenv()
 
+# Knowledge base retrieval: chunks in the prompt, their token budget, candidates per retriever
+# and how far the best BM25 hit must lead the second one to skip the vector search
+KNOWLEDGE_K = int(os.getenv("KNOWLEDGE_K", "3"))
+KNOWLEDGE_TOKEN_BUDGET = int(os.getenv("KNOWLEDGE_TOKEN_BUDGET", "1500"))
+KNOWLEDGE_CANDIDATES = int(os.getenv("KNOWLEDGE_CANDIDATES", "10"))
+KNOWLEDGE_LEXICAL_MARGIN = float(os.getenv("KNOWLEDGE_LEXICAL_MARGIN", "1.5"))
+
+
 class RAGSystem:
-    def __init__(self):
-        """Initialize the RAG system with necessary components."""
-        self.llm = ChatOpenAI(
-            model_name="gpt-4",
-            temperature=0.2,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
-        
-        self.embeddings = OpenAIEmbeddings(
-            api_key=os.getenv("OPENAI_API_KEY")
+    def __init__(self, router: Optional[IntentRouter] = None):
+        """Initialize the RAG system; indexes are loaded later by warmup()."""
+        # Every embedding call (products, knowledge base, queries) goes through the shared cache
+        self.embeddings = CachedEmbeddings(
+            create_embeddings(),
+            EmbeddingCache.from_env(),
         )
         
+        # Concurrent single-query embeddings are coalesced into one embed_documents call
+        self.query_embedder = EmbeddingBatcher.from_env(self.embeddings)
+        # Shared with the assistant, which classifies each message once
+        self.router = router if router is not None else IntentRouter.from_file()
+
         # Initialize vector stores
         self._init_vector_stores()
         
     def _init_vector_stores(self):
         """Initialize vector stores for products and knowledge base."""
-        # Get project root directory
-        project_root = Path(__file__).parent.parent.absolute()
-        
-        # Initialize products vector store
-        products_file = project_root / 'data' / 'produtos.json'
-        if products_file.exists():
-            with open(products_file, 'r', encoding='utf-8') as f:
-                self.produtos = json.load(f)
-        else:
-            self.produtos = []
-            
-        # Initialize knowledge base vector store
-        knowledge_dir = project_root / 'data' / 'knowledge'
-        if knowledge_dir.exists():
-            self.knowledge_base = self._load_knowledge_base(knowledge_dir)
-        else:
-            self.knowledge_base = None
-            
-    def _load_knowledge_base(self, knowledge_dir: Path) -> FAISS:
-        """Load and process knowledge base documents."""
-        documents = []
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200
-        )
-        
-        for file in knowledge_dir.glob('*.txt'):
-            loader = TextLoader(str(file), encoding='utf-8')
-            documents.extend(loader.load())
-            
-        if not documents:
-            return None
+        # Products: columnar catalog compiled next to the embedding matrix and memory-mapped, so
+        # workers share its pages; full dicts are only decoded for the results returned
+        self.produtos = load_catalog(PRODUTOS_FILE)
+        self.product_index = ProductIndex(self.produtos, self.embeddings)
+        self._product_matcher: Optional[ProductMatcher] = None
+        self._reload_lock = asyncio.Lock()
             
-        texts = text_splitter.split_documents(documents)
-        return FAISS.from_documents(texts, self.embeddings)
+        # Knowledge base vector store (persisted, re-embeds only changed files), loaded on warmup
+        self.knowledge_base = None
+        self.knowledge_lexical = None
+        self.knowledge_version: Optional[str] = None
+        self.knowledge_loaded = False
+        self._knowledge_lock = asyncio.Lock()
+
+    def readiness(self) -> Dict[str, bool]:
+        """Which indexes are already loaded."""
+        return {
+            "products_index": self.product_index.ready,
+            "knowledge_base": self.knowledge_loaded,
+        }
+
+    @property
+    def ready(self) -> bool:
+        """Whether both the product index and the knowledge base are loaded."""
+        return all(self.readiness().values())
+
+    async def warmup(self):
+        """Load (or build) the product index and the knowledge base."""
+        await self.product_index.ensure_ready()
+        await asyncio.to_thread(self.product_matcher)
+        await self._ensure_knowledge_base()
+
+    async def _ensure_knowledge_base(self):
+        if self.knowledge_loaded:
+            return
+        async with self._knowledge_lock:
+            if not self.knowledge_loaded:
+                index = KnowledgeIndex(self.embeddings)
+                self.knowledge_base = await asyncio.to_thread(index.load)
+                self.knowledge_lexical = index.lexical
+                self.knowledge_version = index.version
+                self.knowledge_loaded = True
+
+    async def reload_products(self, catalogo: Optional[CatalogStore] = None) -> bool:
+        """Swap in a new catalog version while requests keep being served.
+
+        The new catalog (by default the active one in INDEX_DIR, e.g. after an ingestion) gets
+        its index and matcher ready first; then the references are replaced, so a request sees
+        either the old version or the new one. Returns whether the version changed.
+        """
+        async with self._reload_lock:
+            if catalogo is None:
+                diretorio = self.produtos.diretorio
+                catalogo = await asyncio.to_thread(open_catalog, *([diretorio.parent] if diretorio else []))
+            if catalogo is None or catalogo.version == self.produtos.version:
+                return False
+            index = ProductIndex(catalogo, self.embeddings, index_dir=self.product_index.index_dir)
+            await index.ensure_ready()
+            matcher = await asyncio.to_thread(ProductMatcher, catalogo, catalogo.version)
+            self.produtos, self.product_index, self._product_matcher = catalogo, index, matcher
+            return True
+
+    async def refresh_products(self) -> bool:
+        """Reload the catalog if another process activated a new version (cheap pointer check)."""
+        diretorio = self.produtos.diretorio
+        if diretorio is None:
+            return False
+        ponteiro = catalog_pointer(diretorio.parent)
+        if not ponteiro or ponteiro.get('version') == self.produtos.version:
+            return False
+        return await self.reload_products()
+
+    def product_matcher(self) -> ProductMatcher:
+        """Matcher of product names over the whole catalog, rebuilt only when the catalog changes."""
+        version = getattr(self.produtos, 'version', None) or str(id(self.produtos))
+        matcher = self._product_matcher
+        if matcher is None or matcher.version != version:
+            matcher = self._product_matcher = ProductMatcher(self.produtos, version=version)
+        return matcher
+
+    def data_version(self) -> str:
+        """Identifies the current catalog and knowledge base content, for cache invalidation."""
+        # The catalog version changes with prices and stock too, not only with the embedded text
+        return f"{self.produtos.version[:16]}:{self.product_index.version}:{self.knowledge_version}"
+
+    async def embed_query(self, text: str) -> List[float]:
+        """Embed a single query with the shared embeddings client."""
+        with span('embedding'):
+            return await self.query_embedder.embed(text)
         
-    async def search_products(self, query: str, filters: Optional[Dict] = None) -> List[Dict]:
+    async def search_products(self, query: str, filters: Optional[Dict] = None, k: int = 5,
+                              min_score: Optional[float] = None) -> List[Dict]:
         """Search for products using semantic search and filters."""
-        if not self.produtos:
+        return [p for p, _ in await self.search_products_scored(query, filters, k, min_score)]
+
+    async def search_products_scored(self, query: str, filters: Optional[Dict] = None, k: int = 5,
+                                     min_score: Optional[float] = None) -> List[Tuple[Dict, float]]:
+        """Search for products and return (product, similarity score) pairs, best first."""
+        # One index for the whole request: reload_products may swap in a new one meanwhile
+        index = self.product_index
+        if not len(index.produtos):
             return []
-            
-        # Apply filters if provided
-        filtered_products = self.produtos
-        if filters:
-            if 'category' in filters:
-                filtered_products = [p for p in filtered_products if p['categoria'].lower() == filters['category'].lower()]
-            if 'min_price' in filters:
-                filtered_products = [p for p in filtered_products if p['preco'] >= filters['min_price']]
-            if 'max_price' in filters:
-                filtered_products = [p for p in filtered_products if p['preco'] <= filters['max_price']]
-                
-        # If no products after filtering, return empty list
-        if not filtered_products:
+
+        # Filters are boolean masks over precomputed columns; an empty mask skips the embedding call
+        mask = index.filter_mask(filters)
+        if mask is not None and not mask.any():
             return []
-            
-        # Get query embedding
-        query_embedding = await self.embeddings.aembed_query(query)
-        
-        # Calculate similarity scores
-        scored_products = []
-        for product in filtered_products:
-            # Create a text representation of the product
-            product_text = f"{product['nome']} {product['descricao']} {product['categoria']}"
-            product_embedding = await self.embeddings.aembed_query(product_text)
-            
-            # Calculate cosine similarity
-            similarity = self._cosine_similarity(query_embedding, product_embedding)
-            scored_products.append((product, similarity))
-            
-        # Sort by similarity score and return top 5
-        scored_products.sort(key=lambda x: x[1], reverse=True)
-        return [p[0] for p in scored_products[:5]]
-        
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors."""
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        norm1 = sum(a * a for a in vec1) ** 0.5
-        norm2 = sum(b * b for b in vec2) ** 0.5
-        return dot_product / (norm1 * norm2) if norm1 * norm2 != 0 else 0
+
+        # One query embedding scored against the precomputed product matrix
+        await index.ensure_ready()
+        with span('embedding'):
+            query_embedding = await self.query_embedder.embed(query)
+        with span('vector_search'):
+            hits = index.search(query_embedding, k=k, filters=filters, min_score=min_score)
+        return [(index.produtos[i], score) for i, score in hits]
+
+    async def search_products_batch(self, queries: List[str], filters: Optional[Dict] = None, k: int = 5,
+                                    min_score: Optional[float] = None) -> List[List[Tuple[Dict, float]]]:
+        """Search many queries at once: one embedding call and one matrix-matrix product."""
+        index = self.product_index
+        if not len(index.produtos) or not queries:
+            return [[] for _ in queries]
+
+        mask = index.filter_mask(filters)
+        if mask is not None and not mask.any():
+            return [[] for _ in queries]
+
+        await index.ensure_ready()
+        with span('embedding'):
+            query_embeddings = await self.query_embedder.embed_many(queries)
+        with span('vector_search'):
+            hits = index.search_many(query_embeddings, k=k, filters=filters, min_score=min_score)
+        return [[(index.produtos[i], score) for i, score in query_hits] for query_hits in hits]
         
-    async def query_knowledge_base(self, query: str) -> List[str]:
-        """Query the knowledge base for relevant information."""
+    async def query_knowledge_base(self, query: str, k: Optional[int] = None,
+                                   token_budget: Optional[int] = None) -> List[str]:
+        """Hybrid retrieval: BM25 and vector search fused with reciprocal-rank fusion.
+
+        When the lexical result is decisive (the best chunk has every query term and clearly
+        beats the second) the embedding and vector search are skipped. At most k chunks are
+        returned, as many as fit in token_budget.
+        """
+        await self._ensure_knowledge_base()
         if not self.knowledge_base:
             return []
-            
-        # Search for relevant documents
-        docs = self.knowledge_base.similarity_search(query, k=3)
-        return [doc.page_content for doc in docs]
+        k = k or KNOWLEDGE_K
+        candidates = max(k, KNOWLEDGE_CANDIDATES)
+
+        with span('lexical_search'):
+            lexical = self.knowledge_lexical.search(query, candidates)
+        if lexical_decisivo(lexical, KNOWLEDGE_LEXICAL_MARGIN):
+            KNOWLEDGE_RETRIEVAL.inc('lexical')
+            ranking = [hit.id for hit in lexical]
+        else:
+            KNOWLEDGE_RETRIEVAL.inc('hybrid')
+            with span('embedding'):
+                query_embedding = await self.query_embedder.embed(query)
+            with span('knowledge_search'):
+                docs = self.knowledge_base.similarity_search_with_score_by_vector(query_embedding, k=candidates)
+            vector = [doc.metadata['chunk_id'] for doc, _ in docs]
+            ranking = fusao_rrf([[hit.id for hit in lexical], vector])
+
+        chunks = [self.knowledge_lexical.textos[chunk_id] for chunk_id in ranking]
+        return limitar_por_tokens(chunks, token_budget or KNOWLEDGE_TOKEN_BUDGET, k)
         
     def checar_prazo_troca(self, mensagem: str) -> Optional[str]:
         """Check if the message is about exchange deadline and return appropriate response."""
-        if any(keyword in mensagem.lower() for keyword in ['prazo', 'troca', 'devolução', 'devolucao', 'trocas', 'devoluções', 'devolucoes']):
-            return """O prazo para troca ou devolução é de 7 dias corridos a partir do recebimento do produto.
-
-Para realizar uma troca ou devolução:
-1. Entre em contato com nosso suporte
-2. Informe o número do pedido
-3. Descreva o motivo da troca/devolução
-4. Aguarde as instruções para envio do produto
-
-Observações:
-- O produto deve estar em perfeito estado
-- A embalagem original deve estar intacta
-- Todos os acessórios e manuais devem ser incluídos"""
+        if self.router.classificar(mensagem).intent == 'prazo_troca':
+            return RESPOSTA_PRAZO_TROCA
         return None
 
-    @lru_cache(maxsize=1000)
     def get_embedding(self, text: str):
         return self.embeddings.embed_query(text)
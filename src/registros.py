@@ -0,0 +1,234 @@
+import json
+import math
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Bytes lidos por vez; um arquivo JSON nunca é carregado inteiro
+LEITURA_BYTES = 1 << 20
+
+_ESPACOS = ' \t\r\n'
+
+
+class ErroFormato(ValueError):
+    """O arquivo não é um array JSON nem JSONL, ou o array está malformado."""
+
+
+class Lido(NamedTuple):
+    # Posição do registro (índice no array ou número da linha no JSONL, a partir de 1)
+    posicao: int
+    valor: object
+    # Erro de sintaxe do registro (só no JSONL, em que a linha seguinte ainda pode ser lida)
+    erro: Optional[str] = None
+
+
+class Campo(NamedTuple):
+    tipos: Tuple[type, ...]
+    obrigatorio: bool = True
+    # Checagem extra do valor; devolve a mensagem de erro ou None
+    checar: Optional[Callable[[object], Optional[str]]] = None
+
+
+def _nao_vazio(valor) -> Optional[str]:
+    return 'vazio' if not str(valor).strip() else None
+
+
+def _preco(valor) -> Optional[str]:
+    return None if math.isfinite(valor) and valor >= 0 else 'deve ser um número finito >= 0'
+
+
+def _lista_de_objetos(valor) -> Optional[str]:
+    return None if all(isinstance(item, dict) for item in valor) else 'deve conter só objetos'
+
+
+def _lista_de_textos(valor) -> Optional[str]:
+    return None if all(isinstance(item, str) for item in valor) else 'deve conter só textos'
+
+
+ESQUEMA_PRODUTO: Dict[str, Campo] = {
+    'id': Campo((str, int), checar=_nao_vazio),
+    'nome': Campo((str,), checar=_nao_vazio),
+    'descricao': Campo((str,)),
+    'categoria': Campo((str,), checar=_nao_vazio),
+    'preco': Campo((int, float), checar=_preco),
+    'disponivel': Campo((bool,), obrigatorio=False),
+    'especificacoes': Campo((dict,), obrigatorio=False),
+    'aliases': Campo((list,), obrigatorio=False, checar=_lista_de_textos),
+}
+
+ESQUEMA_PEDIDO: Dict[str, Campo] = {
+    'pedido_id': Campo((str, int), checar=_nao_vazio),
+    'status': Campo((str,)),
+    'produtos': Campo((list,), obrigatorio=False, checar=_lista_de_objetos),
+    'data_compra': Campo((str,), obrigatorio=False),
+    'previsao_entrega': Campo((str,), obrigatorio=False),
+}
+
+
+def validar(registro, esquema: Dict[str, Campo]) -> List[str]:
+    """Erros do registro em relação ao esquema (lista vazia se ele é válido).
+
+    Campos fora do esquema são aceitos; bool não vale como número.
+    """
+    if not isinstance(registro, dict):
+        return [f'registro deve ser um objeto, não {type(registro).__name__}']
+    erros = []
+    for nome, campo in esquema.items():
+        if nome not in registro or registro[nome] is None:
+            if campo.obrigatorio:
+                erros.append(f'{nome}: obrigatório')
+            continue
+        valor = registro[nome]
+        if not isinstance(valor, campo.tipos) or (isinstance(valor, bool) and bool not in campo.tipos):
+            esperado = '/'.join(t.__name__ for t in campo.tipos)
+            erros.append(f'{nome}: esperado {esperado}, recebido {type(valor).__name__}')
+            continue
+        problema = campo.checar(valor) if campo.checar else None
+        if problema:
+            erros.append(f'{nome}: {problema}')
+    return erros
+
+
+def detectar_formato(path: Path) -> str:
+    """'jsonl' pela extensão (.jsonl, .ndjson) ou pelo primeiro caractere; senão 'json'."""
+    path = Path(path)
+    if path.suffix.lower() in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        while True:
+            bloco = f.read(4096)
+            if not bloco:
+                return 'json'
+            inicio = bloco.lstrip(_ESPACOS)
+            if inicio:
+                return 'jsonl' if inicio[0] == '{' else 'json'
+
+
+def ler_registros(path: Path, formato: Optional[str] = None) -> Iterator[Lido]:
+    """Lê um array JSON ou um arquivo JSONL registro a registro, com memória limitada."""
+    path = Path(path)
+    formato = formato or detectar_formato(path)
+    if formato == 'jsonl':
+        return _ler_jsonl(path)
+    if formato == 'json':
+        return _ler_array(path)
+    raise ErroFormato(f'Formato desconhecido: {formato}')
+
+
+def _ler_jsonl(path: Path) -> Iterator[Lido]:
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for numero, linha in enumerate(f, 1):
+            if not linha.strip():
+                continue
+            try:
+                yield Lido(numero, json.loads(linha))
+            except ValueError as e:
+                yield Lido(numero, linha.rstrip('\r\n'), f'JSON inválido: {e}')
+
+
+def _ler_array(path: Path) -> Iterator[Lido]:
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buffer = ''
+        pos = 0
+        fim_arquivo = False
+
+        def ler_mais() -> bool:
+            nonlocal buffer, pos, fim_arquivo
+            bloco = f.read(LEITURA_BYTES)
+            # Descarta o que já foi consumido: o buffer fica do tamanho de um bloco mais um registro
+            buffer = buffer[pos:] + bloco
+            pos = 0
+            fim_arquivo = not bloco
+            return bool(bloco)
+
+        def proximo_caractere() -> Optional[str]:
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _ESPACOS:
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not ler_mais():
+                    return None
+
+        if proximo_caractere() != '[':
+            raise ErroFormato(f'{path.name}: esperado um array JSON')
+        pos += 1
+        indice = 0
+        while True:
+            caractere = proximo_caractere()
+            if caractere is None:
+                raise ErroFormato(f'{path.name}: array não terminado')
+            if caractere == ']' and indice == 0:
+                break
+            while True:
+                try:
+                    valor, fim = decoder.raw_decode(buffer, pos)
+                except ValueError as e:
+                    # Registro cortado no fim do buffer: lê mais e tenta de novo
+                    if not fim_arquivo and ler_mais():
+                        continue
+                    raise ErroFormato(f'{path.name}: registro {indice} inválido: {e}') from None
+                # Um número no fim do buffer pode continuar no próximo bloco
+                if fim == len(buffer) and not fim_arquivo and ler_mais():
+                    continue
+                break
+            pos = fim
+            yield Lido(indice, valor)
+            indice += 1
+
+            caractere = proximo_caractere()
+            if caractere == ']':
+                break
+            if caractere != ',':
+                raise ErroFormato(f'{path.name}: esperado "," ou "]" após o registro {indice - 1}')
+            pos += 1
+        pos += 1
+        if proximo_caractere() is not None:
+            raise ErroFormato(f'{path.name}: conteúdo após o fim do array')
+
+
+class Rejeitados:
+    """Arquivo JSONL com os registros recusados: posição, erros e o registro original.
+
+    Só é criado no primeiro registro recusado.
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        self.total = 0
+        self._arquivo = None
+
+    def registrar(self, lido: Lido, erros: List[str]):
+        self.total += 1
+        if self.path is None:
+            return
+        if self._arquivo is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._arquivo = open(self.path, 'w', encoding='utf-8')
+        self._arquivo.write(json.dumps(
+            {'posicao': lido.posicao, 'erros': erros, 'registro': lido.valor}, ensure_ascii=False,
+        ) + '\n')
+
+    def close(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def __enter__(self) -> 'Rejeitados':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def registros_validos(path: Path, esquema: Dict[str, Campo], rejeitados: Optional[Rejeitados] = None,
+                      formato: Optional[str] = None) -> Iterator[Dict]:
+    """Registros do arquivo que passam no esquema; os demais vão para `rejeitados`."""
+    rejeitados = rejeitados if rejeitados is not None else Rejeitados()
+    for lido in ler_registros(path, formato):
+        erros = [lido.erro] if lido.erro else validar(lido.valor, esquema)
+        if erros:
+            rejeitados.registrar(lido, erros)
+        else:
+            yield lido.valor
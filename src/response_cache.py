@@ -0,0 +1,464 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from catalog_store import INDEX_DIR
+
+RESPONSE_CACHE_DB = INDEX_DIR / 'response_cache.sqlite'
+
+
+def normalizar_consulta(texto: str) -> str:
+    """Normaliza a mensagem para a chave exata do cache (caixa, espaços e pontuação final)."""
+    return re.sub(r'\s+', ' ', texto.lower()).strip().rstrip('?!. ')
+
+
+@dataclass
+class CacheEntry:
+    resposta: str
+    criado_em: float
+    latencia: float
+    embedding: Optional[np.ndarray] = None
+
+
+class ResponseCache:
+    """Cache de respostas em dois níveis: texto normalizado exato e similaridade semântica.
+
+    As entradas expiram após ``ttl`` segundos, são descartadas em ordem LRU acima de
+    ``max_entries`` e são invalidadas sempre que a versão dos dados (catálogo e base de
+    conhecimento) muda. A matriz do nível semântico é mantida linha a linha: uma entrada nova
+    ocupa a próxima linha livre e uma removida dá lugar à última, sem remontar a matriz.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0, similarity_threshold: float = 0.95,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.clock = clock
+        self.version: Optional[str] = None
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        # Embeddings em linhas (capacidade dobra quando enche); as primeiras len(_matrix_keys) valem
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.llm_seconds_saved = 0.0
+
+    @classmethod
+    def from_env(cls) -> 'ResponseCache':
+        """Cria o cache a partir de RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL e RESPONSE_CACHE_SIMILARITY."""
+        return cls(
+            max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000')),
+            ttl=float(os.getenv('RESPONSE_CACHE_TTL', '3600')),
+            similarity_threshold=float(os.getenv('RESPONSE_CACHE_SIMILARITY', '0.95')),
+        )
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return 0 < self.similarity_threshold <= 1
+
+    def set_version(self, version: Optional[str]):
+        """Descarta todas as entradas quando a versão do catálogo/base de conhecimento muda."""
+        with self._lock:
+            if version == self.version:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self.version = version
+            self._entries.clear()
+            self._reset_matrix()
+
+    def _alive(self, key: str, entry: CacheEntry) -> bool:
+        if self.clock() - entry.criado_em <= self.ttl:
+            return True
+        del self._entries[key]
+        self._drop_row(key)
+        self.expirations += 1
+        return False
+
+    def _hit(self, key: str, entry: CacheEntry) -> str:
+        self._entries.move_to_end(key)
+        self.llm_seconds_saved += entry.latencia
+        return entry.resposta
+
+    def get_exact(self, mensagem: str) -> Optional[str]:
+        """Nível 1: busca pelo texto normalizado."""
+        key = normalizar_consulta(mensagem)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._alive(key, entry):
+                self.exact_hits += 1
+                return self._hit(key, entry)
+            return None
+
+    def get_semantic(self, embedding: List[float]) -> Optional[str]:
+        """Nível 2: busca a entrada mais parecida acima do limiar de similaridade."""
+        if not self.semantic_enabled:
+            return None
+        query = _normalizar_vetor(embedding)
+        with self._lock:
+            if not self._matrix_keys:
+                return None
+            scores = self._matrix[:len(self._matrix_keys)] @ query
+            best = int(scores.argmax())
+            if scores[best] < self.similarity_threshold:
+                return None
+            key = self._matrix_keys[best]
+            entry = self._entries.get(key)
+            if entry is None or not self._alive(key, entry):
+                return None
+            self.semantic_hits += 1
+            return self._hit(key, entry)
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _reset_matrix(self):
+        self._matrix = None
+        self._matrix_keys = []
+        self._rows = {}
+
+    def _set_row(self, key: str, vector: np.ndarray):
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._matrix_keys)
+            if self._matrix is None:
+                self._matrix = np.empty((16, vector.size), dtype=np.float32)
+            elif row == len(self._matrix):
+                maior = np.empty((2 * row, self._matrix.shape[1]), dtype=np.float32)
+                maior[:row] = self._matrix
+                self._matrix = maior
+            self._matrix_keys.append(key)
+            self._rows[key] = row
+        self._matrix[row] = vector
+
+    def _drop_row(self, key: str):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        ultima = len(self._matrix_keys) - 1
+        if row != ultima:
+            movida = self._matrix_keys[ultima]
+            self._matrix[row] = self._matrix[ultima]
+            self._matrix_keys[row] = movida
+            self._rows[movida] = row
+        self._matrix_keys.pop()
+
+    def put(self, mensagem: str, resposta: str, latencia: float = 0.0, embedding: Optional[List[float]] = None):
+        """Guarda a resposta gerada para a mensagem (e seu embedding, se houver)."""
+        key = normalizar_consulta(mensagem)
+        vector = _normalizar_vetor(embedding) if embedding is not None and self.semantic_enabled else None
+        with self._lock:
+            self._entries[key] = CacheEntry(resposta, self.clock(), latencia, vector)
+            self._entries.move_to_end(key)
+            if vector is not None:
+                self._set_row(key, vector)
+            else:
+                self._drop_row(key)
+            while len(self._entries) > self.max_entries:
+                descartada, _ = self._entries.popitem(last=False)
+                self._drop_row(descartada)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._reset_matrix()
+
+    # Mesma interface assíncrona do SqliteResponseCache; em memória não há E/S a tirar do loop
+    async def aset_version(self, version: Optional[str]):
+        self.set_version(version)
+
+    async def aget_exact(self, mensagem: str) -> Optional[str]:
+        return self.get_exact(mensagem)
+
+    async def aget_semantic(self, embedding: List[float]) -> Optional[str]:
+        return self.get_semantic(embedding)
+
+    async def aput(self, mensagem: str, resposta: str, latencia: float = 0.0,
+                   embedding: Optional[List[float]] = None):
+        self.put(mensagem, resposta, latencia, embedding)
+
+    def stats(self) -> Dict:
+        """Contadores de acerto/erro por nível e estimativa do tempo de LLM economizado."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_ratio': hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'llm_calls_saved': hits,
+                'llm_seconds_saved': round(self.llm_seconds_saved, 3),
+            }
+
+
+def _normalizar_vetor(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SqliteResponseCache:
+    """Cache de respostas em SQLite (modo WAL), compartilhado entre os workers de um host.
+
+    Mesma interface e mesmas regras do ResponseCache (nível exato e semântico, TTL, LRU e
+    invalidação por versão). A ordem LRU é um contador gravado na tabela; os acertos ficam
+    em memória e são gravados em lote, antes de cada descarte ou a cada ``touch_interval``
+    segundos, para que uma leitura não escreva no banco (e não force os demais workers a
+    reler a matriz). A matriz do nível semântico é atualizada aos poucos quando ``PRAGMA
+    data_version`` indica escrita de outro processo: entram as linhas com id acima do último
+    visto e saem as que não existem mais. Os métodos ``a*`` fazem o acesso ao banco fora do
+    event loop. Os contadores de acerto/erro são do worker; ``entries`` é o total compartilhado.
+    """
+
+    def __init__(self, db_path: Path = RESPONSE_CACHE_DB, max_entries: int = 1000, ttl: float = 3600.0,
+                 similarity_threshold: float = 0.95, clock=time.time, touch_interval: float = 30.0):
+        self.db_path = Path(db_path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.clock = clock
+        self.touch_interval = touch_interval
+        self.version: Optional[str] = None
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        colunas = [row[1] for row in self._conn.execute('PRAGMA table_info(respostas)')]
+        if colunas and 'id' not in colunas:
+            # Formato anterior, sem id crescente; é só cache, então recomeça vazio
+            self._conn.execute('DROP TABLE respostas')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS respostas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chave TEXT NOT NULL UNIQUE,
+                resposta TEXT NOT NULL,
+                criado_em REAL NOT NULL,
+                latencia REAL NOT NULL,
+                embedding BLOB,
+                uso INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS respostas_uso ON respostas (uso);
+            CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+        ''')
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # Matriz semântica, ids das suas linhas e o maior id já lido (AUTOINCREMENT nunca reusa ids)
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._matrix_ids = np.zeros(0, dtype=np.int64)
+        self._last_id = 0
+        self._data_version: Optional[int] = None
+        # Chaves acertadas desde a última gravação, da menos para a mais recente
+        self._touched: Dict[str, None] = {}
+        self._touched_at = time.monotonic()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.llm_seconds_saved = 0.0
+
+    @classmethod
+    def from_env(cls) -> 'SqliteResponseCache':
+        """Como ResponseCache.from_env, com o banco em RESPONSE_CACHE_DB."""
+        return cls(
+            db_path=Path(os.getenv('RESPONSE_CACHE_DB', str(RESPONSE_CACHE_DB))),
+            max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000')),
+            ttl=float(os.getenv('RESPONSE_CACHE_TTL', '3600')),
+            similarity_threshold=float(os.getenv('RESPONSE_CACHE_SIMILARITY', '0.95')),
+        )
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return 0 < self.similarity_threshold <= 1
+
+    def set_version(self, version: Optional[str]):
+        """Descarta todas as entradas quando a versão gravada no banco é outra."""
+        if version == self.version:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT valor FROM meta WHERE chave = 'version'").fetchone()
+            if row is None or row[0] != str(version):
+                if self._conn.execute('DELETE FROM respostas').rowcount:
+                    self.invalidations += 1
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(version),))
+                self._touched.clear()
+                self._data_version = None
+            self.version = version
+
+    def _alive(self, key: str, criado_em: float) -> bool:
+        if self.clock() - criado_em <= self.ttl:
+            return True
+        self._conn.execute('DELETE FROM respostas WHERE chave = ?', (key,))
+        self._touched.pop(key, None)
+        self._data_version = None
+        self.expirations += 1
+        return False
+
+    def _hit(self, key: str, resposta: str, latencia: float) -> str:
+        self._touched.pop(key, None)
+        self._touched[key] = None
+        if time.monotonic() - self._touched_at >= self.touch_interval:
+            self._flush_touches()
+        self.llm_seconds_saved += latencia
+        return resposta
+
+    def _flush_touches(self):
+        """Grava a ordem de uso das chaves acertadas, numa só escrita."""
+        if self._touched:
+            base = self._conn.execute('SELECT COALESCE(MAX(uso), 0) FROM respostas').fetchone()[0]
+            self._conn.executemany('UPDATE respostas SET uso = ? WHERE chave = ?',
+                                   [(base + i, key) for i, key in enumerate(self._touched, 1)])
+            self._touched.clear()
+        self._touched_at = time.monotonic()
+
+    def get_exact(self, mensagem: str) -> Optional[str]:
+        """Nível 1: busca pelo texto normalizado."""
+        key = normalizar_consulta(mensagem)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT resposta, criado_em, latencia FROM respostas WHERE chave = ?', (key,)
+            ).fetchone()
+            if row is not None and self._alive(key, row[1]):
+                self.exact_hits += 1
+                return self._hit(key, row[0], row[2])
+            return None
+
+    def get_semantic(self, embedding: List[float]) -> Optional[str]:
+        """Nível 2: busca a entrada mais parecida acima do limiar de similaridade."""
+        if not self.semantic_enabled:
+            return None
+        query = _normalizar_vetor(embedding)
+        with self._lock, self._conn:
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version != self._data_version:
+                self._sync_matrix(data_version)
+            if not len(self._matrix_ids):
+                return None
+            scores = self._matrix @ query
+            best = int(scores.argmax())
+            if scores[best] < self.similarity_threshold:
+                return None
+            row = self._conn.execute(
+                'SELECT chave, resposta, criado_em, latencia FROM respostas WHERE id = ?',
+                (int(self._matrix_ids[best]),),
+            ).fetchone()
+            if row is None or not self._alive(row[0], row[2]):
+                return None
+            self.semantic_hits += 1
+            return self._hit(row[0], row[1], row[3])
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def _sync_matrix(self, data_version: int):
+        """Tira da matriz as linhas apagadas e acrescenta as novas (id acima do último lido)."""
+        vivos = np.fromiter(
+            (row[0] for row in self._conn.execute('SELECT id FROM respostas WHERE id <= ?', (self._last_id,))),
+            dtype=np.int64,
+        )
+        manter = np.isin(self._matrix_ids, vivos)
+        if not manter.all():
+            self._matrix, self._matrix_ids = self._matrix[manter], self._matrix_ids[manter]
+
+        linhas = self._conn.execute(
+            'SELECT id, embedding FROM respostas WHERE id > ? ORDER BY id', (self._last_id,)
+        ).fetchall()
+        novos = [(i, blob) for i, blob in linhas if blob is not None]
+        if novos:
+            bloco = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in novos])
+            self._matrix = np.vstack([self._matrix, bloco]) if len(self._matrix_ids) else bloco
+            self._matrix_ids = np.concatenate([self._matrix_ids, np.array([i for i, _ in novos], dtype=np.int64)])
+        if linhas:
+            self._last_id = linhas[-1][0]
+        self._data_version = data_version
+
+    def put(self, mensagem: str, resposta: str, latencia: float = 0.0, embedding: Optional[List[float]] = None):
+        """Guarda a resposta gerada para a mensagem (e seu embedding, se houver)."""
+        key = normalizar_consulta(mensagem)
+        vector = _normalizar_vetor(embedding) if embedding is not None and self.semantic_enabled else None
+        with self._lock, self._conn:
+            # A ordem de uso precisa estar no banco antes de escolher o que descartar
+            self._flush_touches()
+            blob = vector.astype(np.float32).tobytes() if vector is not None else None
+            self._conn.execute(
+                'INSERT OR REPLACE INTO respostas (chave, resposta, criado_em, latencia, embedding, uso) '
+                'VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(uso), 0) + 1 FROM respostas))',
+                (key, resposta, self.clock(), latencia, blob),
+            )
+            self.evictions += self._conn.execute(
+                'DELETE FROM respostas WHERE chave IN '
+                '(SELECT chave FROM respostas ORDER BY uso DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,),
+            ).rowcount
+            # data_version só muda com escritas de outras conexões: a próxima busca sincroniza
+            self._data_version = None
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM respostas')
+            self._touched.clear()
+            self._data_version = None
+
+    async def aset_version(self, version: Optional[str]):
+        if version != self.version:
+            await asyncio.to_thread(self.set_version, version)
+
+    async def aget_exact(self, mensagem: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get_exact, mensagem)
+
+    async def aget_semantic(self, embedding: List[float]) -> Optional[str]:
+        return await asyncio.to_thread(self.get_semantic, embedding)
+
+    async def aput(self, mensagem: str, resposta: str, latencia: float = 0.0,
+                   embedding: Optional[List[float]] = None):
+        await asyncio.to_thread(self.put, mensagem, resposta, latencia, embedding)
+
+    def stats(self) -> Dict:
+        """Contadores de acerto/erro por nível e estimativa do tempo de LLM economizado."""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM respostas').fetchone()[0]
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                'entries': entries,
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_ratio': hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'llm_calls_saved': hits,
+                'llm_seconds_saved': round(self.llm_seconds_saved, 3),
+            }
+
+
+def create_response_cache() -> Union[ResponseCache, SqliteResponseCache]:
+    """Cria o cache escolhido por RESPONSE_CACHE_BACKEND (memory ou sqlite)."""
+    if os.getenv('RESPONSE_CACHE_BACKEND', 'memory').lower() == 'sqlite':
+        return SqliteResponseCache.from_env()
+    return ResponseCache.from_env()
@@ -3,6 +3,15 @@ document.addEventListener("DOMContentLoaded", () => {
   const userInput = document.getElementById("user-input");
   const sendButton = document.getElementById("send-button");
 
+  // Identificador da sessão, usado para separar o histórico de cada usuário
+  let sessionId = localStorage.getItem("session_id");
+  if (!sessionId) {
+    sessionId =
+      (window.crypto && crypto.randomUUID && crypto.randomUUID()) ||
+      `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+    localStorage.setItem("session_id", sessionId);
+  }
+
   // Adiciona mensagem inicial de boas-vindas
   addMessage(
     `Olá! 👋 Sou o assistente virtual da loja. Como posso ajudar você hoje?
@@ -61,7 +70,10 @@ Posso te ajudar com:
         headers: {
           "Content-Type": "application/json",
         },
-        body: JSON.stringify({ content: message }),
+        body: JSON.stringify({
+          content: message,
+          context: { session_id: sessionId },
+        }),
       });
 
       if (!response.ok) {
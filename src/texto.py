@@ -0,0 +1,6 @@
+import unicodedata
+
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas sem acentos ('Devolução' -> 'devolucao'), para comparações de palavras-chave."""
+    return unicodedata.normalize('NFKD', texto.lower()).encode('ascii', 'ignore').decode('ascii')
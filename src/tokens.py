@@ -0,0 +1,52 @@
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+# Encoding do tiktoken usado na contagem (o mesmo dos modelos de chat da OpenAI)
+TOKEN_ENCODING = os.getenv('TOKEN_ENCODING', 'cl100k_base')
+
+_PALAVRAS = re.compile(r'\w+|[^\w\s]')
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # O tiktoken baixa o encoding no primeiro uso; offline, cai na aproximação
+    if not TOKEN_ENCODING:
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        return None
+
+
+def tokenizador() -> str:
+    """Nome do contador em uso: 'tiktoken:<encoding>' ou 'aproximado'."""
+    return f'tiktoken:{TOKEN_ENCODING}' if _encoding() is not None else 'aproximado'
+
+
+def contar_tokens(texto: str) -> int:
+    """Número de tokens do texto (exato com tiktoken; senão ~1 token a cada 4 letras por palavra)."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(texto, disallowed_special=()))
+    return sum(1 + (len(parte) - 1) // 4 for parte in _PALAVRAS.findall(texto))
+
+
+def contar_tokens_mensagens(mensagens: List) -> int:
+    """Tokens do conteúdo de uma lista de mensagens do langchain."""
+    return sum(contar_tokens(str(getattr(m, 'content', m))) for m in mensagens)
+
+
+def limitar_por_tokens(textos: List[str], orcamento: int, maximo: Optional[int] = None) -> List[str]:
+    """Primeiros textos (até `maximo`) que cabem juntos em `orcamento` tokens; o primeiro sempre entra."""
+    escolhidos: List[str] = []
+    usados = 0
+    for texto in textos[:maximo]:
+        tokens = contar_tokens(texto)
+        if escolhidos and usados + tokens > orcamento:
+            break
+        escolhidos.append(texto)
+        usados += tokens
+    return escolhidos
@@ -1,15 +1,10 @@
 import sys, os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+# Offline providers (see src/providers.py) and no persistent embedding cache in tests
+os.environ.setdefault("ASSISTENTE_EMBEDDINGS", "hashing")
+os.environ.setdefault("ASSISTENTE_LLM", "echo")
+os.environ.setdefault("EMBEDDING_CACHE_DB", "")
 import pytest
-import types
-sys.modules.setdefault("langchain_openai", types.SimpleNamespace(ChatOpenAI=object, OpenAIEmbeddings=object))
-sys.modules.setdefault("dotenv", types.SimpleNamespace(load_dotenv=lambda *a, **k: None))
-sys.modules.setdefault('langchain.prompts', types.SimpleNamespace(ChatPromptTemplate=type('CPT',(object,),{'from_messages':staticmethod(lambda msgs: type('X',(object,),{'format_messages':lambda self: msgs})())})))
-langchain_mod=types.ModuleType('langchain'); langchain_mod.__path__=[]; sys.modules['langchain']=langchain_mod
-sys.modules.setdefault("langchain.text_splitter", types.SimpleNamespace(RecursiveCharacterTextSplitter=object))
-sys.modules.setdefault("langchain_community.vectorstores", types.SimpleNamespace(FAISS=object))
-sys.modules.setdefault("numpy", types.ModuleType("numpy"))
-sys.modules.setdefault("langchain.schema", types.SimpleNamespace(HumanMessage=type("HM",(object,),{"__init__":lambda self,*a,**k:None}), SystemMessage=type("SM",(object,),{"__init__":lambda self,*a,**k:None})))
 import json
 
 class DummyLLM:
@@ -22,7 +17,36 @@ class DummyLLM:
             generations = [[Gen()]]
         return Result()
 
+    async def astream(self, *args, **kwargs):
+        class Chunk:
+            def __init__(self, content):
+                self.content = content
+        for token in ("dum", "my"):
+            yield Chunk(token)
+
 class DummyRAG:
+    def __init__(self, router=None):
+        from intent_router import IntentRouter
+        self.warmed = False
+        self.router = router if router is not None else IntentRouter.from_file()
+
+    @property
+    def ready(self):
+        return self.warmed
+
+    def readiness(self):
+        return {"products_index": self.warmed, "knowledge_base": self.warmed}
+
+    async def warmup(self):
+        self.warmed = True
+
+    def data_version(self):
+        return "dummy"
+
+    async def embed_query(self, text):
+        text = text.lower()
+        return [float(text.count(word)) for word in ("notebook", "troca", "entrega", "garantia")] + [0.1]
+
     async def search_products(self, query, filters=None):
         with open('data/produtos.json', 'r', encoding='utf-8') as f:
             products = json.load(f)
@@ -32,12 +56,20 @@ class DummyRAG:
                 results.append(p)
         return results
 
-    async def query_knowledge_base(self, query):
+    async def search_products_scored(self, query, filters=None):
+        return [(p, 1.0) for p in await self.search_products(query, filters)]
+
+    def product_matcher(self):
+        from product_matcher import ProductMatcher
+        with open('data/produtos.json', 'r', encoding='utf-8') as f:
+            return ProductMatcher(json.load(f))
+
+    async def query_knowledge_base(self, query, k=None, token_budget=None):
         return ["Você tem até 7 dias corridos para solicitar a troca de produtos não perecíveis"]
 
 @pytest.fixture
 def assistant(monkeypatch):
     import assistente as assistente_module
-    monkeypatch.setattr(assistente_module, 'ChatOpenAI', lambda *a, **k: DummyLLM())
-    monkeypatch.setattr(assistente_module, 'RAGSystem', lambda: DummyRAG())
+    monkeypatch.setattr(assistente_module, 'create_llm', lambda *a, **k: DummyLLM())
+    monkeypatch.setattr(assistente_module, 'RAGSystem', DummyRAG)
     return assistente_module.AssistenteVirtual()
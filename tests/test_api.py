@@ -0,0 +1,47 @@
+from fastapi.testclient import TestClient
+
+
+def test_lifespan_shares_one_engine(monkeypatch):
+    import api
+    import assistente as assistente_module
+    from conftest import DummyLLM, DummyRAG
+
+    created = []
+
+    def make_rag(router=None):
+        created.append(DummyRAG(router))
+        return created[-1]
+
+    monkeypatch.setattr(api, 'RAGSystem', make_rag)
+    monkeypatch.setattr(assistente_module, 'RAGSystem', make_rag)
+    monkeypatch.setattr(assistente_module, 'create_llm', lambda *a, **k: DummyLLM())
+
+    with TestClient(api.app) as client:
+        assert client.get('/health').json() == {'status': 'ok'}
+        ready = client.get('/health/ready')
+        assert ready.status_code == 200
+        assert ready.json()['status'] == 'ready'
+        assert len(created) == 1
+        assert client.app.state.assistente.rag_system is client.app.state.rag_system
+        assert client.app.state.assistente.router is client.app.state.rag_system.router
+
+
+def test_websocket_reports_invalid_messages_and_keeps_the_connection(monkeypatch):
+    import api
+    import assistente as assistente_module
+    from conftest import DummyLLM, DummyRAG
+
+    monkeypatch.setattr(api, 'RAGSystem', DummyRAG)
+    monkeypatch.setattr(assistente_module, 'create_llm', lambda *a, **k: DummyLLM())
+
+    with TestClient(api.app) as client, client.websocket_connect('/ws/chat') as websocket:
+        websocket.send_text('{não é json')
+        assert websocket.receive_json()['type'] == 'error'
+        websocket.send_json({'context': {}})
+        assert websocket.receive_json()['error'] == 'ValidationError'
+
+        websocket.send_json({'content': 'Qual a política de garantia?'})
+        mensagens = [websocket.receive_json()]
+        while mensagens[-1]['type'] != 'done':
+            mensagens.append(websocket.receive_json())
+        assert mensagens[-1]['response'] == 'dummy'
@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+import pytest
+
+from embedding_batcher import EmbeddingBatcher
+from product_index import ProductIndex
+from test_product_index import CountingEmbeddings
+
+
+def test_concurrent_queries_are_coalesced():
+    embeddings = CountingEmbeddings()
+    batcher = EmbeddingBatcher(embeddings, window=0.01)
+
+    async def run():
+        return await asyncio.gather(*(batcher.embed(q) for q in ['notebook', 'livro', 'notebook', 'panelas']))
+
+    vectors = asyncio.run(run())
+    assert embeddings.document_calls == 1
+    assert vectors[0] == vectors[2] == embeddings._embed('notebook')
+    assert batcher.stats()['texts_embedded'] == 3
+
+
+def test_search_many_matches_single_searches(tmp_path):
+    with open('data/produtos.json', 'r', encoding='utf-8') as f:
+        produtos = json.load(f)
+    embeddings = CountingEmbeddings()
+    index = ProductIndex(produtos, embeddings, index_dir=tmp_path)
+    asyncio.run(index.ensure_ready())
+
+    queries = [asyncio.run(embeddings.aembed_query(q)) for q in ['notebook', 'tênis', 'livro']]
+    batch = index.search_many(queries, k=2, filters={'max_price': 3000})
+    assert batch == [index.search(q, k=2, filters={'max_price': 3000}) for q in queries]
+
+
+def test_chat_batch_reports_status_per_item(assistant):
+    async def failing_search(query, filters=None):
+        raise RuntimeError('embedding service down')
+
+    assistant.rag_system.search_products = failing_search
+    resultados = asyncio.run(assistant.processar_mensagens(
+        [('Qual o status do pedido #12345?', None), ('Quero um notebook', None), ('Olá!', None)],
+        concorrencia=2,
+    ))
+    assert [r['status'] for r in resultados] == ['ok', 'error', 'ok']
+    assert resultados[0]['response'].startswith('Status do pedido 12345')
+    assert resultados[2]['response'] == 'dummy'
+
+
+def test_lone_and_cached_queries_skip_the_window():
+    from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+    inner = CountingEmbeddings()
+    batcher = EmbeddingBatcher(CachedEmbeddings(inner, EmbeddingCache(db_path=None)), window=10)
+
+    async def run():
+        # Sem lote em andamento, a consulta sai na hora; a janela de 10 s estouraria o prazo
+        first = await asyncio.wait_for(batcher.embed('notebook'), timeout=1)
+        again = await asyncio.wait_for(batcher.embed('notebook'), timeout=1)
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert first == pytest.approx(inner._embed('notebook')) == again
+    assert inner.document_calls == 1
+    stats = batcher.stats()
+    assert stats['cache_hits'] == 1 and stats['batches'] == 1
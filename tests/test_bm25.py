@@ -0,0 +1,60 @@
+import asyncio
+
+from bm25 import BM25Index, fusao_rrf, lexical_decisivo, tokenizar
+from knowledge_index import KnowledgeIndex
+
+
+def test_tokenizer_folds_accents_stopwords_and_plurals():
+    assert tokenizar('Quais são as políticas de devoluções?') == ['politica', 'devolucao']
+
+
+def test_bm25_ranks_exact_terms_and_fusion():
+    index = BM25Index(['entrega', 'garantia', 'trocas'], [
+        'O prazo de entrega é de 5 dias úteis para capitais.',
+        'A garantia cobre defeitos de fabricação por 90 dias.',
+        'Trocas em até 7 dias; a garantia não cobre mau uso.',
+    ])
+    hits = index.search('garantia de fabricação')
+    assert [h.id for h in hits] == ['garantia', 'trocas']
+    assert hits[0].cobertura == 1.0 and hits[1].cobertura == 0.5
+    assert lexical_decisivo(hits)
+    assert not lexical_decisivo(index.search('garantia'))
+    assert index.search('frete internacional') == []
+
+    assert fusao_rrf([['a', 'b', 'c'], ['c', 'a']]) == ['a', 'c', 'b']
+
+
+def test_hybrid_knowledge_query_skips_embedding_when_lexical_is_decisive(tmp_path, monkeypatch):
+    from functools import partial
+
+    import rag_system as rag_module
+    from catalog_store import load_catalog
+
+    data_dir = tmp_path / 'data'
+    (data_dir / 'knowledge').mkdir(parents=True)
+    (data_dir / 'knowledge' / 'entrega.md').write_text('O prazo de entrega é de 5 dias úteis.', encoding='utf-8')
+    (data_dir / 'knowledge' / 'garantia.md').write_text('A garantia de fábrica é de 90 dias.', encoding='utf-8')
+    (data_dir / 'knowledge' / 'pagamento.md').write_text('Aceitamos pix, boleto e cartão.', encoding='utf-8')
+
+    # Catálogo compilado no tmp_path, não no data/index do repositório
+    monkeypatch.setattr(rag_module, 'load_catalog', partial(load_catalog, index_dir=tmp_path / 'catalogo'))
+    rag = rag_module.RAGSystem()
+    index = KnowledgeIndex(rag.embeddings, data_dir=data_dir, index_dir=tmp_path / 'index')
+    rag.knowledge_base, rag.knowledge_lexical, rag.knowledge_loaded = index.load(), index.lexical, True
+
+    embeds = []
+    original = rag.query_embedder.embed
+
+    async def counting_embed(text):
+        embeds.append(text)
+        return await original(text)
+
+    rag.query_embedder.embed = counting_embed
+
+    decisivo = asyncio.run(rag.query_knowledge_base('prazo de entrega'))
+    assert decisivo == ['O prazo de entrega é de 5 dias úteis.'] and embeds == []
+
+    hibrido = asyncio.run(rag.query_knowledge_base('quanto custa o frete?', k=2))
+    assert len(hibrido) == 2 and embeds == ['quanto custa o frete?']
+
+    assert len(asyncio.run(rag.query_knowledge_base('garantia pix entrega', k=3, token_budget=1))) == 1
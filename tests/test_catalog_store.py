@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import numpy as np
+
+from catalog_store import CatalogStore, activate_catalog, compile_catalog, load_catalog
+from product_index import ProductIndex
+from providers import HashingEmbeddings
+
+
+def _produtos():
+    with open('data/produtos.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_compiled_catalog_is_memory_mapped_and_decodes_rows_on_demand(tmp_path):
+    produtos = _produtos()
+    catalogo = CatalogStore.open(compile_catalog(produtos, tmp_path))
+
+    assert len(catalogo) == len(produtos)
+    assert isinstance(catalogo.precos, np.memmap) and not catalogo.precos.flags.writeable
+    assert catalogo.precos.tolist() == [p['preco'] for p in produtos]
+    assert catalogo.disponivel.tolist() == [p['disponivel'] for p in produtos]
+    assert [catalogo.nomes_categorias[c] for c in catalogo.categorias] == [p['categoria'].lower() for p in produtos]
+    assert catalogo[1] == produtos[1]
+    assert catalogo[-1] == produtos[-1]
+
+
+def test_load_catalog_recompiles_only_when_the_source_changes(tmp_path):
+    fonte = tmp_path / 'produtos.json'
+    fonte.write_text(json.dumps(_produtos()), encoding='utf-8')
+
+    primeiro = load_catalog(fonte, tmp_path / 'index')
+    assert load_catalog(fonte, tmp_path / 'index').diretorio == primeiro.diretorio
+
+    alterados = _produtos()
+    alterados[0]['preco'] = 10.0
+    fonte.write_text(json.dumps(alterados), encoding='utf-8')
+    segundo = load_catalog(fonte, tmp_path / 'index')
+    assert segundo.diretorio != primeiro.diretorio and segundo[0]['preco'] == 10.0
+    # The previous version stays for the grace period, for workers still reading it
+    assert primeiro.diretorio.exists() and (primeiro.diretorio / '.inativo').exists()
+    # Only the price changed: the product embeddings stay valid
+    assert segundo.text_hash == primeiro.text_hash
+
+
+def test_product_index_filters_on_catalog_columns_and_maps_the_matrix(tmp_path):
+    catalogo = CatalogStore.open(compile_catalog(_produtos(), tmp_path))
+    index = ProductIndex(catalogo, HashingEmbeddings(), index_dir=tmp_path)
+    asyncio.run(index.ensure_ready())
+
+    assert isinstance(index.matrix, np.memmap)
+    mask = index.filter_mask({'category': 'Casa', 'available': True})
+    assert mask.tolist() == [p['categoria'] == 'Casa' and p['disponivel'] for p in _produtos()]
+
+
+def test_old_catalogs_are_removed_after_the_grace_period(tmp_path):
+    import os
+    import stat
+
+    primeiro = compile_catalog(_produtos(), tmp_path)
+    assert stat.S_IMODE(os.stat(primeiro).st_mode) == 0o755
+
+    alterados = _produtos()
+    alterados[0]['preco'] = 10.0
+    segundo = compile_catalog(alterados, tmp_path)
+    assert primeiro.exists()
+
+    activate_catalog(segundo, tmp_path, retencao=3600)
+    assert primeiro.exists()
+    activate_catalog(segundo, tmp_path, retencao=0)
+    assert not primeiro.exists() and segundo.exists()
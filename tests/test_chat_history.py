@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+from chat_history import ChatHistoryStore, InMemoryChatHistory, SqliteChatHistory
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _entry(i):
+    return {'user': f'pergunta {i}', 'assistant': f'resposta {i}', 'timestamp': datetime.now().isoformat()}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == 'sqlite':
+            return SqliteChatHistory(tmp_path / 'history.sqlite', **kwargs)
+        return InMemoryChatHistory(**kwargs)
+    return make
+
+
+def test_sessions_are_isolated_capped_and_paginated(make_store):
+    store = make_store(max_messages=3, idle_ttl=60)
+    for i in range(5):
+        store.append('a', _entry(i))
+    store.append('b', _entry(99))
+
+    history, total = store.get('a')
+    assert total == 3
+    assert [h['user'] for h in history] == ['pergunta 2', 'pergunta 3', 'pergunta 4']
+    assert [h['user'] for h in store.get('a', offset=1, limit=1)[0]] == ['pergunta 3']
+    assert store.get('b')[1] == 1
+
+    store.clear('a')
+    assert store.get('a') == ([], 0)
+    assert store.get('b')[1] == 1
+
+
+def test_idle_sessions_expire(make_store):
+    clock = FakeClock()
+    store = make_store(max_messages=3, idle_ttl=60, clock=clock)
+    store.append('a', _entry(1))
+    clock.now += 30
+    store.append('b', _entry(2))
+    clock.now += 45
+    assert store.expire_idle() == 1
+    assert store.get('a') == ([], 0)
+    assert store.get('b')[1] == 1
+
+
+def test_incomplete_backend_fails_at_construction():
+    class SemExpiracao(ChatHistoryStore):
+        def append(self, session_id, entry):
+            pass
+
+        def get(self, session_id, offset=0, limit=50):
+            return [], 0
+
+        def clear(self, session_id):
+            pass
+
+    with pytest.raises(TypeError):
+        SemExpiracao()
@@ -0,0 +1,109 @@
+import asyncio
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class SlowEmbeddings:
+    model = 'fake-embeddings'
+
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(0.01)
+        return self.embed_documents(texts)
+
+
+def test_inflight_requests_are_deduplicated_and_cached():
+    inner = SlowEmbeddings()
+    embeddings = CachedEmbeddings(inner, EmbeddingCache(db_path=None))
+
+    async def run():
+        return await asyncio.gather(
+            embeddings.aembed_query('notebook'),
+            embeddings.aembed_documents(['notebook', 'livro']),
+        )
+
+    query, documents = asyncio.run(run())
+    assert inner.texts.count('notebook') == 1
+    assert query == documents[0] == [8.0, 1.0]
+
+    assert embeddings.embed_query('livro') == [5.0, 1.0]
+    assert inner.texts.count('livro') == 1
+    stats = embeddings.cache.stats()
+    assert stats['memory_hits'] >= 1 and stats['memory_bytes'] > 0
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    db = tmp_path / 'embeddings.sqlite'
+    CachedEmbeddings(SlowEmbeddings(), EmbeddingCache(db_path=db)).embed_documents(['panelas', 'tênis'])
+
+    inner = SlowEmbeddings()
+    reopened = CachedEmbeddings(inner, EmbeddingCache(db_path=db, max_memory_entries=1))
+    assert asyncio.run(reopened.aembed_documents(['panelas', 'tênis'])) == [[7.0, 1.0], [5.0, 1.0]]
+    assert inner.texts == []
+    stats = reopened.cache.stats()
+    assert stats['disk_hits'] == 2 and stats['memory_entries'] == 1 and stats['disk_bytes'] > 0
+
+
+def test_cancelled_request_does_not_strand_waiters():
+    class BlockingEmbeddings(SlowEmbeddings):
+        def __init__(self):
+            super().__init__()
+            self.release = None
+
+        async def aembed_documents(self, texts):
+            if self.release is not None:
+                await self.release.wait()
+            return self.embed_documents(texts)
+
+    inner = BlockingEmbeddings()
+    embeddings = CachedEmbeddings(inner, EmbeddingCache(db_path=None))
+
+    async def run():
+        inner.release = asyncio.Event()
+        owner = asyncio.ensure_future(embeddings.aembed_query('notebook'))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(embeddings.aembed_query('notebook'))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        inner.release.set()
+        # The waiter computes the text itself instead of hanging on the cancelled call
+        vector = await asyncio.wait_for(waiter, timeout=1)
+        assert owner.cancelled()
+        assert embeddings._inflight == {}
+        return vector, await asyncio.wait_for(embeddings.aembed_query('notebook'), timeout=1)
+
+    vector, again = asyncio.run(run())
+    assert vector == again == [8.0, 1.0]
+    assert inner.texts == ['notebook']
+
+
+def test_async_disk_tier_runs_off_the_event_loop(tmp_path, monkeypatch):
+    import threading
+
+    cache = EmbeddingCache(db_path=tmp_path / 'embeddings.sqlite', max_memory_entries=1)
+    embeddings = CachedEmbeddings(SlowEmbeddings(), cache)
+    threads = []
+    for name in ('_get_disk', '_store'):
+        original = getattr(cache, name)
+
+        def spy(*args, _original=original):
+            threads.append(threading.get_ident())
+            return _original(*args)
+        monkeypatch.setattr(cache, name, spy)
+
+    async def run():
+        await embeddings.aembed_documents(['panelas', 'tênis'])
+        return await embeddings.aembed_query('panelas'), threading.get_ident()
+
+    vector, loop_thread = asyncio.run(run())
+    assert vector == [7.0, 1.0]
+    assert threads and loop_thread not in threads
+    # Memory holds one entry: 'panelas', promoted from disk; 'tênis' is only on disk now
+    assert embeddings.cached('panelas') == [7.0, 1.0] and embeddings.cached('tênis') is None
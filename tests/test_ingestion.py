@@ -0,0 +1,139 @@
+import asyncio
+import json
+from functools import partial
+
+import pytest
+from fastapi.testclient import TestClient
+
+import rag_system as rag_module
+import registros
+from catalog_store import load_catalog
+from ingestion import ResultadoIngestao, ingerir_pedidos, ingerir_produtos
+from knowledge_index import KnowledgeIndex
+from order_store import JsonOrderStore, SqliteOrderStore, load_pedidos
+from product_index import ProductIndex
+from providers import HashingEmbeddings
+from registros import ESQUEMA_PRODUTO, ErroFormato, ler_registros, validar
+
+
+def _produtos():
+    with open('data/produtos.json', 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_reads_arrays_and_jsonl_incrementally_and_validates(tmp_path, monkeypatch):
+    # Blocos minúsculos: registros e números cortados entre leituras
+    monkeypatch.setattr(registros, 'LEITURA_BYTES', 7)
+    array = tmp_path / 'itens.json'
+    array.write_text(json.dumps([{'a': 'x y', 'b': [1, 2]}, 123456789, {'c': {'d': None}}], indent=2))
+    assert [lido.valor for lido in ler_registros(array)] == [{'a': 'x y', 'b': [1, 2]}, 123456789, {'c': {'d': None}}]
+
+    linhas = tmp_path / 'itens.jsonl'
+    linhas.write_text('{"a": 1}\nlixo\n\n{"b": 2}\n')
+    lidos = list(ler_registros(linhas))
+    assert [(lido.posicao, lido.erro is None) for lido in lidos] == [(1, True), (2, False), (4, True)]
+
+    array.write_text('[{"a": 1}, {"b": ')
+    with pytest.raises(ErroFormato):
+        list(ler_registros(array))
+
+    produto = {**_produtos()[0], 'preco': True}
+    del produto['categoria']
+    assert validar(produto, ESQUEMA_PRODUTO) == ['categoria: obrigatório', 'preco: esperado int/float, recebido bool']
+
+
+def test_product_ingestion_swaps_catalog_while_serving(tmp_path, monkeypatch):
+    index_dir = tmp_path / 'index'
+    monkeypatch.setattr(rag_module, 'load_catalog', partial(load_catalog, index_dir=index_dir))
+    monkeypatch.setattr(rag_module, 'ProductIndex', partial(ProductIndex, index_dir=index_dir))
+    monkeypatch.setattr(rag_module, 'KnowledgeIndex', partial(KnowledgeIndex, index_dir=tmp_path / 'knowledge'))
+    rag = rag_module.RAGSystem()
+    asyncio.run(rag.warmup())
+    versao_anterior = rag.data_version()
+    matriz_anterior = rag.product_index.matrix_file
+
+    produtos = _produtos()
+    produtos[0]['preco'] = 1999.0
+    origem = tmp_path / 'produtos.jsonl'
+    origem.write_text('\n'.join(json.dumps(p) for p in produtos) + '\n{"id": "X", "nome": "Sem preço"}\n')
+    destino = tmp_path / 'produtos.json'
+    resultado = asyncio.run(ingerir_produtos(origem, tmp_path / 'rejeitados.jsonl', HashingEmbeddings(),
+                                             destino=destino, index_dir=index_dir))
+
+    assert (resultado.aceitos, resultado.rejeitados) == (len(produtos), 1)
+    recusado = json.loads((tmp_path / 'rejeitados.jsonl').read_text())
+    assert recusado['posicao'] == len(produtos) + 1 and 'preco: obrigatório' in recusado['erros']
+    assert json.loads(destino.read_text()) == produtos
+    # O arquivo novo corresponde ao catálogo ativo: nada é recompilado na próxima carga
+    assert load_catalog(destino, index_dir).version == resultado.versao
+
+    assert asyncio.run(rag.refresh_products())
+    encontrados = asyncio.run(rag.search_products('Notebook Dell Inspiron'))
+    assert encontrados[0]['preco'] == 1999.0
+    assert rag.data_version() != versao_anterior
+    assert not asyncio.run(rag.refresh_products())
+
+    # Cada versão do catálogo tem a sua matriz; só o preço mudou, então ela é reaproveitada
+    matriz = rag.product_index.matrix_file
+    assert matriz.parent == rag.produtos.diretorio != matriz_anterior.parent
+    assert matriz_anterior.exists() and matriz.samefile(matriz_anterior)
+
+
+def test_order_ingestion_imports_in_batches_and_keeps_the_previous_version_on_errors(tmp_path, monkeypatch):
+    destino = tmp_path / 'pedidos.json'
+    destino.write_text(json.dumps([{'pedido_id': '1', 'status': 'Antigo'}]))
+    db_path = tmp_path / 'pedidos.sqlite'
+    servindo = [JsonOrderStore(destino), SqliteOrderStore(destino, db_path)]
+    assert all(store.get('1')['status'] == 'Antigo' for store in servindo)
+
+    monkeypatch.setattr('order_store.PEDIDOS_BATCH', 2)
+    origem = tmp_path / 'exportacao.jsonl'
+    origem.write_text('\n'.join(json.dumps({'pedido_id': i, 'status': 'Novo'}) for i in range(1, 6))
+                      + '\n{"status": "sem id"}\n')
+    resultado = ingerir_pedidos(origem, tmp_path / 'rejeitados.jsonl', destino, db_path, indexar=True)
+
+    assert (resultado.aceitos, resultado.rejeitados) == (5, 1)
+    for store in servindo:
+        store.get('5')
+        store.wait_refresh()
+    assert all(store.get('5')['status'] == 'Novo' for store in servindo)
+
+    # Arquivo malformado: erro explícito, e os repositórios continuam com a versão anterior
+    destino.write_text('[{"pedido_id": "9", ')
+    with pytest.raises(ErroFormato):
+        load_pedidos(destino)
+    for store in servindo:
+        store.get('1')
+        store.wait_refresh()
+    assert all(store.get('1')['status'] == 'Novo' for store in servindo)
+
+
+def test_admin_ingest_endpoint(tmp_path, monkeypatch):
+    import api
+    from conftest import DummyRAG
+
+    chamadas = []
+
+    async def fake_ingerir(tipo, origem, rejeitados=None, embeddings=None):
+        chamadas.append((tipo, origem.name))
+        return ResultadoIngestao(tipo, 2, 0, None, 'v1', 0.0)
+
+    (tmp_path / 'pedidos.jsonl').write_text('{}\n')
+    monkeypatch.setattr(api, 'RAGSystem', DummyRAG)
+    monkeypatch.setattr(api, 'INGEST_DIR', tmp_path)
+    monkeypatch.setattr(api, 'ingerir', fake_ingerir)
+    corpo = {'kind': 'pedidos', 'path': 'pedidos.jsonl'}
+
+    with TestClient(api.app) as client:
+        monkeypatch.setattr(api, 'ADMIN_TOKEN', '')
+        assert client.post('/admin/ingest', json=corpo).status_code == 404
+        monkeypatch.setattr(api, 'ADMIN_TOKEN', 'segredo')
+        assert client.post('/admin/ingest', json=corpo, headers={'X-Admin-Token': 'x'}).status_code == 401
+
+        headers = {'X-Admin-Token': 'segredo'}
+        fora = client.post('/admin/ingest', json={**corpo, 'path': '../fora.json'}, headers=headers)
+        assert fora.status_code == 400
+        assert client.post('/admin/ingest', json=corpo, headers=headers).status_code == 202
+        status = client.get('/admin/ingest', headers=headers).json()
+        assert status['status'] in ('running', 'done'), status
+    assert chamadas == [('pedidos', 'pedidos.jsonl')]
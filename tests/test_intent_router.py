@@ -0,0 +1,46 @@
+import pytest
+
+from intent_router import IntentRouter
+
+
+@pytest.fixture(scope='module')
+def router():
+    return IntentRouter.from_file()
+
+
+@pytest.mark.parametrize('mensagem, intent, categoria, pedido_id', [
+    ('Qual o status do pedido #12345?', 'pedido', None, '12345'),
+    ('pedido: 67890 chegou?', 'pedido', None, '67890'),
+    ('Meu pedido é o 555', 'pedido', None, '555'),
+    ('Qual o prazo para DEVOLUCAO?', 'prazo_troca', None, None),
+    ('Qual é a política de trocas?', 'politicas', None, None),
+    ('Como funciona o pagamento?', 'politicas', None, None),
+    ('Quero um tenis para corrida', 'produtos', 'esportes', None),
+    ('Vocês têm notebook?', 'produtos', 'eletrônicos', None),
+    ('Sugestão de presente de cozinha', 'produtos', 'casa', None),
+    ('Olá, tudo bem?', 'geral', None, None),
+])
+def test_classificar(router, mensagem, intent, categoria, pedido_id):
+    rota = router.classificar(mensagem)
+    assert (rota.intent, rota.categoria, rota.pedido_id) == (intent, categoria, pedido_id)
+
+
+def test_flags(router):
+    rota = router.classificar('Quais produtos de cozinha vocês têm?')
+    assert rota.filtrar_catalogo
+    assert {'produtos'} <= rota.intents
+    assert not router.classificar('Vocês têm notebook?').filtrar_catalogo
+    assert router.classificar('pedido sem número').tem_numero is False
+    assert 'prazo_troca' in router.classificar('Qual é a política de trocas?').intents
+
+
+def test_extrair_pedido_configuravel():
+    config = {
+        'regras': [{'intent': 'pedido', 'palavras': ['pedido']},
+                   {'intent': 'rastreio', 'palavras': ['rastreio'], 'extrair_pedido': True}],
+        'referencia_pedido': ['pedido'],
+    }
+    router = IntentRouter(config)
+    assert router.classificar('rastreio do 4321').pedido_id == '4321'
+    assert router.classificar('meu pedido é o 555').pedido_id is None
+    assert router.classificar('pedido 555').pedido_id == '555'
@@ -0,0 +1,70 @@
+import json
+
+from knowledge_index import KnowledgeIndex
+from providers import HashingEmbeddings
+
+
+class CountingHashingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+def _escrever(data_dir, nome, texto):
+    (data_dir / 'knowledge' / nome).write_text(texto, encoding='utf-8')
+
+
+def _indice(embeddings, tmp_path):
+    return KnowledgeIndex(embeddings, data_dir=tmp_path / 'data', index_dir=tmp_path / 'index')
+
+
+def _manifesto(tmp_path):
+    return json.loads((tmp_path / 'index' / 'manifest.json').read_text(encoding='utf-8'))['files']
+
+
+def test_unchanged_and_changed_files(tmp_path):
+    data_dir = tmp_path / 'data'
+    (data_dir / 'knowledge').mkdir(parents=True)
+    _escrever(data_dir, 'entrega.md', 'O prazo de entrega é de 5 dias úteis.')
+    _escrever(data_dir, 'garantia.md', 'A garantia dos produtos é de 90 dias.')
+    embeddings = CountingHashingEmbeddings()
+    _indice(embeddings, tmp_path).load()
+    assert len(embeddings.texts) == 2
+
+    # Nada mudou: nenhum embedding novo
+    embeddings.texts.clear()
+    _indice(embeddings, tmp_path).load()
+    assert embeddings.texts == []
+
+    # Só o arquivo alterado é reprocessado, e seus chunks antigos saem do índice
+    antigos = _manifesto(tmp_path)['knowledge/garantia.md']['chunk_ids']
+    _escrever(data_dir, 'garantia.md', 'A garantia dos produtos é de 1 ano.')
+    store = _indice(embeddings, tmp_path).load()
+    assert embeddings.texts == ['A garantia dos produtos é de 1 ano.']
+    ids = set(store.index_to_docstore_id.values())
+    assert not ids & set(antigos)
+    assert set(_manifesto(tmp_path)['knowledge/garantia.md']['chunk_ids']) <= ids
+
+
+def test_deleted_file_chunks_are_removed(tmp_path):
+    data_dir = tmp_path / 'data'
+    (data_dir / 'knowledge').mkdir(parents=True)
+    _escrever(data_dir, 'entrega.md', 'O prazo de entrega é de 5 dias úteis.')
+    _escrever(data_dir, 'garantia.md', 'A garantia dos produtos é de 90 dias.')
+    embeddings = CountingHashingEmbeddings()
+    _indice(embeddings, tmp_path).load()
+    removidos = _manifesto(tmp_path)['knowledge/entrega.md']['chunk_ids']
+
+    (data_dir / 'knowledge' / 'entrega.md').unlink()
+    embeddings.texts.clear()
+    index = _indice(embeddings, tmp_path)
+    store = index.load()
+
+    assert embeddings.texts == []
+    assert not set(store.index_to_docstore_id.values()) & set(removidos)
+    assert list(_manifesto(tmp_path)) == ['knowledge/garantia.md']
+    assert not set(index.lexical.textos) & set(removidos)
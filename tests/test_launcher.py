@@ -0,0 +1,25 @@
+import os
+
+from launcher import BACKENDS_COMPARTILHADOS, configurar_estado_compartilhado, numero_workers
+
+
+def test_worker_count_prefers_argument_then_env_then_cpus(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '3')
+    assert numero_workers(5) == 5
+    assert numero_workers() == 3
+    monkeypatch.delenv('WEB_CONCURRENCY')
+    assert numero_workers() >= 1
+
+
+def test_multiple_workers_default_to_shared_backends(monkeypatch):
+    for variavel in BACKENDS_COMPARTILHADOS:
+        # setenv registra o valor original (mesmo ausente), então o que
+        # configurar_estado_compartilhado gravar com setdefault é desfeito no fim do teste
+        monkeypatch.setenv(variavel, '')
+        monkeypatch.delenv(variavel)
+    assert configurar_estado_compartilhado(1) == {}
+    assert all(variavel not in os.environ for variavel in BACKENDS_COMPARTILHADOS)
+
+    monkeypatch.setenv('CHAT_HISTORY_BACKEND', 'memory')
+    assert configurar_estado_compartilhado(4) == {'CHAT_HISTORY_BACKEND': 'memory'}
+    assert os.environ['PEDIDOS_BACKEND'] == os.environ['RESPONSE_CACHE_BACKEND'] == 'sqlite'
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from llm_gateway import LLMGateway, LLMGatewayError, LLMTimeoutError
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+
+
+class FakeLLM:
+    def __init__(self, delay=0.01, failures=()):
+        self.delay = delay
+        self.failures = list(failures)
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def agenerate(self, lotes, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures:
+                raise ProviderError(self.failures.pop(0))
+            return lotes[0][-1].content.upper()
+        finally:
+            self.active -= 1
+
+    async def astream(self, mensagens, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise ProviderError(self.failures.pop(0))
+        for parte in ('ok', '!'):
+            yield SimpleNamespace(content=parte)
+
+
+def prompt(texto):
+    return [[SimpleNamespace(content=texto)]]
+
+
+def test_identical_inflight_prompts_share_one_call_and_concurrency_is_bounded():
+    llm = FakeLLM(delay=0.02)
+    gateway = LLMGateway(llm, max_concurrency=2)
+
+    async def run():
+        return await asyncio.gather(*[gateway.agenerate(prompt('mesmo')) for _ in range(5)],
+                                    *[gateway.agenerate(prompt(f'outro {i}')) for i in range(4)])
+
+    respostas = asyncio.run(run())
+    assert respostas[:5] == ['MESMO'] * 5
+    assert llm.calls == 5 and llm.max_active == 2
+    stats = gateway.stats()
+    assert stats['deduplicated'] == 4 and stats['max_queue_depth'] >= 2 and stats['in_flight'] == 0
+
+
+def test_retries_rate_limits_and_server_errors_with_backoff():
+    llm = FakeLLM(failures=[429, 503])
+    gateway = LLMGateway(llm, backoff_base=0.001)
+    assert asyncio.run(gateway.agenerate(prompt('oi'))) == 'OI'
+    assert llm.calls == 3 and gateway.stats()['retries'] == 2
+
+    with pytest.raises(ProviderError):
+        asyncio.run(LLMGateway(FakeLLM(failures=[400]), backoff_base=0.001).agenerate(prompt('oi')))
+    with pytest.raises(LLMGatewayError):
+        asyncio.run(LLMGateway(FakeLLM(failures=[500] * 3), max_retries=2, backoff_base=0.001)
+                    .agenerate(prompt('oi')))
+
+
+def test_deadline_and_stream_retry_before_first_chunk():
+    with pytest.raises(LLMTimeoutError):
+        asyncio.run(LLMGateway(FakeLLM(delay=1), timeout=0.05).agenerate(prompt('oi')))
+
+    gateway = LLMGateway(FakeLLM(failures=[429]), backoff_base=0.001)
+
+    async def consumir():
+        return [chunk.content async for chunk in gateway.astream(prompt('oi')[0])]
+
+    assert asyncio.run(consumir()) == ['ok', '!']
+    assert gateway.stats()['retries'] == 1
+
+
+def test_token_bucket_spaces_calls():
+    gateway = LLMGateway(FakeLLM(delay=0), rate_limit=20, burst=1)
+
+    async def run():
+        inicio = time.monotonic()
+        await asyncio.gather(*[gateway.agenerate(prompt(str(i))) for i in range(3)])
+        return time.monotonic() - inicio
+
+    assert asyncio.run(run()) >= 0.09
@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+
+import metrics
+from metrics import Counter, Histogram, Registry, server_timing_header, span
+
+
+def test_prometheus_text_format():
+    registry = Registry(enabled=True)
+    contador = Counter('demo_total', 'Demo', ['intent'], registry=registry)
+    histograma = Histogram('demo_seconds', 'Demo', buckets=(0.1, 1.0), registry=registry)
+    contador.inc('produtos')
+    contador.inc('produtos')
+    histograma.observe(0.05)
+    histograma.observe(0.5)
+
+    texto = registry.render()
+    assert '# TYPE demo_total counter' in texto
+    assert 'demo_total{intent="produtos"} 2' in texto
+    assert 'demo_seconds_bucket{le="0.1"} 1' in texto
+    assert 'demo_seconds_bucket{le="1"} 2' in texto
+    assert 'demo_seconds_bucket{le="+Inf"} 2' in texto
+    assert 'demo_seconds_count 2' in texto
+
+
+def test_disabled_registry_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(metrics.REGISTRY, 'enabled', False)
+    with span('routing') as s:
+        pass
+    assert s is metrics._NO_SPAN
+    before = metrics.MESSAGES.value('geral')
+    metrics.MESSAGES.inc('geral')
+    assert metrics.MESSAGES.value('geral') == before
+    assert server_timing_header([('routing', 0.001), ('llm', 0.25), ('routing', 0.001)]) == \
+        'routing;dur=2.00, llm;dur=250.00'
+    assert server_timing_header([('llm', 0.25)], {'prompt_tokens': '812'}) == \
+        'llm;dur=250.00, prompt_tokens;desc="812"'
+
+
+def test_chat_reports_stages_and_metrics(monkeypatch):
+    import api
+    import assistente as assistente_module
+    from conftest import DummyLLM, DummyRAG
+
+    monkeypatch.setattr(api, 'RAGSystem', DummyRAG)
+    monkeypatch.setattr(api, 'SERVER_TIMING', True)
+    monkeypatch.setattr(assistente_module, 'create_llm', lambda *a, **k: DummyLLM())
+
+    with TestClient(api.app) as client:
+        resposta = client.post('/chat', json={'content': 'Qual a política de garantia?'})
+        assert resposta.status_code == 200
+        etapas = [parte.split(';')[0] for parte in resposta.headers['Server-Timing'].split(', ')]
+        assert {'routing', 'response_cache', 'prompt_build', 'llm', 'prompt_tokens'} <= set(etapas)
+
+        # No streaming, os cabeçalhos saem antes das etapas; um Server-Timing parcial enganaria
+        stream = client.post('/chat/stream', json={'content': 'Qual a política de garantia?'})
+        assert stream.status_code == 200 and 'event: done' in stream.text
+        assert 'Server-Timing' not in stream.headers
+
+        texto = client.get('/metrics').text
+        assert 'assistente_messages_total{intent="politicas"}' in texto
+        assert 'assistente_response_cache_total{result="miss"}' in texto
+        assert 'assistente_llm_tokens_count{kind="prompt"}' in texto
+        assert 'assistente_prompt_tokens_count{intent="politicas",part="context"}' in texto
+        assert 'assistente_http_request_duration_seconds_count{method="POST",route="/chat",status="200"}' in texto
@@ -0,0 +1,40 @@
+import json
+import os
+
+import pytest
+
+from order_store import JsonOrderStore, OrderStore, SqliteOrderStore
+
+
+def _write(path, pedidos):
+    path.write_text(json.dumps(pedidos), encoding='utf-8')
+
+
+def test_stores_index_and_reload_on_change(tmp_path):
+    pedidos_file = tmp_path / 'pedidos.json'
+    _write(pedidos_file, [{'pedido_id': 12345, 'status': 'Em trânsito'}])
+
+    stores = [JsonOrderStore(pedidos_file), SqliteOrderStore(pedidos_file, tmp_path / 'pedidos.sqlite')]
+    for store in stores:
+        assert store.get('12345')['status'] == 'Em trânsito'
+        assert store.get(' 12345 ')['status'] == 'Em trânsito'
+        assert store.get('99999') is None
+
+    _write(pedidos_file, [{'pedido_id': '12345', 'status': 'Entregue'}, {'pedido_id': '99999', 'status': 'Novo'}])
+    stat = os.stat(pedidos_file)
+    os.utime(pedidos_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    for store in stores:
+        # A recarga roda em segundo plano; enquanto isso a versão anterior continua servida
+        assert store.get('12345')['status'] in ('Em trânsito', 'Entregue')
+        store.wait_refresh()
+        assert store.get('12345')['status'] == 'Entregue'
+        assert store.get('99999')['status'] == 'Novo'
+
+
+def test_incomplete_store_fails_at_construction():
+    class SemGet(OrderStore):
+        def _recarregar(self, signature):
+            return True
+
+    with pytest.raises(TypeError):
+        SemGet()
@@ -2,10 +2,12 @@ import asyncio
 
 def test_policy_query(assistant, monkeypatch):
     called = {}
-    async def fake_query(msg):
+    async def fake_query(msg, token_budget=None):
         called['q'] = msg
+        called['budget'] = token_budget
         return ['sample policy']
     monkeypatch.setattr(assistant.rag_system, 'query_knowledge_base', fake_query)
     response = asyncio.run(assistant.processar_mensagem('Qual é a política de trocas?'))
     assert called['q'] == 'Qual é a política de trocas?'
+    assert called['budget'] == assistant.prompt_builder.budget
     assert 'dummy' in response
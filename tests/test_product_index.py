@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+from product_index import ProductIndex
+
+VOCAB = ['notebook', 'smartphone', 'panelas', 'tênis', 'livro']
+
+
+class CountingEmbeddings:
+    model = 'fake-embeddings'
+
+    def __init__(self):
+        self.document_calls = 0
+
+    def _embed(self, text):
+        text = text.lower()
+        return [float(text.count(word)) for word in VOCAB] + [0.1]
+
+    async def aembed_documents(self, texts):
+        self.document_calls += 1
+        return [self._embed(t) for t in texts]
+
+    async def aembed_query(self, text):
+        return self._embed(text)
+
+
+def test_product_index_is_built_once_and_reused(tmp_path):
+    with open('data/produtos.json', 'r', encoding='utf-8') as f:
+        produtos = json.load(f)
+
+    embeddings = CountingEmbeddings()
+    index = ProductIndex(produtos, embeddings, index_dir=tmp_path)
+    asyncio.run(index.ensure_ready())
+    assert embeddings.document_calls == 1
+    assert index.matrix.shape[0] == len(produtos)
+
+    reloaded_embeddings = CountingEmbeddings()
+    reloaded = ProductIndex(produtos, reloaded_embeddings, index_dir=tmp_path)
+    asyncio.run(reloaded.ensure_ready())
+    assert reloaded_embeddings.document_calls == 0
+
+    query = asyncio.run(reloaded_embeddings.aembed_query('notebook'))
+    [(best, score)] = reloaded.search(query, k=1)
+    assert 'Notebook' in produtos[best]['nome']
+    assert score > 0.9
+
+    changed = ProductIndex(produtos[:-1], CountingEmbeddings(), index_dir=tmp_path)
+    assert not changed.load()
+
+
+def test_product_index_search_filters_and_top_k(tmp_path):
+    with open('data/produtos.json', 'r', encoding='utf-8') as f:
+        produtos = json.load(f)
+
+    embeddings = CountingEmbeddings()
+    index = ProductIndex(produtos, embeddings, index_dir=tmp_path)
+    asyncio.run(index.ensure_ready())
+    query = asyncio.run(embeddings.aembed_query('panelas'))
+
+    hits = index.search(query, k=3)
+    assert len(hits) == 3
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+
+    hits = index.search(query, k=5, filters={'category': 'casa'})
+    assert hits and all(produtos[i]['categoria'].lower() == 'casa' for i, _ in hits)
+
+    hits = index.search(query, k=5, filters={'max_price': 100})
+    assert all(produtos[i]['preco'] <= 100 for i, _ in hits)
+
+    assert index.search(query, k=5, filters={'category': 'inexistente'}) == []
+    assert all(s >= 0.5 for _, s in index.search(query, k=5, min_score=0.5))
+
+
+def test_broad_and_narrow_filters_rank_the_same_rows(tmp_path, monkeypatch):
+    import product_index
+
+    with open('data/produtos.json', 'r', encoding='utf-8') as f:
+        produtos = json.load(f)
+    index = ProductIndex(produtos, CountingEmbeddings(), index_dir=tmp_path)
+    asyncio.run(index.ensure_ready())
+    query = CountingEmbeddings()._embed('notebook')
+
+    resultados = []
+    for fraction in (0.0, 1.0):
+        monkeypatch.setattr(product_index, 'FILTER_GATHER_FRACTION', fraction)
+        resultados.append(index.search(query, k=3, filters={'available': True}))
+    assert resultados[0] == resultados[1]
+    assert all(produtos[i]['disponivel'] for i, _ in resultados[0])
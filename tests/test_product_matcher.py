@@ -0,0 +1,37 @@
+from assistente import FiltroProdutosIncremental
+from product_matcher import ProductMatcher, ler_preco
+
+CATALOGO = [
+    {'id': 'P1', 'nome': 'Notebook Dell', 'preco': 2500.0, 'disponivel': True},
+    {'id': 'P2', 'nome': 'Notebook Dell Inspiron 15', 'preco': 2899.99, 'disponivel': True},
+    {'id': 'P3', 'nome': 'Tênis Nike Air', 'preco': 499.9, 'disponivel': False, 'aliases': ['Nike Air']},
+    {'id': 'P4', 'nome': 'Mouse', 'preco': 50.0, 'disponivel': True},
+]
+
+
+def test_matches_folded_names_aliases_and_longest_overlap():
+    matcher = ProductMatcher(CATALOGO)
+
+    assert matcher.ids('1. NOTEBOOK  DELL INSPIRON 15 - ótimo') == ['P2']
+    assert matcher.ids('O notebook dell e o tenis nike air') == ['P1', 'P3']
+    assert matcher.ids('Combina com o Nike Air.') == ['P3']
+    # Só palavras inteiras: 'Mousepad' não é o 'Mouse'
+    assert matcher.ids('Mousepad gamer') == []
+
+
+def test_reports_prices_and_availability_that_diverge_from_catalog():
+    matcher = ProductMatcher(CATALOGO)
+
+    assert matcher.verificar('Notebook Dell Inspiron 15 - R$ 2.899,99 (disponível)') == []
+    divergencias = matcher.verificar('Notebook Dell por R$ 2.000 e Tênis Nike Air por R$499.90, disponível')
+    assert [(d.produto_id, d.tipo) for d in divergencias] == [('P1', 'preco'), ('P3', 'disponibilidade')]
+    assert (ler_preco('2.899,99'), ler_preco('2899.99'), ler_preco('1.500')) == (2899.99, 2899.99, 1500.0)
+
+
+def test_filter_keeps_only_lines_about_the_retrieved_products():
+    matcher = ProductMatcher(CATALOGO)
+    filtro = FiltroProdutosIncremental([CATALOGO[1]], matcher)
+    resposta = 'Sugestões:\n1. Notebook Dell Inspiron 15 - R$ 3.100,00\n2. Mouse'
+
+    assert ''.join(filtro.feed(resposta)) + ''.join(filtro.close()) == '1. Notebook Dell Inspiron 15 - R$ 3.100,00'
+    assert [(d.produto_id, d.citado) for d in filtro.divergencias] == [('P2', '3.100,00')]
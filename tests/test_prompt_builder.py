@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from prompt_builder import PromptBuilder
+from tokens import contar_tokens
+
+
+def produto(i, **extra):
+    return {
+        'id': f'P{i}', 'nome': f'Notebook Modelo {i}', 'preco': 1000.0 + i, 'categoria': 'Eletrônicos',
+        'descricao': 'Notebook leve para trabalho e estudos, com bateria de longa duração. ' * 3,
+        'especificacoes': {'processador': 'Intel i5', 'memoria': '8GB', 'cor': 'prata', 'peso': '1,8kg'},
+        'disponivel': True, **extra,
+    }
+
+
+def test_budget_drops_low_value_specs_first_and_keeps_the_top_product():
+    pares = [(produto(i), 1.0 - i / 10) for i in range(1, 4)]
+    completo = PromptBuilder(budget=10_000).contexto_produtos(pares, 'notebook')
+    assert completo.incluidos == 3 and 'cor: prata' in completo.texto
+
+    # Só cabe o contexto sem as specs de baixo valor: 'cor' e 'peso' saem, 'processador' fica
+    sem_baixo_valor = PromptBuilder(budget=completo.tokens - 24).contexto_produtos(pares, 'notebook')
+    assert sem_baixo_valor.incluidos == 3
+    assert 'processador: Intel i5' in sem_baixo_valor.texto
+    assert sem_baixo_valor.tokens < completo.tokens
+    # A spec citada na mensagem é a última a sair
+    citada = PromptBuilder(budget=completo.tokens - 24).contexto_produtos(pares, 'qual a cor?')
+    assert citada.texto.count('cor: prata') > sem_baixo_valor.texto.count('cor: prata')
+
+    minimo = PromptBuilder(budget=10).contexto_produtos(pares, 'notebook')
+    assert (minimo.incluidos, minimo.omitidos) == (1, 2)
+    assert minimo.texto.startswith('1. Notebook Modelo 1')
+
+
+def test_product_blocks_are_cached_per_version():
+    builder = PromptBuilder(budget=10_000)
+    pares = [(produto(1), 1.0)]
+    primeiro = builder.contexto_produtos(pares, 'notebook')
+    assert builder.contexto_produtos(pares, 'notebook') == primeiro
+    assert (builder.cache_hits, builder.cache_misses) == (1, 1)
+
+    # Mudou o preço, muda a versão: o bloco é refeito
+    atualizado = builder.contexto_produtos([(produto(1, preco=999.0), 1.0)], 'notebook')
+    assert 'R$999.00' in atualizado.texto and builder.cache_misses == 2
+    assert atualizado.tokens == contar_tokens(atualizado.texto)
+
+
+def test_product_blocks_are_keyed_on_the_catalog_version(monkeypatch):
+    import prompt_builder
+
+    builder = PromptBuilder(budget=10_000)
+    pares = [(produto(1), 1.0), (produto(2), 0.5)]
+    monkeypatch.setattr(prompt_builder, 'versao_produto', lambda p: pytest.fail('hash por produto'))
+    primeiro = builder.contexto_produtos(pares, 'notebook', versao_catalogo='v1')
+    assert builder.contexto_produtos(pares, 'notebook', versao_catalogo='v1') == primeiro
+    assert (builder.cache_hits, builder.cache_misses) == (2, 2)
+
+    # Nova versão do catálogo: os blocos são refeitos
+    builder.contexto_produtos([(produto(1, preco=999.0), 1.0)], 'notebook', versao_catalogo='v2')
+    assert builder.cache_misses == 3
+
+
+def test_product_prompt_receives_formatted_context(assistant):
+    preparo = asyncio.run(assistant._preparar('Quais notebooks vocês têm?'))
+    conteudo = preparo.mensagens[-1].content
+
+    assert '1. Notebook' in conteudo and "['" not in conteudo
+    assert preparo.tokens_prompt > contar_tokens(conteudo)
@@ -0,0 +1,88 @@
+import asyncio
+from functools import partial
+
+import numpy as np
+
+import rag_system as rag_module
+from assistente import AssistenteVirtual
+from catalog_store import load_catalog
+from knowledge_index import KnowledgeIndex
+from product_index import ProductIndex
+from providers import EchoChatModel, HashingEmbeddings
+
+
+class CountingHashingEmbeddings(HashingEmbeddings):
+    def __init__(self):
+        super().__init__(dim=256)
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return super().embed_documents(texts)
+
+
+def test_hashing_embeddings_are_deterministic_and_topical():
+    embeddings = HashingEmbeddings(dim=256)
+    notebook, notebooks, panela = embeddings.embed_matrix(['Notebook Dell', 'notebooks dell', 'Jogo de panelas'])
+    assert embeddings.embed_query('Notebook Dell') == HashingEmbeddings(dim=256).embed_query('Notebook Dell')
+    assert np.isclose(np.linalg.norm(notebook), 1.0)
+    assert notebook @ notebooks > notebook @ panela
+
+
+def test_echo_llm_streams_the_full_answer():
+    from langchain_core.messages import HumanMessage
+
+    llm = EchoChatModel(template='Resposta: {mensagem}')
+    mensagens = [HumanMessage(content='quero um notebook')]
+
+    async def run():
+        gerado = await llm.agenerate([mensagens])
+        partes = [chunk.content async for chunk in llm.astream(mensagens)]
+        return gerado.generations[0][0].text, partes
+
+    texto, partes = asyncio.run(run())
+    assert texto == ''.join(partes) == 'Resposta: quero um notebook'
+    assert len(partes) == 4
+
+
+def test_knowledge_index_reembeds_only_changed_files(tmp_path):
+    data_dir = tmp_path / 'data'
+    (data_dir / 'knowledge').mkdir(parents=True)
+    (data_dir / 'knowledge' / 'entrega.md').write_text('O prazo de entrega é de 5 dias úteis.', encoding='utf-8')
+    (data_dir / 'knowledge' / 'garantia.md').write_text('A garantia dos produtos é de 90 dias.', encoding='utf-8')
+
+    embeddings = CountingHashingEmbeddings()
+    index = KnowledgeIndex(embeddings, data_dir=data_dir, index_dir=tmp_path / 'index')
+    store = index.load()
+    assert len(embeddings.texts) == 2
+    assert store.similarity_search('garantia', k=1)[0].metadata['source'] == 'knowledge/garantia.md'
+
+    (data_dir / 'knowledge' / 'entrega.md').write_text('Entregas expressas chegam em 2 dias.', encoding='utf-8')
+    embeddings.texts.clear()
+    reloaded = KnowledgeIndex(embeddings, data_dir=data_dir, index_dir=tmp_path / 'index')
+    store = reloaded.load()
+    assert embeddings.texts == ['Entregas expressas chegam em 2 dias.']
+    assert reloaded.version != index.version
+    assert 'expressas' in store.similarity_search('entrega expressa', k=1)[0].page_content
+
+
+def test_offline_pipeline_end_to_end(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_module, 'load_catalog', partial(load_catalog, index_dir=tmp_path))
+    monkeypatch.setattr(rag_module, 'ProductIndex', partial(ProductIndex, index_dir=tmp_path))
+    monkeypatch.setattr(rag_module, 'KnowledgeIndex', partial(KnowledgeIndex, index_dir=tmp_path / 'knowledge'))
+
+    rag = rag_module.RAGSystem()
+    assistente = AssistenteVirtual(rag_system=rag)
+    assert isinstance(assistente.llm.llm, EchoChatModel)
+
+    async def run():
+        await rag.warmup()
+        return (
+            await assistente.processar_mensagem('Quero comprar um notebook'),
+            await assistente.processar_mensagem('Qual a política de garantia?'),
+        )
+
+    produtos, politicas = asyncio.run(run())
+    assert rag.ready
+    assert 'Notebook Dell Inspiron 15' in produtos
+    assert '90 dias' in politicas
@@ -0,0 +1,123 @@
+import pytest
+
+from response_cache import ResponseCache, SqliteResponseCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_cache(request, tmp_path):
+    def make(**kwargs):
+        if request.param == 'sqlite':
+            return SqliteResponseCache(tmp_path / 'cache.sqlite', **kwargs)
+        return ResponseCache(**kwargs)
+    return make
+
+
+def test_exact_and_semantic_levels(make_cache):
+    cache = make_cache(max_entries=10, ttl=60, similarity_threshold=0.9)
+    cache.put('Qual o prazo de entrega?', 'De 1 a 8 dias úteis.', latencia=2.0, embedding=[1.0, 0.0, 0.1])
+
+    assert cache.get_exact('  qual o PRAZO de entrega ') == 'De 1 a 8 dias úteis.'
+    assert cache.get_semantic([0.9, 0.0, 0.1]) == 'De 1 a 8 dias úteis.'
+    assert cache.get_semantic([0.0, 1.0, 0.0]) is None
+    cache.record_miss()
+
+    stats = cache.stats()
+    assert (stats['exact_hits'], stats['semantic_hits'], stats['misses']) == (1, 1, 1)
+    assert stats['llm_seconds_saved'] == 4.0
+
+
+def test_ttl_lru_and_version_invalidation(make_cache):
+    clock = FakeClock()
+    cache = make_cache(max_entries=2, ttl=10, similarity_threshold=0.9, clock=clock)
+    cache.set_version('v1')
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get_exact('a') == 'A'
+    cache.put('c', 'C')
+    assert cache.get_exact('b') is None
+    assert cache.stats()['evictions'] == 1
+
+    clock.now = 11
+    assert cache.get_exact('a') is None
+    assert cache.stats()['expirations'] == 1
+
+    cache.put('d', 'D')
+    cache.set_version('v2')
+    assert cache.get_exact('d') is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_sqlite_cache_is_shared_between_workers(tmp_path):
+    worker_a = SqliteResponseCache(tmp_path / 'cache.sqlite', similarity_threshold=0.9)
+    worker_b = SqliteResponseCache(tmp_path / 'cache.sqlite', similarity_threshold=0.9)
+    worker_a.set_version('v1')
+    worker_b.set_version('v1')
+
+    assert worker_b.get_semantic([1.0, 0.0]) is None
+    worker_a.put('Qual o prazo de entrega?', 'De 1 a 8 dias úteis.', embedding=[1.0, 0.0])
+    assert worker_b.get_exact('qual o prazo de entrega') == 'De 1 a 8 dias úteis.'
+    # A matriz semântica do worker B é refeita porque o worker A escreveu no banco
+    assert worker_b.get_semantic([0.95, 0.05]) == 'De 1 a 8 dias úteis.'
+
+    # Uma nova versão dos dados, vista por um worker, invalida o cache de todos
+    worker_b.set_version('v2')
+    assert worker_a.get_exact('qual o prazo de entrega') is None
+
+
+def test_sqlite_reads_do_not_write_and_the_matrix_is_updated_in_place(tmp_path):
+    import asyncio
+    worker_a = SqliteResponseCache(tmp_path / 'cache.sqlite', max_entries=2, similarity_threshold=0.9)
+    worker_b = SqliteResponseCache(tmp_path / 'cache.sqlite', max_entries=2, similarity_threshold=0.9)
+    worker_a.put('a', 'A', embedding=[1.0, 0.0])
+    assert worker_b.get_semantic([1.0, 0.0]) == 'A'
+
+    # Acertos não escrevem no banco: o outro worker não precisa ressincronizar
+    data_version = worker_b._data_version
+    assert worker_a.get_exact('a') == 'A'
+    assert worker_a.get_semantic([1.0, 0.05]) == 'A'
+    assert worker_b._conn.execute('PRAGMA data_version').fetchone()[0] == data_version
+
+    # Novas linhas entram, as descartadas saem, sem remontar a matriz inteira
+    matriz_anterior = worker_b._matrix
+    worker_a.put('b', 'B', embedding=[0.0, 1.0])
+    worker_a.put('c', 'C', embedding=[0.6, 0.8])
+    assert worker_b.get_semantic([0.6, 0.8]) == 'C'
+    assert worker_b.get_semantic([0.0, 1.0]) == 'B'
+    assert worker_b.get_semantic([1.0, 0.0]) is None
+    assert len(worker_b._matrix_ids) == 2 and worker_b._matrix is not matriz_anterior
+
+    # Os acertos pendentes contam para o LRU antes do próximo descarte
+    assert asyncio.run(worker_a.aget_exact('b')) == 'B'
+    asyncio.run(worker_a.aput('d', 'D', embedding=[0.8, 0.6]))
+    assert worker_a.get_exact('b') == 'B' and worker_a.get_exact('c') is None
+
+
+def test_memory_semantic_matrix_is_updated_row_by_row():
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=20, ttl=10, similarity_threshold=0.99, clock=clock)
+    for i in range(20):
+        cache.put(f'pergunta {i}', f'R{i}', embedding=[1.0, float(i)])
+    assert cache.get_semantic([1.0, 7.0]) == 'R7'
+    matriz = cache._matrix
+
+    # Descartes, substituições e expirações mexem só nas linhas afetadas
+    cache.put('pergunta 20', 'R20', embedding=[1.0, 20.0])
+    cache.put('pergunta 5', 'R5b', embedding=[1.0, 5.0])
+    assert cache._matrix is matriz
+    assert cache.get_semantic([1.0, 0.0]) is None
+    assert cache.get_semantic([1.0, 20.0]) == 'R20'
+    assert cache.get_semantic([1.0, 5.0]) == 'R5b'
+    assert sorted(cache._matrix_keys) == sorted(cache._entries)
+
+    clock.now = 11
+    cache.put('nova', 'N', embedding=[0.0, 1.0])
+    assert cache.get_semantic([1.0, 20.0]) is None
+    assert cache.get_semantic([0.0, 1.0]) == 'N'
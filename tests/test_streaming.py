@@ -0,0 +1,31 @@
+import asyncio
+
+from assistente import FiltroProdutosIncremental, filtrar_resposta_produtos
+
+CATALOGO = [{'nome': 'Notebook Dell Inspiron 15'}, {'nome': 'Jogo de Panelas Tramontina'}]
+
+
+def _stream(resposta, tamanho):
+    filtro = FiltroProdutosIncremental(CATALOGO)
+    partes = []
+    for i in range(0, len(resposta), tamanho):
+        partes.extend(filtro.feed(resposta[i:i + tamanho]))
+    partes.extend(filtro.close())
+    return ''.join(partes)
+
+
+def test_incremental_filter_matches_full_filter():
+    resposta = 'Sugestões:\n1. Notebook Dell Inspiron 15 - R$2899\n2. Cafeteira XYZ\n3. Jogo de Panelas Tramontina'
+    for tamanho in (1, 3, 7, len(resposta)):
+        assert _stream(resposta, tamanho) == filtrar_resposta_produtos(resposta, CATALOGO)
+    assert _stream('Cafeteira XYZ\n', 4) == filtrar_resposta_produtos('Cafeteira XYZ\n', CATALOGO)
+
+
+def test_stream_yields_tokens_and_records_history(assistant):
+    async def collect(mensagem):
+        return [parte async for parte in assistant.processar_mensagem_stream(mensagem, {'session_id': 's1'})]
+
+    assert asyncio.run(collect('Olá, tudo bem?')) == ['dum', 'my']
+    assert asyncio.run(collect('Qual o status do pedido #12345?'))[0].startswith('Status do pedido 12345')
+    history, total = assistant.get_chat_history('s1')
+    assert total == 1 and history[0]['assistant'] == 'dummy'